@@ -24,26 +24,20 @@ def bill_patient(patient_name,medicine_name):
         print(f"{medicine_name} not available")
         return
     serials=medicines[medicine_name]["serials"]
+    today=datetime.now().strftime("%Y-%m-%d")
     valid_serial=None
-    for serial_num,details in list(serials.items()):
-        expiry_date=datetime.strptime(details["expiry"],"%Y-%m-%d")
-        if expiry_date<datetime.now():
-        
-            del serials[serial_num]
-        else:
-            if (valid_serial is None or 
-                expiry_date<datetime.strptime(serials[valid_serial]["expiry"],"%Y-%m-%d")):
+    for serial_num,details in serials.items():
+        #expiry dates are YYYY-MM-DD so they compare as strings;expired serials are left for the API's expiry sweeper
+        if details["expiry"]>today:
+            if valid_serial is None or details["expiry"]<serials[valid_serial]["expiry"]:
                 valid_serial=serial_num
-    #here a normal for loop is used to find the earliest serial cuz along with finding the minimum,we also have to find the non expired ones and delete the expired ones
-    medicines[medicine_name]["stock"]=len(serials)
-    save_json(MEDI_F,medicines)
 
     if valid_serial is None:
         print("No available (non-expired) serials for this medicine.")
         return
     details=serials[valid_serial]
     price=details["price"]
-    del medicines[medicine_name]["serials"][serial_num]
+    del medicines[medicine_name]["serials"][valid_serial]
     medicines[medicine_name]["stock"]=len(medicines[medicine_name]["serials"])#
     save_json(MEDI_F,medicines)
 
@@ -57,7 +51,7 @@ def bill_patient(patient_name,medicine_name):
     patients[patient_name]["total_price"]+=price
 
     save_json(PATI_F, patients)
-    print(f"Billed {patient_name} for {medicine_name} (Serial {serial_num},Price:{price})")
+    print(f"Billed {patient_name} for {medicine_name} (Serial {valid_serial},Price:{price})")
     print(f"Total price for {patient_name}:{patients[patient_name]['total_price']}")
 #Testing :-(
 if __name__=="main_":
@@ -0,0 +1,198 @@
+"""
+Contention benchmark for appointment booking.
+
+Drives unified_api.book_appointment from many threads against a scratch copy
+of the registries (the real Doctors.json / Patients.json are never touched):
+
+  parallel   every thread books the slots of its own doctors; nothing may fail
+  same-slot  all threads race for the same (doctor, hour), round after round;
+             exactly one booking per slot may win, every other gets a 409
+  versioned  all threads book different hours of one doctor with the version
+             they read first; exactly one per version may win
+
+After each scenario the Doctors.json written to disk is re-read and checked
+against the winners, so lost updates show up as failures.
+
+Usage:
+    python booking_benchmark.py --threads 8 --doctors 64
+    python booking_benchmark.py --rounds 500 --json
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException
+
+import unified_api as api
+from registry_store import RegistryStore
+from slot_index import SlotIndex
+from utilization import UtilizationStats
+
+HOURS = range(24)
+
+
+def reset_registries(directory, doctors, patients):
+    """Point the API at fresh scratch registries with the given number of doctors and patients"""
+    api.doctor_store = RegistryStore(os.path.join(directory, "Doctors.json"))
+    api.patient_store = RegistryStore(os.path.join(directory, "Patients.json"))
+    api.slot_index = SlotIndex()
+    api.utilization = UtilizationStats()
+    api.patient_bookings.clear()
+    for n in range(1, patients + 1):
+        api.patient_store.put(str(n), {"name": f"Patient {n}", "age": 30, "contact": "-", "history": []})
+    for n in range(1, doctors + 1):
+        api.doctor_store.put(str(n), {"name": f"Dr. {n}", "speciality": "General",
+                                      "slots": {str(t): None for t in HOURS}})
+        api.index_doctor(str(n), api.doctor_store.get(str(n)))
+    api.save_patients()
+    api.save_doctors()
+
+
+def book(doctor_id, patient_id, hour, expected_version=None):
+    """True if booked, False if rejected with a conflict"""
+    try:
+        api.book_appointment(api.AppointmentBook(doctor_id=doctor_id, patient_id=patient_id, time=hour,
+                                                 expected_version=expected_version))
+        return True
+    except HTTPException as e:
+        if e.status_code != 409:
+            raise
+        return False
+
+
+def run_threads(threads, target):
+    """Run target(thread_number) on each thread, returns wall seconds"""
+    workers = [threading.Thread(target=target, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def on_disk():
+    with open(api.doctor_store.path) as f:
+        return json.load(f)
+
+
+def scenario_parallel(directory, threads, doctors):
+    reset_registries(directory, doctors, threads)
+    writes_before = api.doctor_store.writes
+    outcomes = []
+
+    def worker(n):
+        patient_id = str(n + 1)
+        wins = 0
+        for doctor in range(n + 1, doctors + 1, threads):
+            for hour in HOURS:
+                wins += book(str(doctor), patient_id, hour)
+        outcomes.append(wins)
+
+    seconds = run_threads(threads, worker)
+    attempts = doctors * len(HOURS)
+    saved = on_disk()
+    persisted = sum(pid is not None for d in saved.values() for pid in d["slots"].values())
+    return {
+        "attempts": attempts,
+        "booked": sum(outcomes),
+        "conflicts": attempts - sum(outcomes),
+        "persisted": persisted,
+        "file_writes": api.doctor_store.writes - writes_before,
+        "bookings_per_sec": round(attempts / seconds),
+        "ok": sum(outcomes) == attempts == persisted
+    }
+
+
+def scenario_same_slot(directory, threads, rounds):
+    doctors = -(-rounds // len(HOURS))
+    reset_registries(directory, doctors, threads)
+    barrier = threading.Barrier(threads)
+    winners = {}  # (doctor, hour) -> list of winning patients
+    lock = threading.Lock()
+
+    def worker(n):
+        patient_id = str(n + 1)
+        for r in range(rounds):
+            doctor_id, hour = str(r // len(HOURS) + 1), r % len(HOURS)
+            barrier.wait()
+            if book(doctor_id, patient_id, hour):
+                with lock:
+                    winners.setdefault((doctor_id, hour), []).append(patient_id)
+
+    seconds = run_threads(threads, worker)
+    saved = on_disk()
+    single_winner = len(winners) == rounds and all(len(w) == 1 for w in winners.values())
+    persisted = all(saved[d]["slots"][str(h)] == w[0] for (d, h), w in winners.items())
+    return {
+        "attempts": rounds * threads,
+        "booked": sum(len(w) for w in winners.values()),
+        "conflicts": rounds * threads - sum(len(w) for w in winners.values()),
+        "attempts_per_sec": round(rounds * threads / seconds),
+        "ok": single_winner and persisted
+    }
+
+
+def scenario_versioned(directory, threads, rounds):
+    rounds = min(rounds, len(HOURS) // threads) or 1
+    reset_registries(directory, 1, threads)
+    barrier = threading.Barrier(threads)
+    wins_per_round = [0] * rounds
+    lock = threading.Lock()
+
+    def worker(n):
+        patient_id = str(n + 1)
+        for r in range(rounds):
+            version = api.doctor_store.version("1")
+            barrier.wait()
+            if book("1", patient_id, r * threads + n, expected_version=version):
+                with lock:
+                    wins_per_round[r] += 1
+            barrier.wait()
+
+    run_threads(threads, worker)
+    booked = sum(pid is not None for pid in on_disk()["1"]["slots"].values())
+    return {
+        "attempts": rounds * threads,
+        "booked": sum(wins_per_round),
+        "stale_rejections": rounds * threads - sum(wins_per_round),
+        "ok": wins_per_round == [1] * rounds and booked == rounds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contention benchmark for appointment booking")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--doctors", type=int, default=64, help="doctors for the parallel scenario")
+    parser.add_argument("--rounds", type=int, default=200, help="contested slots for the same-slot scenario")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = {
+            "threads": args.threads,
+            "parallel": scenario_parallel(directory, args.threads, args.doctors),
+            "same_slot": scenario_same_slot(directory, args.threads, args.rounds),
+            "versioned": scenario_versioned(directory, args.threads, args.rounds)
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("=" * 60)
+        print(f"📅 Booking contention benchmark, {args.threads} threads")
+        print("=" * 60)
+        for name in ("parallel", "same_slot", "versioned"):
+            result = report[name]
+            figures = "  ".join(f"{key}={value}" for key, value in result.items() if key != "ok")
+            print(f"{'PASS' if result['ok'] else 'FAIL'}  {name:<10} {figures}")
+
+    if not all(report[name]["ok"] for name in ("parallel", "same_slot", "versioned")):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
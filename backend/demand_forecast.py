@@ -0,0 +1,182 @@
+import threading
+from datetime import date
+from statistics import NormalDist
+
+import numpy as np
+
+METHODS = ("ewma", "moving_average")
+
+
+def day_number(value):
+    """'2026-10-19' or '2026-10-19 14:05:00' -> days since 1970-01-01"""
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def day_string(day):
+    """Days since 1970-01-01 -> '2026-10-19'"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def today_number():
+    return day_number(date.today().isoformat())
+
+
+class DemandForecaster:
+    """
+    Daily demand per medicine and reorder planning on top of it.
+
+    Units sold are kept in one NumPy matrix, a row per medicine and a column
+    per day for the last `window` days (the last column is today). A bill
+    adds to one cell and marks its row dirty; refresh() recomputes the
+    exponentially weighted and moving averages and the spread of daily demand
+    for the dirty rows only, in a few vectorized passes over just those rows.
+    When the day rolls over the columns shift left and every row is
+    refreshed once.
+    """
+
+    def __init__(self, window=90, alpha=0.2, average_days=28):
+        self.window = window
+        self.alpha = alpha
+        self.average_days = average_days
+        self.lock = threading.Lock()
+        ages = np.arange(window - 1, -1, -1)
+        weights = alpha * (1 - alpha) ** ages
+        self.weights = weights / weights.sum()  # EWMA weights over the window, newest last
+        self.reset()
+
+    def reset(self):
+        self.rows = {}  # medicine -> row
+        self.names = []
+        self.counts = np.zeros((16, self.window))
+        self.dirty = np.zeros(16, dtype=bool)
+        self.ewma = np.zeros(16)
+        self.average = np.zeros(16)
+        self.spread = np.zeros(16)
+        self.end_day = today_number()
+
+    def _row(self, medicine):
+        row = self.rows.get(medicine)
+        if row is not None:
+            return row
+        row = len(self.names)
+        if row == len(self.counts):
+            grow = len(self.counts)
+            self.counts = np.vstack([self.counts, np.zeros((grow, self.window))])
+            self.dirty = np.concatenate([self.dirty, np.zeros(grow, dtype=bool)])
+            self.ewma, self.average, self.spread = (np.concatenate([a, np.zeros(grow)])
+                                                    for a in (self.ewma, self.average, self.spread))
+        self.rows[medicine] = row
+        self.names.append(medicine)
+        return row
+
+    def _advance(self, day):
+        """Move the window so it ends on `day`"""
+        shift = day - self.end_day
+        if shift <= 0:
+            return
+        if shift >= self.window:
+            self.counts[:] = 0
+        else:
+            self.counts[:, :-shift] = self.counts[:, shift:]
+            self.counts[:, -shift:] = 0
+        self.end_day = day
+        self.dirty[:len(self.names)] = True
+
+    def load(self, buckets):
+        """Bulk-load (medicine, day, units, ...) daily totals, e.g. the purchase ledger's daily buckets"""
+        buckets = list(buckets)
+        if not buckets:
+            return
+        with self.lock:
+            self._advance(today_number())
+            days = np.array([bucket[1] for bucket in buckets], dtype=np.int64)
+            units = np.array([bucket[2] for bucket in buckets], dtype=float)
+            rows = np.array([self._row(bucket[0]) for bucket in buckets])
+            columns = self.window - 1 - (self.end_day - days)
+            keep = (columns >= 0) & (columns < self.window)
+            np.add.at(self.counts, (rows[keep], columns[keep]), units[keep])
+            self.dirty[np.unique(rows)] = True
+
+    def record(self, medicine, day=None, units=1):
+        """A sale of `units` on `day` (days since epoch, default today)"""
+        with self.lock:
+            self._advance(today_number())
+            column = self.window - 1 if day is None else self.window - 1 - (self.end_day - day)
+            row = self._row(medicine)
+            if 0 <= column < self.window:
+                self.counts[row, column] += units
+                self.dirty[row] = True
+
+    def refresh(self):
+        """Recompute the averages of rows changed since the last refresh, returns how many"""
+        with self.lock:
+            self._advance(today_number())
+            rows = np.flatnonzero(self.dirty[:len(self.names)])
+            if len(rows):
+                counts = self.counts[rows]
+                recent = counts[:, -self.average_days:]
+                self.ewma[rows] = counts @ self.weights
+                self.average[rows] = recent.mean(axis=1)
+                self.spread[rows] = recent.std(axis=1)
+                self.dirty[rows] = False
+            return len(rows)
+
+    def plan(self, inventory, method="ewma", lead_time_days=7, cover_days=30, service_level=0.95):
+        """
+        Reorder plan per medicine. `inventory` maps medicine -> list of
+        expiry dates ('YYYY-MM-DD') of the serials in stock.
+
+        Serials are assumed to sell earliest-expiry first at the forecast
+        rate; one that would still be on the shelf when it expires is not
+        counted as usable stock. The reorder point covers demand over the
+        lead time plus safety stock for the chosen service level, and the
+        reorder quantity tops usable stock up to `cover_days` past the lead
+        time. Sorted with medicines to reorder first.
+        """
+        self.refresh()
+        today = today_number()
+        z = NormalDist().inv_cdf(service_level)
+        with self.lock:
+            names = sorted(set(self.names) | set(inventory))
+            rows = np.array([self.rows.get(name, -1) for name in names], dtype=np.int64)
+            known = rows >= 0
+            rates = np.zeros(len(names))
+            spread = np.zeros(len(names))
+            rates[known] = (self.ewma if method == "ewma" else self.average)[rows[known]]
+            spread[known] = self.spread[rows[known]]
+
+        safety = z * spread * np.sqrt(lead_time_days)
+        reorder_points = rates * lead_time_days + safety
+        targets = rates * (lead_time_days + cover_days) + safety
+
+        result = []
+        for i, name in enumerate(names):
+            expiries = inventory.get(name, [])
+            stock = len(expiries)
+            rate = float(rates[i])
+            usable = 0
+            if stock:
+                days_left = np.sort(np.array(expiries, dtype='datetime64[D]').astype(np.int64)) - today
+                if rate > 0:
+                    # The serial after `usable` sellable ones goes on sale around day usable / rate
+                    for left in days_left.tolist():
+                        if left > usable / rate:
+                            usable += 1
+                else:
+                    usable = int(np.count_nonzero(days_left > 0))
+            reorder = usable <= reorder_points[i] and rate > 0
+            result.append({
+                "medicine": name,
+                "daily_demand": round(rate, 3),
+                "demand_std": round(float(spread[i]), 3),
+                "stock": stock,
+                "usable_stock": usable,
+                "expiring_unsold": stock - usable,
+                "days_of_cover": round(usable / rate, 1) if rate > 0 else None,
+                "reorder_point": round(float(reorder_points[i]), 1),
+                "reorder_quantity": max(0, int(np.ceil(targets[i] - usable))) if reorder else 0,
+                "reorder": bool(reorder)
+            })
+        # Medicines to reorder first, then the ones that run out soonest
+        result.sort(key=lambda r: (not r["reorder"], r["days_of_cover"] is None, r["days_of_cover"] or 0))
+        return result
@@ -0,0 +1,147 @@
+import bisect
+from array import array
+from datetime import datetime, timedelta
+
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def to_minutes(moment):
+    """Absolute minute number of a datetime (timezone-naive, local hospital time)"""
+    return moment.toordinal() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def from_minutes(minutes):
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    return datetime.fromordinal(day) + timedelta(minutes=minute)
+
+
+def parse_clock(text):
+    """'09:30' -> 570 minutes after midnight, raises ValueError if malformed"""
+    hours, minutes = text.split(":")
+    value = int(hours) * 60 + int(minutes)
+    if not 0 <= int(minutes) < 60 or not 0 <= value <= MINUTES_PER_DAY:
+        raise ValueError(text)
+    return value
+
+
+def format_clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DoctorCalendar:
+    """
+    One doctor's appointments over any number of days.
+
+    Bookings never overlap, so they are kept as parallel sorted arrays of
+    start and end minutes: a conflict check only has to look at the
+    neighbours of the insertion point found by bisect, and a day's bookings
+    are one bisected slice. Working hours come from a recurring weekly
+    template of shifts (weekday -> list of (start, end) minutes of the day).
+    """
+
+    def __init__(self, shifts=None):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.patients = []
+        self.shifts = shifts or {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def set_shifts(self, shifts):
+        self.shifts = {weekday: sorted(windows) for weekday, windows in shifts.items() if windows}
+
+    def shift_windows(self, day):
+        """Absolute (start, end) minutes of the shifts on a day ordinal"""
+        weekday = datetime.fromordinal(day).weekday()
+        base = day * MINUTES_PER_DAY
+        return [(base + start, base + end) for start, end in self.shifts.get(weekday, [])]
+
+    def conflict(self, start, end):
+        """Index of a booking overlapping [start, end), or None"""
+        idx = bisect.bisect_right(self.starts, start)
+        if idx > 0 and self.ends[idx - 1] > start:
+            return idx - 1
+        if idx < len(self.starts) and self.starts[idx] < end:
+            return idx
+        return None
+
+    def within_shift(self, start, end):
+        return any(s <= start and end <= e for s, e in self.shift_windows(start // MINUTES_PER_DAY))
+
+    def book(self, start, end, patient_id):
+        idx = bisect.bisect_left(self.starts, start)
+        self.starts.insert(idx, start)
+        self.ends.insert(idx, end)
+        self.patients.insert(idx, patient_id)
+
+    def cancel(self, start):
+        """Remove the booking starting at `start`, returns its patient id or None"""
+        idx = bisect.bisect_left(self.starts, start)
+        if idx == len(self.starts) or self.starts[idx] != start:
+            return None
+        del self.starts[idx]
+        del self.ends[idx]
+        return self.patients.pop(idx)
+
+    def cancel_patient(self, patient_id):
+        """Remove every booking of a patient, returns how many there were"""
+        keep = [i for i, booked in enumerate(self.patients) if booked != patient_id]
+        removed = len(self.patients) - len(keep)
+        if removed:
+            self.starts = [self.starts[i] for i in keep]
+            self.ends = [self.ends[i] for i in keep]
+            self.patients = [self.patients[i] for i in keep]
+        return removed
+
+    def bookings_between(self, lo, hi):
+        """Bookings starting in [lo, hi) as (start, end, patient_id)"""
+        first = bisect.bisect_left(self.starts, lo)
+        last = bisect.bisect_left(self.starts, hi)
+        return [(self.starts[i], self.ends[i], self.patients[i]) for i in range(first, last)]
+
+    def free_gaps(self, day, min_length=1):
+        """Free (start, end) intervals inside the shifts of a day ordinal"""
+        gaps = []
+        for window_start, window_end in self.shift_windows(day):
+            cursor = window_start
+            # A booking that started earlier may still be running at the window start
+            idx = bisect.bisect_right(self.starts, window_start)
+            if idx > 0 and self.ends[idx - 1] > cursor:
+                cursor = self.ends[idx - 1]
+            while idx < len(self.starts) and self.starts[idx] < window_end:
+                if self.starts[idx] - cursor >= min_length:
+                    gaps.append((cursor, self.starts[idx]))
+                cursor = max(cursor, self.ends[idx])
+                idx += 1
+            if window_end - cursor >= min_length:
+                gaps.append((cursor, window_end))
+        return gaps
+
+    def to_json(self):
+        return {
+            "shifts": {str(weekday): [[start, end] for start, end in windows]
+                       for weekday, windows in self.shifts.items()},
+            "bookings": [
+                {"start": from_minutes(start).isoformat(timespec="minutes"),
+                 "minutes": end - start, "patient_id": patient_id}
+                for start, end, patient_id in zip(self.starts, self.ends, self.patients)
+            ]
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        calendar = cls({int(weekday): [tuple(window) for window in windows]
+                        for weekday, windows in data.get("shifts", {}).items()})
+        for booking in data.get("bookings", []):
+            start = to_minutes(datetime.fromisoformat(booking["start"]))
+            calendar.starts.append(start)
+            calendar.ends.append(start + booking["minutes"])
+            calendar.patients.append(booking["patient_id"])
+        return calendar
+
+
+def daily_shifts(start_hour, end_hour):
+    """Template with the same shift on every day of the week"""
+    return {weekday: [(start_hour * 60, end_hour * 60)] for weekday in range(7)}
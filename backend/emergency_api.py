@@ -1,15 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import heapq
-from typing import List, Optional
+from typing import List, Optional, Dict
+from contextlib import asynccontextmanager
+import os
+import threading
 import time
 from datetime import datetime
+from triage_index import TriageIndex, decode_cursor, parse_severity
+from triage_journal import TriageJournal, replay_queue, checkpoint_records
+from symptom_index import SymptomIndex
+from triage_stats import TriageStats
+import json
+
+@asynccontextmanager
+async def lifespan(app):
+    restore_queue()
+    yield
+    triage_journal.close()
 
 app = FastAPI(
     title="Emergency Triage Management API",
     version="1.0.0",
-    description="Hospital Emergency Management System with priority-based patient queue"
+    description="Hospital Emergency Management System with priority-based patient queue",
+    lifespan=lifespan
 )
 
 # Enable CORS for React frontend
@@ -19,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Severity classification dictionary (from Emergency_Management.py)
@@ -80,6 +96,14 @@ patient_queue = []
 arrival_counter = [0]
 patient_start_times = {}
 patient_doctors = {}
+# Ordered view of patient_queue for paginated listing
+queue_index = TriageIndex()
+# Queue mutations are journaled so a restart can rebuild the queue
+JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emergency_journal.jsonl")
+triage_journal = TriageJournal(JOURNAL_FILE)
+queue_lock = threading.Lock()
+# Severity counters kept up to date on every push and pop
+queue_stats = TriageStats()
 
 # Pydantic models
 class PatientInput(BaseModel):
@@ -105,6 +129,21 @@ class StatsResponse(BaseModel):
     Normal: int
     total: int
 
+class SeverityStats(BaseModel):
+    waiting: int
+    arrivals: int
+    treated: int
+    averageWaitMinutes: float
+    maxWaitMinutes: float
+    longestWaitingMinutes: float
+    treatedLastHour: int
+
+class DetailedStatsResponse(BaseModel):
+    severities: Dict[str, SeverityStats]
+    total: int
+    totalArrivals: int
+    treatedLastHour: int
+
 class MessageResponse(BaseModel):
     message: str
     patient: dict
@@ -119,6 +158,13 @@ def get_severity_label(priority: int) -> str:
     labels = {1: "Critical", 2: "Serious", 3: "Moderate", 4: "Normal"}
     return labels.get(priority, "Normal")
 
+# Symptom lookup and the symptom list response are built once at startup
+symptom_index = SymptomIndex(severity_map)
+symptoms_payload = json.dumps([
+    {"name": name.title(), "severity": get_severity_label(priority), "priority": priority}
+    for name, priority in symptom_index.catalog
+]).encode()
+
 def format_time_ago(start_time):
     elapsed = int(time.time() - start_time)
     if elapsed < 60:
@@ -166,6 +212,29 @@ def create_patient(name: str, age: int, symptom: str):
     
     return (priority, arrival, patient)
 
+def restore_queue():
+    """Rebuild the queue by replaying the journal, then start journaling"""
+    live, counter = replay_queue(triage_journal.read())
+    
+    with queue_lock:
+        for record in live:
+            priority, arrival, patient = record["priority"], record["arrival"], record["patient"]
+            heapq.heappush(patient_queue, (priority, arrival, patient))
+            queue_index.push(priority, arrival, patient)
+            queue_stats.push(priority, record["doctor"], restored=True)
+            patient_start_times[arrival] = record["start"]
+            patient_doctors[arrival] = record["doctor"]
+        arrival_counter[0] = counter
+    
+    triage_journal.open(checkpoint_records(live, counter))
+
+def wait_durable(seq):
+    """Wait for a journaled mutation to reach disk; 503 if the journal can no longer be written"""
+    try:
+        triage_journal.wait(seq)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Triage journal is not writable: {e}")
+
 # API Endpoints
 @app.get("/", tags=["Root"])
 def root():
@@ -173,17 +242,38 @@ def root():
         "message": "Emergency Triage Management API",
         "version": "1.0.0",
         "status": "active",
-        "queue_size": len(patient_queue),
+        "queue_size": queue_stats.total_waiting,
         "docs": "/docs"
     }
 
 @app.get("/api/patients", response_model=List[PatientResponse], tags=["Patients"])
-def get_patients():
-    """Get all patients in queue sorted by priority (Critical first)"""
-    sorted_queue = sorted(patient_queue)
+def get_patients(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """Get patients in queue sorted by priority (Critical first), optionally paginated"""
+    priority_filter = None
+    if severity is not None:
+        priority_filter = parse_severity(severity)
+        if priority_filter is None:
+            raise HTTPException(status_code=400, detail=f"Unknown severity '{severity}'")
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+    
+    page, next_cursor = queue_index.page(limit=limit, cursor=after, priority=priority_filter)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
     patients_list = []
     
-    for priority, arrival, patient in sorted_queue:
+    for priority, arrival, patient, _ in page:
         time_str = format_time_ago(patient_start_times.get(arrival, time.time()))
         waiting_mins = get_waiting_minutes(patient_start_times.get(arrival, time.time()))
         
@@ -204,33 +294,42 @@ def get_patients():
 @app.post("/api/patients", response_model=MessageResponse, status_code=201, tags=["Patients"])
 def add_patient(patient_input: PatientInput):
     """Add a new patient to the emergency queue"""
-    symptom_lower = patient_input.symptom.lower().strip()
-    
-    # Validate symptom exists in severity map
-    if symptom_lower not in severity_map:
-        # Try to find close matches
-        available_symptoms = list(severity_map.keys())
+    # Resolve to the most severe listed symptom; anything not certain is sent back, not guessed
+    match, matches, unmatched = symptom_index.resolve(patient_input.symptom)
+    if match is None or unmatched:
         raise HTTPException(
             status_code=400,
             detail={
                 "error": "Unknown symptom",
                 "symptom": patient_input.symptom,
                 "message": "Please select a valid symptom from the list",
-                "available_symptoms": available_symptoms
+                "unmatched": unmatched,
+                "suggestions": {part: symptom_index.suggest(part, 5) for part in unmatched}
             }
         )
+    symptom_lower = match[0]
     
-    # Create patient using the logic from Emergency_Management.py
-    patient_tuple = create_patient(
-        patient_input.name,
-        patient_input.age,
-        symptom_lower
-    )
-    
-    # Add to priority queue
-    heapq.heappush(patient_queue, patient_tuple)
+    with queue_lock:
+        # Create patient using the logic from Emergency_Management.py
+        patient_tuple = create_patient(
+            patient_input.name,
+            patient_input.age,
+            symptom_lower
+        )
+        
+        # Add to priority queue
+        heapq.heappush(patient_queue, patient_tuple)
+        
+        priority, arrival, patient = patient_tuple
+        queue_index.push(priority, arrival, patient)
+        queue_stats.push(priority, patient_doctors[arrival])
+        
+        seq = triage_journal.append({
+            "op": "add", "arrival": arrival, "counter": arrival_counter[0], "priority": priority,
+            "patient": patient, "start": patient_start_times[arrival], "doctor": patient_doctors[arrival]
+        })
+    wait_durable(seq)
     
-    priority, arrival, patient = patient_tuple
     severity_label = get_severity_label(priority)
     
     return MessageResponse(
@@ -242,31 +341,39 @@ def add_patient(patient_input: PatientInput):
             "condition": patient['symptom'].title(),
             "doctor": patient_doctors.get(arrival, "Unassigned"),
             "position": len(patient_queue),
-            "queuePosition": sum(1 for p in patient_queue if p[0] <= priority)
+            "queuePosition": queue_index.position(priority, arrival),
+            "matchedSymptoms": [name.title() for name, _, _ in matches]
         }
     )
 
 @app.post("/api/patients/treat", response_model=MessageResponse, tags=["Patients"])
 def treat_next_patient():
     """Treat the next patient (highest priority, earliest arrival)"""
-    if not patient_queue:
-        raise HTTPException(status_code=400, detail="No patients in queue")
-    
-    priority, arrival, patient = heapq.heappop(patient_queue)
+    with queue_lock:
+        if not patient_queue:
+            raise HTTPException(status_code=400, detail="No patients in queue")
+        
+        priority, arrival, patient = heapq.heappop(patient_queue)
+        queue_index.remove(priority, arrival)
+        
+        # Calculate waiting time
+        now = time.time()
+        wait_time = get_waiting_minutes(patient_start_times.get(arrival, now))
+        queue_stats.pop(priority, patient_doctors.get(arrival), now - patient_start_times.get(arrival, now), now)
+        
+        # Clean up tracking
+        if arrival in patient_start_times:
+            del patient_start_times[arrival]
+        if arrival in patient_doctors:
+            doctor = patient_doctors[arrival]
+            del patient_doctors[arrival]
+        else:
+            doctor = "Unknown"
+        
+        seq = triage_journal.append({"op": "treat", "arrival": arrival})
+    wait_durable(seq)
     severity_label = get_severity_label(priority)
     
-    # Calculate waiting time
-    wait_time = get_waiting_minutes(patient_start_times.get(arrival, time.time()))
-    
-    # Clean up tracking
-    if arrival in patient_start_times:
-        del patient_start_times[arrival]
-    if arrival in patient_doctors:
-        doctor = patient_doctors[arrival]
-        del patient_doctors[arrival]
-    else:
-        doctor = "Unknown"
-    
     return MessageResponse(
         message=f"Patient '{patient['name']}' is being treated",
         patient={
@@ -284,42 +391,64 @@ def get_stats():
     """Get patient count by severity level"""
     stats = {'Critical': 0, 'Serious': 0, 'Moderate': 0, 'Normal': 0}
     
-    for priority, _, _ in patient_queue:
-        severity_label = get_severity_label(priority)
-        stats[severity_label] += 1
+    for priority, count in queue_stats.waiting.items():
+        stats[get_severity_label(priority)] += count
     
     return StatsResponse(
         Critical=stats['Critical'],
         Serious=stats['Serious'],
         Moderate=stats['Moderate'],
         Normal=stats['Normal'],
-        total=len(patient_queue)
+        total=queue_stats.total_waiting
+    )
+
+@app.get("/api/stats/detailed", response_model=DetailedStatsResponse, tags=["Statistics"])
+def get_detailed_stats():
+    """Get waiting counts, arrivals, wait times and treatment rate per severity"""
+    now = time.time()
+    oldest_starts = {}
+    for priority in queue_stats.waiting:
+        arrival = queue_index.oldest(priority)
+        oldest_starts[priority] = patient_start_times.get(arrival) if arrival is not None else None
+    
+    severities = {}
+    for priority, figures in queue_stats.snapshot(now, oldest_starts).items():
+        severities[get_severity_label(priority)] = figures
+    
+    return DetailedStatsResponse(
+        severities=severities,
+        total=queue_stats.total_waiting,
+        totalArrivals=arrival_counter[0],
+        treatedLastHour=sum(figures["treatedLastHour"] for figures in severities.values())
     )
 
 @app.get("/api/symptoms", response_model=List[SymptomCategory], tags=["Symptoms"])
 def get_symptoms():
     """Get all available symptoms categorized by severity"""
-    symptoms_list = []
-    
-    for symptom, priority in severity_map.items():
-        symptoms_list.append(SymptomCategory(
-            name=symptom.title(),
-            severity=get_severity_label(priority),
-            priority=priority
-        ))
-    
-    # Sort by priority then name
-    symptoms_list.sort(key=lambda x: (x.priority, x.name))
-    return symptoms_list
+    return Response(content=symptoms_payload, media_type="application/json")
+
+@app.get("/api/symptoms/search", response_model=List[SymptomCategory], tags=["Symptoms"])
+def search_symptoms(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete symptoms by word prefix, with typo-tolerant fallback"""
+    results = []
+    for name in symptom_index.suggest(q, limit):
+        priority = symptom_index.severity[name]
+        results.append(SymptomCategory(name=name.title(), severity=get_severity_label(priority), priority=priority))
+    return results
 
 @app.delete("/api/patients/clear", tags=["Admin"])
 def clear_queue():
     """Clear all patients from queue (for testing/reset)"""
-    count = len(patient_queue)
-    patient_queue.clear()
-    patient_start_times.clear()
-    patient_doctors.clear()
-    arrival_counter[0] = 0
+    with queue_lock:
+        count = len(patient_queue)
+        patient_queue.clear()
+        queue_index.clear()
+        queue_stats.clear_waiting()
+        patient_start_times.clear()
+        patient_doctors.clear()
+        arrival_counter[0] = 0
+        seq = triage_journal.append({"op": "clear"})
+    wait_durable(seq)
     
     return {
         "message": "Queue cleared successfully",
@@ -332,9 +461,9 @@ def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "queue_size": len(patient_queue),
+        "queue_size": queue_stats.total_waiting,
         "total_arrivals": arrival_counter[0],
-        "active_doctors": len(set(patient_doctors.values()))
+        "active_doctors": len(queue_stats.doctor_load)
     }
 
 @app.get("/api/queue/next", tags=["Queue"])
@@ -343,9 +472,8 @@ def peek_next_patient():
     if not patient_queue:
         return {"message": "No patients in queue", "patient": None}
     
-    # Get the patient with highest priority without removing
-    sorted_queue = sorted(patient_queue)
-    priority, arrival, patient = sorted_queue[0]
+    # Heap root is the patient with highest priority
+    priority, arrival, patient = patient_queue[0]
     
     return {
         "message": "Next patient to be treated",
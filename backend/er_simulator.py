@@ -0,0 +1,221 @@
+"""
+Discrete-event simulation of the emergency room on top of the real triage engine.
+
+Arrivals and treatments run on a simulated clock, while every registration and
+treatment goes through the API's own add_patient / treat functions (and so
+through create_patient, assign_doctor, the heap and its indexes). The report
+shows queue-length and wait-time percentiles per severity for the given load,
+plus how many engine operations per second the code sustains.
+
+Usage:
+    python er_simulator.py --arrivals-per-hour 40 --hours 24
+    python er_simulator.py --api unified --events 1000000 --json
+"""
+import argparse
+import heapq
+import importlib
+import json
+import random
+import time
+
+SEVERITIES = ["Critical", "Serious", "Moderate", "Normal"]
+DEFAULT_MIX = "0.1,0.25,0.35,0.3"
+DEFAULT_TREATMENT_MINUTES = "45,30,20,10"
+
+ARRIVAL, DONE = 0, 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(values):
+    values.sort()
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 2),
+        "p90": round(percentile(values, 90), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2) if values else 0
+    }
+
+
+class TriageEngine:
+    """Adapter over the triage API module being simulated"""
+
+    def __init__(self, api_name):
+        self.api = importlib.import_module(api_name)
+        if api_name == "unified_api":
+            self.add, self.treat, self.clear = (self.api.add_patient, self.api.treat_patient,
+                                                self.api.clear_emergency_queue)
+        else:
+            self.add, self.treat, self.clear = (self.api.add_patient, self.api.treat_next_patient,
+                                                self.api.clear_queue)
+
+        # Symptoms of each severity, to draw arrivals from
+        self.symptoms = {label: [] for label in SEVERITIES}
+        for symptom, priority in self.api.severity_map.items():
+            self.symptoms[self.api.get_severity_label(priority)].append(symptom)
+        self.calls = 0
+        self.busy = 0.0
+
+    def register(self, name, symptom):
+        start = time.perf_counter()
+        self.add(self.api.PatientInput(name=name, age=40, symptom=symptom))
+        self.busy += time.perf_counter() - start
+        self.calls += 1
+
+    def next_patient(self):
+        start = time.perf_counter()
+        result = self.treat().patient
+        self.busy += time.perf_counter() - start
+        self.calls += 1
+        return result
+
+    def queue_size(self):
+        return len(self.api.patient_queue)
+
+
+def simulate(engine, arrivals_per_hour, doctors, mix, treatment_minutes, hours=None, events=None, seed=1):
+    rng = random.Random(seed)
+    engine.clear()
+
+    clock = 0.0  # minutes
+    end_time = hours * 60 if hours else float("inf")
+    max_events = events or float("inf")
+    free_doctors = doctors
+    arrival_times = {}
+    waits = {label: [] for label in SEVERITIES}
+    queue_lengths = []
+    doctor_load = {}
+    treated = 0
+    processed = 0
+    seq = 0
+
+    pending = [(rng.expovariate(arrivals_per_hour / 60), seq, ARRIVAL)]
+
+    def dispatch():
+        nonlocal free_doctors, treated, seq
+        while free_doctors and engine.queue_size():
+            patient = engine.next_patient()
+            waits[patient["severity"]].append(clock - arrival_times.pop(patient["name"]))
+            doctor_load[patient["doctor"]] = doctor_load.get(patient["doctor"], 0) + 1
+            free_doctors -= 1
+            treated += 1
+            seq += 1
+            duration = rng.expovariate(1 / treatment_minutes[patient["severity"]])
+            heapq.heappush(pending, (clock + duration, seq, DONE))
+
+    wall_start = time.perf_counter()
+    while pending and processed < max_events:
+        clock, _, kind = heapq.heappop(pending)
+        if clock > end_time:
+            break
+        processed += 1
+
+        if kind == ARRIVAL:
+            severity = rng.choices(SEVERITIES, weights=mix)[0]
+            name = f"sim-{seq}"
+            arrival_times[name] = clock
+            engine.register(name, rng.choice(engine.symptoms[severity]))
+            # Poisson arrivals see time averages, so sampling here is unbiased
+            queue_lengths.append(engine.queue_size())
+            seq += 1
+            heapq.heappush(pending, (clock + rng.expovariate(arrivals_per_hour / 60), seq, ARRIVAL))
+        else:
+            free_doctors += 1
+        dispatch()
+    wall_seconds = time.perf_counter() - wall_start
+
+    simulated_hours = clock / 60
+    return {
+        "config": {
+            "arrivals_per_hour": arrivals_per_hour,
+            "doctors": doctors,
+            "mix": dict(zip(SEVERITIES, mix)),
+            "treatment_minutes": treatment_minutes,
+            "seed": seed
+        },
+        "events": processed,
+        "simulated_hours": round(simulated_hours, 2),
+        "treated": treated,
+        "treated_per_hour": round(treated / simulated_hours, 2) if simulated_hours else 0,
+        "still_waiting": engine.queue_size(),
+        "queue_length": summarize(queue_lengths),
+        "wait_minutes": {label: summarize(values) for label, values in waits.items()},
+        "doctor_assignments": dict(sorted(doctor_load.items())),
+        "engine_calls": engine.calls,
+        "engine_ops_per_sec": round(engine.calls / engine.busy) if engine.busy else 0,
+        "wall_seconds": round(wall_seconds, 2),
+        "events_per_sec": round(processed / wall_seconds) if wall_seconds else 0
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print("=" * 60)
+    print(f"🚑 ER simulation: {config['arrivals_per_hour']} arrivals/hr, {config['doctors']} doctors")
+    print("=" * 60)
+    print(f"Events: {report['events']}  Simulated: {report['simulated_hours']} hr  "
+          f"Wall: {report['wall_seconds']} s")
+    print(f"Treated: {report['treated']} ({report['treated_per_hour']}/hr)  "
+          f"Still waiting: {report['still_waiting']}")
+    q = report["queue_length"]
+    print(f"Queue length  p50={q['p50']}  p90={q['p90']}  p99={q['p99']}  max={q['max']}")
+    print("Wait (minutes):")
+    for label, w in report["wait_minutes"].items():
+        print(f"  {label:<9} n={w['count']:<8} p50={w['p50']:<8} p90={w['p90']:<8} "
+              f"p99={w['p99']:<8} max={w['max']}")
+    print(f"Engine: {report['engine_calls']} calls, {report['engine_ops_per_sec']} ops/sec "
+          f"({report['events_per_sec']} simulated events/sec overall)")
+
+
+def parse_floats(text, count, option):
+    values = [float(v) for v in text.split(",")]
+    if len(values) != count:
+        raise SystemExit(f"{option} needs {count} comma-separated values (Critical,Serious,Moderate,Normal)")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event ER simulator over the triage engine")
+    parser.add_argument("--api", choices=["emergency", "unified"], default="emergency",
+                        help="which triage API module to drive")
+    parser.add_argument("--arrivals-per-hour", type=float, default=30)
+    parser.add_argument("--doctors", type=int, default=None, help="defaults to the API's doctor pool size")
+    parser.add_argument("--hours", type=float, default=None, help="simulated hours to run")
+    parser.add_argument("--events", type=int, default=None, help="stop after this many arrival/treatment events")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="severity weights Critical,Serious,Moderate,Normal")
+    parser.add_argument("--treatment-minutes", default=DEFAULT_TREATMENT_MINUTES,
+                        help="mean treatment minutes per severity (exponential)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.hours is None and args.events is None:
+        args.hours = 24
+
+    engine = TriageEngine("unified_api" if args.api == "unified" else "emergency_api")
+    report = simulate(
+        engine,
+        arrivals_per_hour=args.arrivals_per_hour,
+        doctors=args.doctors or len(engine.api.doctors),
+        mix=parse_floats(args.mix, 4, "--mix"),
+        treatment_minutes=dict(zip(SEVERITIES, parse_floats(args.treatment_minutes, 4, "--treatment-minutes"))),
+        hours=args.hours,
+        events=args.events,
+        seed=args.seed
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import heapq
+import json
+import re
+import threading
+from collections import deque
+from datetime import datetime, date
+
+from pharmacy_locations import serial_location
+
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def normalize_expiry(value):
+    """'2026-3-5' -> '2026-03-05'; raises ValueError for anything that is not a date"""
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date().isoformat()
+
+
+class ExpirySweeper:
+    """
+    Retires expired medicine serials in the background.
+
+    Every serial in the inventory sits on one global min-heap of
+    (expiry, medicine, serial), with expiry as an ISO date string so
+    comparisons never parse dates. A daemon thread sleeps until the day the
+    head expires, then pops everything due and removes it from the store in
+    batches of `batch_size`, so billing never waits long on the lock, then
+    saves once and appends the retired serials to the write-off log.
+    Serials sold or removed in the meantime stay on the heap and are skipped
+    when they surface. Inventory changes all happen under the store's
+    registry lock, which each batch takes once.
+    """
+
+    def __init__(self, store, log_path, batch_size=500, max_sleep=3600, on_retire=None):
+        self.store = store  # RegistryStore of {medicine: {"stock", "serials"}}
+        self.log_path = log_path
+        self.on_retire = on_retire  # called with each batch's write-offs, under the registry lock
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep  # re-check at least this often in case the clock jumps
+        self.heap = []
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.retired = 0  # serials written off since startup
+
+    def build(self):
+        """Put every serial in the store on the heap; serials with unreadable expiry dates are left alone"""
+        entries = []
+        for name, record in self.store.items():
+            for serial, details in record.get("serials", {}).items():
+                try:
+                    if not ISO_DATE.fullmatch(details["expiry"]):
+                        details["expiry"] = normalize_expiry(details["expiry"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                entries.append((details["expiry"], name, serial))
+        heapq.heapify(entries)
+        with self.cond:
+            self.heap = entries
+            self.cond.notify()
+
+    def add(self, medicine, serial, expiry):
+        with self.cond:
+            heapq.heappush(self.heap, (expiry, medicine, serial))
+            if self.heap[0] == (expiry, medicine, serial):
+                self.cond.notify()
+
+    def clear(self):
+        with self.cond:
+            self.heap = []
+
+    def _live(self, entry):
+        expiry, name, serial = entry
+        record = self.store.get(name)
+        details = record["serials"].get(serial) if record else None
+        return details is not None and details["expiry"] == expiry
+
+    def next_expiry(self):
+        """(expiry, medicine, serial) of the serial that expires first, or None"""
+        with self.cond:
+            while self.heap and not self._live(self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0] if self.heap else None
+
+    def sweep(self, today=None):
+        """Retire every serial expiring on or before `today` (ISO date), returns the write-offs"""
+        today = today or date.today().isoformat()
+        retired = []
+        while True:
+            with self.cond:
+                batch = []
+                while self.heap and self.heap[0][0] <= today and len(batch) < self.batch_size:
+                    batch.append(heapq.heappop(self.heap))
+            if not batch:
+                break
+            retired.extend(self._retire(batch))
+        if not retired:
+            return retired
+
+        # One save and one log append for the whole sweep; the log is written
+        # after the save so it never lists a serial the inventory still holds
+        self.store.save()
+        with open(self.log_path, 'a') as f:
+            f.write("".join(json.dumps(w) + "\n" for w in retired))
+        with self.cond:
+            self.retired += len(retired)
+        return retired
+
+    def _retire(self, batch):
+        """Remove one batch of due serials under the registry lock, returns their write-offs"""
+        retired_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        write_offs = []
+        with self.store.registry_lock:
+            for expiry, name, serial in batch:
+                record = self.store.get(name)
+                details = record["serials"].get(serial) if record else None
+                if details is None or details["expiry"] != expiry:
+                    continue
+                del record["serials"][serial]
+                record["stock"] = len(record["serials"])
+                write_offs.append({"medicine": name, "serial": serial, "expiry": expiry,
+                                   "price": details.get("price"), "location": serial_location(details),
+                                   "retired_at": retired_at})
+            if write_offs and self.on_retire is not None:
+                self.on_retire(write_offs)
+        return write_offs
+
+    def _seconds_until_due(self):
+        """Seconds until the head's expiry day starts (0 if already due), None if the heap is empty"""
+        if not self.heap:
+            return None
+        due = datetime.combine(date.fromisoformat(self.heap[0][0]), datetime.min.time())
+        return max(0.0, (due - datetime.now()).total_seconds())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    wait = self._seconds_until_due()
+                    if wait == 0:
+                        break
+                    self.cond.wait(self.max_sleep if wait is None else min(wait, self.max_sleep))
+                if self.stopping:
+                    return
+            self.sweep()
+
+    def start(self):
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def write_offs(self, limit=None):
+        """Write-offs recorded in the log, oldest first (the last `limit` if given)"""
+        try:
+            with open(self.log_path, 'r') as f:
+                lines = deque(f, maxlen=limit) if limit else f.readlines()
+        except OSError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return records
@@ -0,0 +1,95 @@
+import heapq
+
+from pharmacy_locations import serial_location
+
+
+class FefoIndex:
+    """
+    Serials of each medicine in first-expiry-first-out order: one min-heap
+    of (expiry, serial) per medicine and pharmacy location. Entries are
+    not removed when a serial is sold, removed or written off elsewhere;
+    take() drops them when they surface, and a heap is rebuilt from the
+    inventory once it holds more stale entries than live ones.
+    Dispensing N serials is N pops, O(N log n).
+    """
+
+    def __init__(self):
+        self.heaps = {}  # medicine -> {location: [(expiry, serial)]}
+
+    def build(self, medicines):
+        """(Re)index from (name, record) pairs of the inventory"""
+        self.heaps = {}
+        for name, record in medicines:
+            self.rebuild(name, record)
+
+    def rebuild(self, medicine, record):
+        by_location = {}
+        for serial, details in record.get("serials", {}).items():
+            by_location.setdefault(serial_location(details), []).append((details["expiry"], serial))
+        for heap in by_location.values():
+            heapq.heapify(heap)
+        if by_location:
+            self.heaps[medicine] = by_location
+        else:
+            self.heaps.pop(medicine, None)
+
+    def add(self, medicine, record, serial):
+        """Index a serial just added to `record`"""
+        details = record["serials"][serial]
+        by_location = self.heaps.setdefault(medicine, {})
+        heapq.heappush(by_location.setdefault(serial_location(details), []), (details["expiry"], serial))
+        if sum(map(len, by_location.values())) > 2 * len(record["serials"]) + 16:
+            self.rebuild(medicine, record)
+
+    def clear(self):
+        self.heaps = {}
+
+    @staticmethod
+    def _head(at, heap, serials, today, chosen=()):
+        """Drop stale, expired or already chosen entries from the top of a heap"""
+        while heap:
+            expiry, serial = heap[0]
+            details = serials.get(serial)
+            # Sold, moved or re-added since it was pushed, or expired: never sellable from here again
+            if (details is None or details["expiry"] != expiry or serial_location(details) != at
+                    or serial in chosen or expiry <= today):
+                heapq.heappop(heap)
+                continue
+            return heap[0]
+        return None
+
+    def nearest(self, medicine, serials, today):
+        """Earliest expiry of a serial still good after `today`, or None"""
+        heads = [self._head(at, heap, serials, today) for at, heap in self.heaps.get(medicine, {}).items()]
+        return min((head[0] for head in heads if head), default=None)
+
+    def take(self, medicine, serials, quantity, today, location=None):
+        """
+        Pop up to `quantity` serials that are still good after `today`,
+        earliest expiry first, from `location` or from any location.
+        `serials` is the medicine's serial dict, used to skip stale entries.
+        Returns the serials in order; if there are fewer than `quantity`
+        they are pushed back and the short list is returned.
+        """
+        by_location = self.heaps.get(medicine, {})
+        if location:
+            heaps = [(location, by_location[location])] if location in by_location else []
+        else:
+            heaps = list(by_location.items())
+        taken = []
+        chosen = set()
+        while len(taken) < quantity:
+            best = None
+            for at, heap in heaps:
+                head = self._head(at, heap, serials, today, chosen)
+                if head and (best is None or head < best[0]):
+                    best = heap
+            if best is None:
+                break
+            entry = heapq.heappop(best)
+            chosen.add(entry[1])
+            taken.append((best, entry))
+        if len(taken) < quantity:
+            for heap, entry in taken:
+                heapq.heappush(heap, entry)
+        return [serial for _, (_, serial) in taken]
@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+
+class IdAllocator:
+    """
+    Monotonic id sequence that survives restarts and never reuses an id.
+
+    The file holds, per sequence name, the highest id reserved so far.
+    Ids are handed out from memory and a new block of `block_size` ids is
+    reserved (file rewritten atomically) only when the current one runs
+    out, so allocation is O(1) and touches disk once per block. Several
+    sequences can share one file. Reservations take an exclusive lock on
+    the file where the platform has flock, so worker processes get disjoint
+    blocks. Ids left in a block when the process stops are skipped, never
+    reissued.
+    """
+
+    def __init__(self, path, name, seed=0, block_size=50):
+        self.path = path
+        self.name = name
+        self.seed = seed  # highest id already in use when the sequence was created
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.limit = 0  # last id of the current block
+
+    def allocate(self):
+        with self.lock:
+            if self.next_id > self.limit:
+                self._reserve()
+            allocated = self.next_id
+            self.next_id += 1
+            return allocated
+
+    def _reserve(self):
+        with open(self.path + ".lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path, 'r') as f:
+                    reserved = json.load(f)
+            except (OSError, ValueError):
+                reserved = {}
+
+            start = max(reserved.get(self.name, 0), self.seed, self.next_id - 1) + 1
+            reserved[self.name] = start + self.block_size - 1
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(reserved, f, indent=3)
+            os.replace(tmp_path, self.path)
+            # Lock released when lock_file closes
+
+        self.next_id = start
+        self.limit = start + self.block_size - 1
+
+
+def max_numeric_id(ids):
+    return max((int(i) for i in ids if i.isdigit()), default=0)
@@ -0,0 +1,175 @@
+import heapq
+import re
+from collections import Counter
+
+from text_index import PrefixTrie, edit_distance
+
+
+def normalize_medicine(text):
+    """Lowercase words of letters and digits: 'Paracetamol-500 mg' -> 'paracetamol 500 mg'"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MedicineSearch:
+    """
+    Typo-tolerant lookup of medicines by name or synonym.
+
+    - exact names and synonyms (terms) resolve through a dict
+    - a prefix trie over every word-start of a term serves autocomplete
+      ("500" completes "paracetamol 500")
+    - a trigram index over the words of all terms finds the few words that
+      could be within the allowed typos of a query word, and only those are
+      checked with edit_distance, so a fuzzy lookup does not walk every
+      name as a BK-tree over 100k names would
+
+    Terms are added and removed one medicine at a time; words and trigrams
+    are dropped when no term uses them any more.
+    """
+
+    def __init__(self, max_checks=200):
+        self.max_checks = max_checks  # edit distances computed per query word
+        self.clear()
+
+    def clear(self):
+        self.terms_of = {}      # medicine -> set of terms
+        self.medicines_of = {}  # term -> set of medicines
+        self.terms_with = {}    # word -> set of terms containing it
+        self.words_with = {}    # trigram -> set of words
+        self.trie = PrefixTrie()  # word-start phrase of a term -> term
+
+    def __len__(self):
+        return len(self.terms_of)
+
+    def build(self, medicines):
+        """Index (name, synonyms) pairs"""
+        self.clear()
+        for name, synonyms in medicines:
+            self.add(name, synonyms)
+
+    def add(self, medicine, synonyms=()):
+        """Index a medicine under its name and synonyms, replacing what it had"""
+        self.remove(medicine)
+        terms = {normalize_medicine(text) for text in (medicine, *synonyms)} - {""}
+        self.terms_of[medicine] = terms
+        for term in terms:
+            if term not in self.medicines_of:
+                self._add_term(term)
+            self.medicines_of.setdefault(term, set()).add(medicine)
+
+    def remove(self, medicine):
+        for term in self.terms_of.pop(medicine, ()):
+            medicines = self.medicines_of[term]
+            medicines.discard(medicine)
+            if not medicines:
+                del self.medicines_of[term]
+                self._remove_term(term)
+
+    def _add_term(self, term):
+        words = term.split(" ")
+        for i, word in enumerate(words):
+            self.trie.insert(" ".join(words[i:]), term)
+            if word not in self.terms_with:
+                for gram in trigrams(word):
+                    self.words_with.setdefault(gram, set()).add(word)
+            self.terms_with.setdefault(word, set()).add(term)
+
+    def _remove_term(self, term):
+        words = term.split(" ")
+        for i, word in enumerate(words):
+            self.trie.remove(" ".join(words[i:]), term)
+            terms = self.terms_with.get(word)
+            if terms is None:
+                continue
+            terms.discard(term)
+            if not terms:
+                del self.terms_with[word]
+                for gram in trigrams(word):
+                    self.words_with[gram].discard(word)
+                    if not self.words_with[gram]:
+                        del self.words_with[gram]
+
+    def max_typos(self, word):
+        return 0 if len(word) <= 3 else 1 if len(word) <= 6 else 2
+
+    def _close_words(self, word, prefix=False):
+        """{word in the index: distance} within max_typos of `word` (of its start, with `prefix`)"""
+        limit = self.max_typos(word)
+        if limit == 0:
+            return {}
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.words_with.get(gram, ()))
+        # Each edit changes at most three trigrams, and a prefix loses the end-padding one;
+        # a whole word is also at most `limit` characters longer or shorter
+        needed = len(grams) - 3 * limit - prefix
+        shortest, longest = len(word) - limit, len(word) + limit
+        candidates = [(count, candidate) for candidate, count in shared.items()
+                      if count >= needed and shortest <= len(candidate) and (prefix or len(candidate) <= longest)]
+        # Close spellings share the most trigrams, so only the best-sharing candidates are checked
+        close = {}
+        for _, candidate in heapq.nlargest(self.max_checks, candidates):
+            distance = edit_distance(word, candidate, limit)
+            if prefix and len(candidate) > len(word):
+                distance = min(distance, edit_distance(word, candidate[:len(word)], limit))
+            if distance <= limit:
+                close[candidate] = distance
+        return close
+
+    def search(self, text, limit=10):
+        """
+        Medicines ranked by how well a name or synonym matches `text`:
+        exact terms, then terms with a word starting with the text, then
+        terms whose words are all within a few typos of the query words
+        (the last query word may be a typo of a word's start).
+        Returns [(medicine, matched term, distance)] with distance 0 for
+        exact and prefix matches.
+        """
+        query = normalize_medicine(text)
+        if not query:
+            return []
+        ranked = {}
+
+        def offer(medicine, term, key):
+            if medicine not in ranked or key < ranked[medicine][0]:
+                ranked[medicine] = (key, term)
+
+        for medicine in self.medicines_of.get(query, ()):
+            offer(medicine, query, (0, 0, 0, len(query)))
+
+        # A term starting with the query beats one with a later word starting with it
+        for phrase, term in self.trie.items(query):
+            for medicine in self.medicines_of[term]:
+                offer(medicine, term, (1, 0, phrase != term, len(term)))
+            if len(ranked) >= limit:
+                break
+
+        if len(ranked) < limit:
+            words = query.split(" ")
+            term_distances = None
+            for i, word in enumerate(words):
+                close = self._close_words(word, prefix=i == len(words) - 1)
+                close.setdefault(word, 0)
+                best = {}
+                for candidate, distance in close.items():
+                    for term in self.terms_with.get(candidate, ()):
+                        if distance < best.get(term, distance + 1):
+                            best[term] = distance
+                if term_distances is None:
+                    term_distances = best
+                else:
+                    term_distances = {term: term_distances[term] + distance
+                                      for term, distance in best.items() if term in term_distances}
+                if not term_distances:
+                    break
+            for term, distance in (term_distances or {}).items():
+                for medicine in self.medicines_of[term]:
+                    offer(medicine, term, (2, distance, 0, len(term)))
+
+        results = sorted(ranked.items(), key=lambda item: (item[1][0], item[0]))[:limit]
+        return [(medicine, term, key[1]) for medicine, (key, term) in results]
@@ -0,0 +1,173 @@
+import base64
+import bisect
+import json
+
+
+def normalize_name(name):
+    return " ".join(name.lower().split())
+
+
+def normalize_contact(contact):
+    """Digits only, so '+91 98765-43210' and '919876543210' match"""
+    return "".join(ch for ch in contact if ch.isdigit())
+
+
+def id_key(patient_id):
+    """Numeric ids order numerically as long as they have no leading zeros"""
+    return len(patient_id), patient_id
+
+
+def encode_cursor(mode, key):
+    return base64.urlsafe_b64encode(json.dumps([mode, *key]).encode()).decode()
+
+
+def decode_cursor(cursor, mode):
+    """Sort key stored in a cursor, raises ValueError if malformed or from another kind of search"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError(cursor)
+    if not isinstance(values, list) or not values or values[0] != mode:
+        raise ValueError(cursor)
+    return tuple(values[1:])
+
+
+class PatientIndex:
+    """
+    Search indexes over the patient registry.
+
+    Names live in one sorted array of (normalized name, patient id): every
+    name starting with a prefix is a contiguous run found by bisect, the way
+    a trie would find it, without a dict per character at a million
+    patients. Contacts map exactly to patient ids, and ages bucket the ids
+    so an age range only visits the matching buckets. Every search returns
+    ids in a stable order together with the sort key of the last one, which
+    serves as the cursor for the next page.
+    """
+
+    def __init__(self):
+        self.keys = []      # sorted (normalized name, patient_id)
+        self.names = {}     # patient_id -> normalized name
+        self.ages = {}      # patient_id -> age
+        self.contact_of = {}  # patient_id -> normalized contact
+        self.contacts = {}  # normalized contact -> set of patient ids
+        self.by_age = {}    # age -> sorted list of id_key(patient_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self, patients):
+        """Index an iterable of (patient_id, record) in one pass"""
+        for patient_id, record in patients:
+            self._register(patient_id, record['name'], record['age'], record['contact'])
+            self.keys.append((self.names[patient_id], patient_id))
+            self.by_age.setdefault(record['age'], []).append(id_key(patient_id))
+        self.keys.sort()
+        for bucket in self.by_age.values():
+            bucket.sort()
+
+    def _register(self, patient_id, name, age, contact):
+        self.names[patient_id] = normalize_name(name)
+        self.ages[patient_id] = age
+        self.contact_of[patient_id] = normalize_contact(contact)
+        self.contacts.setdefault(self.contact_of[patient_id], set()).add(patient_id)
+
+    def add(self, patient_id, name, age, contact):
+        self.remove(patient_id)
+        self._register(patient_id, name, age, contact)
+        bisect.insort(self.keys, (self.names[patient_id], patient_id))
+        bisect.insort(self.by_age.setdefault(age, []), id_key(patient_id))
+
+    def remove(self, patient_id):
+        if patient_id not in self.names:
+            return
+        name = self.names.pop(patient_id)
+        idx = bisect.bisect_left(self.keys, (name, patient_id))
+        del self.keys[idx]
+
+        age = self.ages.pop(patient_id)
+        bucket = self.by_age[age]
+        del bucket[bisect.bisect_left(bucket, id_key(patient_id))]
+        if not bucket:
+            del self.by_age[age]
+
+        contact = self.contact_of.pop(patient_id)
+        self.contacts[contact].discard(patient_id)
+        if not self.contacts[contact]:
+            del self.contacts[contact]
+
+    def named(self, name):
+        """Ids of the patients whose name is exactly `name` (ignoring case and spacing)"""
+        name = normalize_name(name)
+        ids = []
+        i = bisect.bisect_left(self.keys, (name,))
+        while i < len(self.keys) and self.keys[i][0] == name:
+            ids.append(self.keys[i][1])
+            i += 1
+        return ids
+
+    def search(self, name=None, contact=None, min_age=None, max_age=None, limit=20, cursor=None):
+        """
+        Patient ids matching every given filter, at most `limit` of them.
+        Exact contact lookups order by id, name prefixes (or no filter) by name,
+        age-only searches by age. Returns: (list of patient ids, next cursor or None)
+        Raises ValueError for a cursor that does not belong to this kind of search.
+        """
+        prefix = normalize_name(name) if name else ""
+        low = min_age if min_age is not None else float("-inf")
+        high = max_age if max_age is not None else float("inf")
+
+        def wanted(patient_id):
+            return (low <= self.ages[patient_id] <= high
+                    and self.names[patient_id].startswith(prefix))
+
+        if contact is not None:
+            mode = "c"
+        elif prefix or (min_age is None and max_age is None):
+            mode = "n"
+        else:
+            mode = "a"
+        after = decode_cursor(cursor, mode) if cursor else None
+
+        if mode == "c":
+            candidates = self._by_contact(normalize_contact(contact), after)
+        elif mode == "n":
+            candidates = self._by_name(prefix, after)
+        else:
+            candidates = self._by_age(low, high, after)
+
+        results = []
+        last_key = None
+        for key, patient_id in candidates:
+            if not wanted(patient_id):
+                continue
+            if len(results) == limit:
+                return results, encode_cursor(mode, last_key)
+            results.append(patient_id)
+            last_key = key
+        return results, None
+
+    def _by_contact(self, contact, after):
+        for patient_id in sorted(self.contacts.get(contact, ()), key=id_key):
+            if after is None or id_key(patient_id) > after:
+                yield id_key(patient_id), patient_id
+
+    def _by_name(self, prefix, after):
+        idx = bisect.bisect_left(self.keys, (prefix,))
+        if after is not None:
+            idx = max(idx, bisect.bisect_right(self.keys, after))
+        while idx < len(self.keys) and self.keys[idx][0].startswith(prefix):
+            yield self.keys[idx], self.keys[idx][1]
+            idx += 1
+
+    def _by_age(self, low, high, after):
+        for age in sorted(a for a in self.by_age if low <= a <= high):
+            bucket = self.by_age[age]
+            start = 0
+            if after is not None:
+                if age < after[0]:
+                    continue
+                if age == after[0]:
+                    start = bisect.bisect_right(bucket, tuple(after[1:]))
+            for idx in range(start, len(bucket)):
+                yield (age, *bucket[idx]), bucket[idx][1]
@@ -0,0 +1,129 @@
+import base64
+import bisect
+import json
+
+
+def encode_cursor(name, key):
+    return base64.urlsafe_b64encode(json.dumps([name, key]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(name, key) stored in a cursor, raises ValueError if malformed"""
+    try:
+        name, key = json.loads(base64.b64decode(cursor.encode(), altchars=b"-_", validate=True))
+        return str(name), str(key)
+    except Exception:
+        raise ValueError(cursor)
+
+
+class SortedNames:
+    """
+    Names in case-insensitive order in one sorted array of
+    (casefolded name, name, key). Every name starting with a prefix is a
+    contiguous run found by bisect, and a page resumes right after the
+    last entry of the previous one. The key tells apart entries with the
+    same name (it is the name itself unless given).
+    """
+
+    def __init__(self, names=()):
+        self.keys = []
+        self.names = {}  # key -> name
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.names
+
+    def _entry(self, key):
+        name = self.names[key]
+        return name.casefold(), name, key
+
+    def add(self, name, key=None):
+        key = name if key is None else key
+        if self.names.get(key) == name:
+            return
+        self.remove(key)
+        self.names[key] = name
+        bisect.insort(self.keys, self._entry(key))
+
+    def remove(self, key):
+        if key in self.names:
+            del self.keys[bisect.bisect_left(self.keys, self._entry(key))]
+            del self.names[key]
+
+    def clear(self):
+        self.keys = []
+        self.names = {}
+
+    def page(self, prefix="", limit=None, cursor=None):
+        """
+        Keys of the names starting with `prefix` (any case), at most `limit` of them.
+        Returns: (keys, next cursor or None). Raises ValueError for a bad cursor.
+        """
+        prefix = prefix.casefold()
+        i = bisect.bisect_left(self.keys, (prefix,))
+        if cursor:
+            name, key = decode_cursor(cursor)
+            i = max(i, bisect.bisect_right(self.keys, (name.casefold(), name, key)))
+        keys = []
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            if limit is not None and len(keys) == limit:
+                last = self.keys[i - 1]
+                return keys, encode_cursor(last[1], last[2])
+            keys.append(self.keys[i][2])
+            i += 1
+        return keys, None
+
+
+class MedicineCatalog:
+    """
+    Per-medicine aggregates behind the summary listing: medicine names in
+    sorted order for prefix paging, and a count of serials per price so
+    the price range of a medicine is cached and only recomputed when the
+    last serial at its cheapest or dearest price leaves.
+    Changed only under the inventory lock.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.names = SortedNames()
+        self.prices = {}  # medicine -> {price: serials at that price}
+        self.ranges = {}  # medicine -> (min price, max price)
+
+    def build(self, medicines):
+        """(Re)index from (name, record) pairs of the inventory"""
+        self.clear()
+        for name, record in medicines:
+            self.names.add(name)
+            for details in record.get("serials", {}).values():
+                self.add_serial(name, details["price"])
+
+    def add_serial(self, medicine, price):
+        self.names.add(medicine)
+        counts = self.prices.setdefault(medicine, {})
+        counts[price] = counts.get(price, 0) + 1
+        low, high = self.ranges.get(medicine, (price, price))
+        self.ranges[medicine] = (min(low, price), max(high, price))
+
+    def remove_serial(self, medicine, price):
+        counts = self.prices.get(medicine, {})
+        if price not in counts:
+            return
+        counts[price] -= 1
+        if counts[price]:
+            return
+        del counts[price]
+        if not counts:
+            del self.prices[medicine]
+            del self.ranges[medicine]
+        elif price in self.ranges[medicine]:
+            self.ranges[medicine] = (min(counts), max(counts))
+
+    def price_range(self, medicine):
+        """(min price, max price) of the serials in stock, or (None, None)"""
+        return self.ranges.get(medicine, (None, None))
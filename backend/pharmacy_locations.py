@@ -0,0 +1,103 @@
+import bisect
+import heapq
+
+DEFAULT_LOCATION = "PHR"  # serials without a location belong to the main pharmacy
+
+
+def serial_location(details):
+    return details.get("location") or DEFAULT_LOCATION
+
+
+class StockIndex:
+    """
+    Serials in stock per medicine and pharmacy location
+    ({medicine: {location: count}}), kept in step with every inventory
+    change so availability at a location is one dict lookup. Each location
+    also keeps the sorted expiry dates of its serials, so the serials still
+    good after a day are counted with one bisect, without scanning them.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.expiries = {}  # medicine -> {location: sorted expiry dates}
+
+    def build(self, medicines):
+        """(Re)count from (name, record) pairs of the inventory"""
+        self.clear()
+        for name, record in medicines:
+            for details in record.get("serials", {}).values():
+                self.add(name, serial_location(details), details["expiry"])
+
+    def add(self, medicine, location, expiry):
+        by_location = self.counts.setdefault(medicine, {})
+        by_location[location] = by_location.get(location, 0) + 1
+        bisect.insort(self.expiries.setdefault(medicine, {}).setdefault(location, []), expiry)
+
+    def remove(self, medicine, location, expiry):
+        by_location = self.counts.get(medicine, {})
+        if location not in by_location:
+            return
+        by_location[location] -= 1
+        dates = self.expiries[medicine][location]
+        i = bisect.bisect_left(dates, expiry)
+        if i < len(dates) and dates[i] == expiry:
+            del dates[i]
+        if by_location[location] <= 0:
+            del by_location[location]
+            del self.expiries[medicine][location]
+            if not by_location:
+                del self.counts[medicine]
+                del self.expiries[medicine]
+
+    def clear(self):
+        self.counts = {}
+        self.expiries = {}
+
+    def count(self, medicine, location):
+        return self.counts.get(medicine, {}).get(location, 0)
+
+    def available(self, medicine, location, today):
+        """Serials at a location that expire after `today` (ISO date), expired but unretired ones excluded"""
+        dates = self.expiries.get(medicine, {}).get(location, [])
+        return len(dates) - bisect.bisect_right(dates, today)
+
+    def locations(self, medicine):
+        return dict(self.counts.get(medicine, {}))
+
+    def by_location(self):
+        """{location: {"medicines": n, "stock": n}} over the whole inventory"""
+        totals = {}
+        for by_location in self.counts.values():
+            for location, count in by_location.items():
+                entry = totals.setdefault(location, {"medicines": 0, "stock": 0})
+                entry["medicines"] += 1
+                entry["stock"] += count
+        return totals
+
+
+def nearest_stocked(graph, start, stocked):
+    """
+    Dijkstra from `start` that stops at the first node popped for which
+    stocked(node) is true, so nodes farther away than the answer are never
+    settled. Returns (distance, path) or (None, []) if no reachable node
+    is stocked.
+    """
+    distances = {start: 0}
+    previous = {}
+    queue = [(0, start)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        if stocked(node):
+            path = [node]
+            while path[-1] in previous:
+                path.append(previous[path[-1]])
+            return distance, path[::-1]
+        for neighbor, weight in graph.get(node, []):
+            candidate = distance + weight
+            if candidate < distances.get(neighbor, float('inf')):
+                distances[neighbor] = candidate
+                previous[neighbor] = node
+                heapq.heappush(queue, (candidate, neighbor))
+    return None, []
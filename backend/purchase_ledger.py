@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+# One append-only file per column; strings are dictionary-encoded into int32 ids
+COLUMNS = {
+    "timestamp": np.int64,  # seconds since 1970-01-01 of the local bill time
+    "medicine": np.int32,
+    "patient": np.int32,
+    "serial": np.int32,
+    "price": np.float64,
+}
+DICTIONARIES = ("medicine", "patient", "serial")
+GROUPS = ("day", "month", "medicine", "patient")
+
+
+def to_timestamp(value):
+    """'2026-10-19 14:05:00' or '2026-10-19' -> seconds since epoch (ValueError if unreadable)"""
+    return int(np.datetime64(str(value).strip().replace(" ", "T"), 's').astype(np.int64))
+
+
+class StringDictionary:
+    """Strings <-> dense int ids, persisted as one JSON string per line (id = line number)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = []
+        self.ids = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            if len(complete) != len(data):  # torn last line
+                with open(path, 'r+b') as f:
+                    f.truncate(len(complete))
+            for line in complete.decode("utf-8").splitlines():
+                self.ids.setdefault(json.loads(line), len(self.values))
+                self.values.append(json.loads(line))
+        self.file = open(path, 'a', encoding="utf-8")
+
+    def id(self, value):
+        existing = self.ids.get(value)
+        if existing is not None:
+            return existing
+        self.file.write(json.dumps(value) + "\n")
+        self.ids[value] = len(self.values)
+        self.values.append(value)
+        return self.ids[value]
+
+    def relabel(self, mapping):
+        """Rename values through `mapping`; ids keep their number, so several ids may then share a value"""
+        self.values = [mapping.get(value, value) for value in self.values]
+        self.ids = {}
+        for i, value in enumerate(self.values):
+            self.ids.setdefault(value, i)
+        self.file.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as f:
+            f.writelines(json.dumps(value) + "\n" for value in self.values)
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a', encoding="utf-8")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class PurchaseLedger:
+    """
+    Columnar, append-only ledger of pharmacy sales.
+
+    Each column (timestamp, medicine, patient, serial, price) is a flat
+    binary file that only ever grows, and reports read it through a NumPy
+    memory map, so a query touches the columns it needs and never parses
+    JSON. Rows are appended in bill order; a row counts once every column
+    holds it, and a torn tail left by a crash is cut off on open. Date
+    ranges are found by binary search on the timestamp column and group-bys
+    are bincounts over the id, day or month numbers.
+
+    Clearing starts a new generation of column files (timestamp.1.bin, ...)
+    instead of deleting files that reports may still have mapped, which
+    Windows refuses; older generations are removed once nothing maps them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.dictionaries = {name: StringDictionary(os.path.join(directory, f"{name}s.jsonl"))
+                             for name in DICTIONARIES}
+        self.generation = max(self._generations(), default=0)
+        self._remove_old_generations()
+        self.rows = self._recover()
+        self.files = {name: open(self._path(name), 'ab') for name in COLUMNS}
+        self.maps = {}
+        self.mapped_rows = 0
+        timestamps = self._columns(self.rows)["timestamp"]
+        self.ordered = bool(np.all(timestamps[1:] >= timestamps[:-1]))  # False if the clock ever went back
+        self.last_timestamp = int(timestamps[-1]) if self.rows else None
+
+    def _path(self, column, generation=None):
+        generation = self.generation if generation is None else generation
+        name = f"{column}.bin" if generation == 0 else f"{column}.{generation}.bin"
+        return os.path.join(self.directory, name)
+
+    def _generations(self):
+        """Generation numbers of the column files on disk (0 for the unnumbered ones)"""
+        found = set()
+        for file_name in os.listdir(self.directory):
+            match = re.fullmatch(r"(\w+?)(?:\.(\d+))?\.bin", file_name)
+            if match and match.group(1) in COLUMNS:
+                found.add(int(match.group(2) or 0))
+        return found
+
+    def _remove_old_generations(self):
+        for generation in self._generations() - {self.generation}:
+            for name in COLUMNS:
+                try:
+                    os.remove(self._path(name, generation))
+                except OSError:
+                    pass  # missing, or still mapped by a report (Windows); retried on the next clear or start
+
+    def _recover(self):
+        """Rows every column holds in full; longer columns are truncated to that"""
+        rows = min(os.path.getsize(self._path(name)) // np.dtype(dtype).itemsize
+                   if os.path.exists(self._path(name)) else 0
+                   for name, dtype in COLUMNS.items())
+        for name, dtype in COLUMNS.items():
+            if os.path.exists(self._path(name)):
+                with open(self._path(name), 'r+b') as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+        return rows
+
+    def __len__(self):
+        return self.rows
+
+    def append_many(self, sales):
+        """
+        Append sales given as dicts {timestamp, medicine, patient, serial, price}
+        (timestamp in seconds, the rest as strings and a number).
+        """
+        with self.lock:
+            values = {name: [] for name in COLUMNS}
+            for sale in sales:
+                values["timestamp"].append(sale["timestamp"])
+                for name in DICTIONARIES:
+                    values[name].append(self.dictionaries[name].id(str(sale[name])))
+                values["price"].append(sale["price"])
+            if not values["timestamp"]:
+                return
+            # Dictionary entries reach the file before any row that uses them
+            for name in DICTIONARIES:
+                self.dictionaries[name].flush()
+            for name, dtype in COLUMNS.items():
+                self.files[name].write(np.asarray(values[name], dtype=dtype).tobytes())
+                self.files[name].flush()
+            timestamps = values["timestamp"]
+            if self.last_timestamp is not None and timestamps[0] < self.last_timestamp:
+                self.ordered = False
+            if any(b < a for a, b in zip(timestamps, timestamps[1:])):
+                self.ordered = False
+            self.last_timestamp = timestamps[-1]
+            self.rows += len(timestamps)
+
+    def relabel(self, column, mapping):
+        """Rename values of a dictionary-encoded column (e.g. patient names to account ids) in every row"""
+        with self.lock:
+            self.dictionaries[column].relabel(mapping)
+
+    def append(self, timestamp, medicine, patient, serial, price):
+        self.append_many([{"timestamp": timestamp, "medicine": medicine, "patient": patient,
+                           "serial": serial, "price": price}])
+
+    def clear(self):
+        with self.lock:
+            # Drop our maps and move to new files; a report still holding the old maps keeps reading them
+            self.maps = {}
+            self.mapped_rows = 0
+            for name in COLUMNS:
+                self.files[name].close()
+            self.generation += 1
+            self.files = {name: open(self._path(name), 'ab') for name in COLUMNS}
+            self.rows = 0
+            self.ordered = True
+            self.last_timestamp = None
+            self._remove_old_generations()
+
+    def _columns(self, rows):
+        """Read-only memory maps of the first `rows` rows of every column"""
+        if rows == 0:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        if rows != self.mapped_rows:
+            self.maps = {name: np.memmap(self._path(name), dtype=dtype, mode='r', shape=(rows,))
+                         for name, dtype in COLUMNS.items()}
+            self.mapped_rows = rows
+        return self.maps
+
+    def daily_buckets(self):
+        """(medicine, day, units, revenue) for every medicine and day with sales, days since epoch"""
+        with self.lock:
+            rows = self.rows
+            columns = self._columns(rows)
+        if rows == 0:
+            return []
+        days = np.asarray(columns["timestamp"]) // 86400
+        first_day = int(days.min())
+        span = int(days.max()) - first_day + 1
+        keys = np.asarray(columns["medicine"]).astype(np.int64) * span + (days - first_day)
+        units = np.bincount(keys)
+        revenue = np.bincount(keys, weights=np.asarray(columns["price"]))
+        medicines = self.dictionaries["medicine"].values
+        return [(medicines[key // span], first_day + key % span, int(units[key]), float(revenue[key]))
+                for key in np.flatnonzero(units).tolist()]
+
+    def sales(self, start=None, end=None, group_by="day", medicine=None):
+        """
+        Units and revenue between `start` (inclusive) and `end` (exclusive),
+        both in seconds, grouped by day, month, medicine or patient.
+        `medicine` (a name) limits the report to one medicine.
+        """
+        with self.lock:
+            rows = self.rows
+            columns = self._columns(rows)
+            ordered = self.ordered
+            medicine_id = None if medicine is None else self.dictionaries["medicine"].ids.get(medicine, -1)
+
+        timestamps = columns["timestamp"]
+        if ordered:
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+            hi = rows if end is None else int(np.searchsorted(timestamps, end, side='left'))
+            window = slice(lo, max(lo, hi))
+            mask = None
+        else:
+            window = slice(0, rows)
+            mask = np.ones(rows, dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps < end
+        if medicine_id is not None:
+            wanted = np.asarray(columns["medicine"][window]) == medicine_id
+            mask = wanted if mask is None else mask & wanted
+
+        def select(column):
+            values = np.asarray(columns[column][window])
+            return values if mask is None else values[mask]
+
+        prices = select("price")
+        if group_by == "day":
+            keys = select("timestamp") // 86400
+            labels = lambda k: str(np.datetime64(int(k), 'D'))
+        elif group_by == "month":
+            keys = (select("timestamp") // 86400).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            labels = lambda k: str(np.datetime64(int(k), 'M'))
+        else:
+            keys = select(group_by)
+            labels = self.dictionaries[group_by].values.__getitem__
+
+        groups = []
+        if len(keys):
+            # Keys are dense (ids, day or month numbers), so bincount groups without sorting
+            offset = int(keys.min())
+            keys = keys - offset
+            units = np.bincount(keys)
+            revenue = np.bincount(keys, weights=prices)
+            totals = {}
+            for k in np.flatnonzero(units).tolist():
+                # Relabelled dictionary ids can share a label
+                total = totals.setdefault(labels(k + offset), [0, 0.0])
+                total[0] += int(units[k])
+                total[1] += float(revenue[k])
+            groups = [{"key": key, "units": count, "revenue": round(amount, 2)}
+                      for key, (count, amount) in totals.items()]
+            if group_by in ("medicine", "patient"):
+                groups.sort(key=lambda g: -g["revenue"])
+
+        return {
+            "units": int(len(prices)),
+            "revenue": round(float(prices.sum()), 2),
+            "groups": groups
+        }
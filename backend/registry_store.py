@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+
+
+class SlotConflict(Exception):
+    """A slot did not hold the value the caller expected"""
+
+    def __init__(self, current, version):
+        super().__init__(f"slot holds {current!r}")
+        self.current = current
+        self.version = version
+
+
+class StaleVersion(Exception):
+    """The record changed since the version the caller read"""
+
+    def __init__(self, version):
+        super().__init__(f"record is at version {version}")
+        self.version = version
+
+
+class RegistryStore:
+    """
+    JSON registry ({id: record}) held in memory and written through to disk.
+
+    Every record has its own lock and a version number (stored in the record
+    as "version") that goes up on each change, so writers to different
+    records never wait on each other. Structural changes (adding or removing
+    records) and disk snapshots take the registry lock. Saves are atomic
+    (temp file + os.replace) and coalesced: while one thread is writing, any
+    number of others just wait for the next write, which includes their
+    changes, instead of writing the file once each. Each record is
+    serialized under its own lock, so the file never holds a record
+    half-way through a change.
+    """
+
+    def __init__(self, path, indent=3):
+        self.path = path
+        self.indent = indent
+        self.registry_lock = threading.RLock()
+        self.locks = {}
+        self.save_cond = threading.Condition()
+        self.requested = 0  # save requests so far
+        self.written = 0    # save requests covered by a finished write
+        self.writing = False
+        self.writes = 0     # number of times the file was actually written
+        try:
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        for record_id in self.data:
+            self.locks[record_id] = threading.RLock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, record_id):
+        return record_id in self.data
+
+    def get(self, record_id):
+        return self.data.get(record_id)
+
+    def items(self):
+        """Snapshot of (id, record) pairs that is safe to iterate while others write"""
+        with self.registry_lock:
+            return list(self.data.items())
+
+    def lock(self, record_id):
+        """Lock of a record, raises KeyError for unknown ids"""
+        with self.registry_lock:
+            if record_id not in self.data:
+                raise KeyError(record_id)
+            return self.locks[record_id]
+
+    def version(self, record_id):
+        return self.data[record_id].get("version", 0)
+
+    def put(self, record_id, record):
+        with self.registry_lock:
+            record.setdefault("version", 0)
+            self.data[record_id] = record
+            self.locks.setdefault(record_id, threading.RLock())
+
+    def remove(self, record_id):
+        with self.registry_lock:
+            self.locks.pop(record_id, None)
+            return self.data.pop(record_id, None)
+
+    def update(self, record_id, changes, expected_version=None):
+        """Apply field changes to a record under its lock, returns the new version"""
+        with self.lock(record_id):
+            record = self.data[record_id]
+            if expected_version is not None and record.get("version", 0) != expected_version:
+                raise StaleVersion(record.get("version", 0))
+            record.update(changes)
+            record["version"] = record.get("version", 0) + 1
+            return record["version"]
+
+    def set_slot(self, record_id, slot, expected, new, expected_version=None, on_success=None):
+        """
+        Compare-and-set record["slots"][slot] from `expected` to `new`.
+        `on_success(record)` runs under the record lock, so secondary indexes
+        see changes in the same order as the record. Returns the new version.
+        Raises KeyError for unknown records or slots, SlotConflict or StaleVersion.
+        """
+        with self.lock(record_id):
+            record = self.data[record_id]
+            current = record["slots"][slot]
+            version = record.get("version", 0)
+            if expected_version is not None and version != expected_version:
+                raise StaleVersion(version)
+            if current != expected:
+                raise SlotConflict(current, version)
+
+            record["slots"][slot] = new
+            record["version"] = version + 1
+            if on_success is not None:
+                on_success(record)
+            return record["version"]
+
+    def _snapshot(self):
+        """The registry as JSON text (the same text json.dumps would give), each record dumped under its lock"""
+        with self.registry_lock:
+            record_ids = list(self.data)
+        # Record locks are taken without the registry lock, which writers take while holding one
+        entries = []
+        for record_id in record_ids:
+            lock = self.locks.get(record_id)
+            if lock is None:
+                continue  # removed meanwhile
+            with lock:
+                record = self.data.get(record_id)
+                if record is None:
+                    continue
+                entries.append(json.dumps(record_id) + ": " + json.dumps(record, indent=self.indent))
+        if not entries:
+            return "{}"
+        if self.indent is None:
+            return "{" + ", ".join(entries) + "}"
+        pad = "\n" + " " * self.indent
+        # Nested lines move one level in; JSON strings never contain a raw newline
+        return "{" + pad + ("," + pad).join(entry.replace("\n", pad) for entry in entries) + "\n}"
+
+    def save(self):
+        """Persist the registry; returns once a write that includes this call's changes is done"""
+        with self.save_cond:
+            self.requested += 1
+            ticket = self.requested
+            while self.written < ticket:
+                if not self.writing:
+                    self.writing = True
+                    target = self.requested
+                    break
+                self.save_cond.wait()
+            else:
+                return
+
+        try:
+            payload = self._snapshot()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+            self.writes += 1
+        finally:
+            with self.save_cond:
+                self.writing = False
+                self.written = max(self.written, target)
+                self.save_cond.notify_all()
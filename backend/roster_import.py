@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+from doctor_calendar import parse_clock, format_clock, WEEKDAYS, MINUTES_PER_DAY
+from patient_index import normalize_name
+from slot_index import normalize_speciality
+
+# One row per shift: a doctor (existing doctor_id, or name + speciality) works
+# start-end on a weekday, or on every day when weekday is blank
+FIELDS = ("doctor_id", "name", "speciality", "weekday", "start", "end")
+WEEKDAY_NAMES = {name.lower(): number for number, name in enumerate(WEEKDAYS)}
+WEEKDAY_NAMES.update({name.lower()[:3]: number for number, name in enumerate(WEEKDAYS)})
+
+
+def parse_roster(body, content_type):
+    """
+    Rows of a roster upload: CSV with a header row when the content type says
+    so, otherwise JSON (a list of rows or {"rows": [...]}).
+    Raises ValueError if the payload cannot be read at all.
+    """
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not {"start", "end"} <= {f.strip() for f in reader.fieldnames}:
+            raise ValueError("CSV header must include start and end columns")
+        return [{key.strip(): (value or "").strip() for key, value in row.items() if key} for row in reader]
+
+    data = json.loads(text)
+    rows = data.get("rows") if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValueError('JSON roster must be a list of rows or {"rows": [...]}')
+    return rows
+
+
+def parse_time(value):
+    """'09:30' or a bare hour (9, '9') -> minutes after midnight"""
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        value = f"{int(value)}:00"
+    return parse_clock(str(value))
+
+
+def parse_weekdays(value):
+    if value is None or value == "":
+        return range(7)
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        if 0 <= int(value) <= 6:
+            return [int(value)]
+        raise ValueError(value)
+    return [WEEKDAY_NAMES[str(value).strip().lower()]]
+
+
+def slot_hours(shifts):
+    """Hours fully inside a shift on at least one weekday, for the one-day hourly slots"""
+    hours = set()
+    for windows in shifts.values():
+        for start, end in windows:
+            hours.update(range(-(-start // 60), end // 60))
+    return sorted(h for h in hours if h < 24)
+
+
+def validate_roster(rows, doctors, existing):
+    """
+    Group valid rows into one plan per doctor and collect per-row errors.
+    `doctors` maps doctor_id -> record, `existing` maps (name, speciality) -> doctor_id
+    so rows without an id still update the doctor of that name.
+    Returns: (dict key -> plan, list of {"row", "error"}), where a plan is
+    {"doctor_id", "name", "speciality", "shifts": {weekday: [(start, end)]}, "rows": [...]}.
+    """
+    plans = {}
+    errors = []
+    for number, row in enumerate(rows, 1):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("row must be an object")
+            doctor_id = str(row["doctor_id"]).strip() if row.get("doctor_id") not in (None, "") else None
+            name = str(row.get("name") or "").strip()
+            speciality = str(row.get("speciality") or "").strip() or "General"
+
+            if doctor_id is not None:
+                if doctor_id not in doctors:
+                    raise ValueError(f"unknown doctor_id {doctor_id}")
+                key = doctor_id
+                name, speciality = doctors[doctor_id]['name'], doctors[doctor_id].get('speciality', 'General')
+            elif name:
+                key = existing.get((normalize_name(name), normalize_speciality(speciality)),
+                                   (normalize_name(name), normalize_speciality(speciality)))
+            else:
+                raise ValueError("doctor_id or name is required")
+
+            try:
+                start, end = parse_time(row.get("start")), parse_time(row.get("end"))
+            except (ValueError, TypeError):
+                raise ValueError(f"invalid shift time {row.get('start')}-{row.get('end')}, use HH:MM")
+            if not start < end <= MINUTES_PER_DAY:
+                raise ValueError("shift end must be after shift start")
+            try:
+                weekdays = parse_weekdays(row.get("weekday"))
+            except (ValueError, KeyError):
+                raise ValueError(f"invalid weekday {row.get('weekday')}")
+
+            plan = plans.get(key) or {"doctor_id": key if isinstance(key, str) else None,
+                                      "name": name, "speciality": speciality, "shifts": {}, "rows": []}
+            for weekday in weekdays:
+                for s, e in plan["shifts"].get(weekday, []):
+                    if start < e and s < end:
+                        raise ValueError(f"overlaps {format_clock(s)}-{format_clock(e)} on {WEEKDAYS[weekday]}")
+            for weekday in weekdays:
+                plan["shifts"].setdefault(weekday, []).append((start, end))
+            plan["rows"].append(number)
+            plans[key] = plan
+        except (ValueError, KeyError) as e:
+            errors.append({"row": number, "error": str(e)})
+    return plans, errors
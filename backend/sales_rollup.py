@@ -0,0 +1,137 @@
+import threading
+
+
+class FenwickTree:
+    """Prefix sums over positions 0..n-1 with O(log n) point updates and range sums"""
+
+    def __init__(self, size):
+        self.tree = [0.0] * (size + 1)
+
+    @classmethod
+    def from_values(cls, values):
+        """Build in O(n) from a list of values"""
+        tree = cls(0)
+        tree.tree = [0.0] + list(values)
+        n = len(values)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree.tree[parent] += tree.tree[i]
+        return tree
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, position, delta):
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, end):
+        """Sum of positions [0, end)"""
+        total = 0.0
+        i = min(end, len(self.tree) - 1)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def range(self, start, end):
+        """Sum of positions [start, end)"""
+        return self.prefix(end) - self.prefix(start) if end > start else 0.0
+
+
+class DailyTotals:
+    """
+    Units and revenue per day (days since epoch) for one scope, with a
+    Fenwick tree over each so any date range sums in O(log days).
+    The trees cover base_day..base_day+size-1 and are rebuilt from the
+    daily buckets, at double the size, when a day falls outside.
+    """
+
+    def __init__(self):
+        self.days = {}  # day -> [units, revenue]
+        self.base_day = None
+        self.units = FenwickTree(0)
+        self.revenue = FenwickTree(0)
+
+    def _rebuild(self, first_day, last_day):
+        size = max(len(self.units) * 2, last_day - first_day + 1, 32)
+        units = [0.0] * size
+        revenue = [0.0] * size
+        for day, (u, r) in self.days.items():
+            units[day - first_day] = u
+            revenue[day - first_day] = r
+        self.base_day = first_day
+        self.units = FenwickTree.from_values(units)
+        self.revenue = FenwickTree.from_values(revenue)
+
+    def add(self, day, units, revenue):
+        bucket = self.days.setdefault(day, [0, 0.0])
+        bucket[0] += units
+        bucket[1] += revenue
+        if self.base_day is None or not self.base_day <= day < self.base_day + len(self.units):
+            if self.base_day is None:
+                self._rebuild(day, day)
+            else:
+                self._rebuild(min(day, self.base_day), max(day, self.base_day + len(self.units) - 1))
+        else:
+            self.units.add(day - self.base_day, units)
+            self.revenue.add(day - self.base_day, revenue)
+
+    def total(self, start_day, end_day):
+        """(units, revenue) over days [start_day, end_day]; start_day None means from the first sale"""
+        if self.base_day is None:
+            return 0, 0.0
+        lo = 0 if start_day is None else max(start_day - self.base_day, 0)
+        hi = min(end_day - self.base_day + 1, len(self.units))
+        return int(round(self.units.range(lo, hi))), self.revenue.range(lo, hi)
+
+
+class SalesRollup:
+    """
+    Pre-aggregated sales: a DailyTotals for the whole pharmacy and one per
+    medicine. Billing adds each sale to two daily buckets and two pairs of
+    Fenwick trees, so revenue over any date range, hospital-wide or for a
+    medicine, and trend buckets over a range cost O(log days) each instead
+    of a pass over every purchase.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.all = DailyTotals()
+        self.medicines = {}  # medicine -> DailyTotals
+
+    def add(self, medicine, day, units=1, revenue=0.0):
+        with self.lock:
+            self.all.add(day, units, revenue)
+            self.medicines.setdefault(medicine, DailyTotals()).add(day, units, revenue)
+
+    def load(self, buckets):
+        """Bulk-load (medicine, day, units, revenue) buckets, e.g. from the purchase ledger"""
+        for medicine, day, units, revenue in buckets:
+            self.add(medicine, day, units, revenue)
+
+    def scope(self, medicine=None):
+        return self.all if medicine is None else self.medicines.get(medicine)
+
+    def total(self, start_day, end_day, medicine=None):
+        with self.lock:
+            totals = self.scope(medicine)
+            units, revenue = totals.total(start_day, end_day) if totals else (0, 0.0)
+        return {"units": units, "revenue": round(revenue, 2)}
+
+    def trend(self, start_day, end_day, interval_days, medicine=None):
+        """Totals for consecutive periods of `interval_days` from start_day to end_day"""
+        periods = []
+        with self.lock:
+            totals = self.scope(medicine)
+            for first in range(start_day, end_day + 1, interval_days):
+                last = min(first + interval_days - 1, end_day)
+                units, revenue = totals.total(first, last) if totals else (0, 0.0)
+                periods.append((first, last, units, round(revenue, 2)))
+        return periods
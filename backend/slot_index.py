@@ -0,0 +1,100 @@
+import heapq
+
+
+def normalize_speciality(speciality):
+    return " ".join((speciality or "General").lower().split())
+
+
+def doctor_sort_key(doctor_id):
+    """Numeric ids sort numerically, anything else after them by text"""
+    return (0, int(doctor_id), "") if doctor_id.isdigit() else (1, 0, doctor_id)
+
+
+class SlotIndex:
+    """
+    Per-speciality index of free hourly slots.
+
+    Every doctor has a bitmap of free hours. Per speciality we keep how many
+    doctors are free at each hour, plus a bitmap of the hours where that count
+    is non-zero, so the first free hour at or after H is a single bit trick.
+    A min-heap of doctors per (speciality, hour) then picks the lowest doctor
+    id in O(log d); entries for doctors booked since are dropped lazily.
+    """
+
+    def __init__(self):
+        self.free = {}        # doctor_id -> bitmap of free hours
+        self.speciality = {}  # doctor_id -> normalized speciality
+        self.names = {}       # doctor_id -> display name
+        self.counts = {}      # speciality -> {hour: number of free doctors}
+        self.hours = {}       # speciality -> bitmap of hours with a free doctor
+        self.heaps = {}       # (speciality, hour) -> heap of (sort key, doctor_id)
+        self.queued = set()   # (speciality, hour, doctor_id) present in a heap
+
+    def set_doctor(self, doctor_id, name, speciality, slots):
+        """(Re)index a doctor from its slots dict {"9": None, "10": "3", ...}"""
+        self.remove_doctor(doctor_id)
+        self.free[doctor_id] = 0
+        self.speciality[doctor_id] = normalize_speciality(speciality)
+        self.names[doctor_id] = name
+        for hour, patient_id in slots.items():
+            if patient_id is None:
+                self.mark_free(doctor_id, int(hour))
+
+    def remove_doctor(self, doctor_id):
+        if doctor_id not in self.free:
+            return
+        mask = self.free[doctor_id]
+        while mask:
+            hour = (mask & -mask).bit_length() - 1
+            self.mark_booked(doctor_id, hour)
+            mask &= mask - 1
+        del self.free[doctor_id]
+        del self.speciality[doctor_id]
+        del self.names[doctor_id]
+
+    def mark_free(self, doctor_id, hour):
+        if doctor_id not in self.free or self.free[doctor_id] >> hour & 1:
+            return
+        self.free[doctor_id] |= 1 << hour
+        speciality = self.speciality[doctor_id]
+
+        counts = self.counts.setdefault(speciality, {})
+        counts[hour] = counts.get(hour, 0) + 1
+        self.hours[speciality] = self.hours.get(speciality, 0) | 1 << hour
+
+        if (speciality, hour, doctor_id) not in self.queued:
+            self.queued.add((speciality, hour, doctor_id))
+            heapq.heappush(self.heaps.setdefault((speciality, hour), []),
+                           (doctor_sort_key(doctor_id), doctor_id))
+
+    def mark_booked(self, doctor_id, hour):
+        if doctor_id not in self.free or not self.free[doctor_id] >> hour & 1:
+            return
+        self.free[doctor_id] &= ~(1 << hour)
+        speciality = self.speciality[doctor_id]
+
+        counts = self.counts[speciality]
+        counts[hour] -= 1
+        if not counts[hour]:
+            del counts[hour]
+            self.hours[speciality] &= ~(1 << hour)
+
+    def next_available(self, speciality, after=0):
+        """Earliest free (hour, doctor_id, name) at or after `after`, or None"""
+        speciality = normalize_speciality(speciality)
+        mask = self.hours.get(speciality, 0) >> after << after
+        if not mask:
+            return None
+        hour = (mask & -mask).bit_length() - 1
+
+        heap = self.heaps[(speciality, hour)]
+        while True:
+            _, doctor_id = heap[0]
+            if (self.speciality.get(doctor_id) == speciality
+                    and self.free[doctor_id] >> hour & 1):
+                return hour, doctor_id, self.names[doctor_id]
+            heapq.heappop(heap)
+            self.queued.discard((speciality, hour, doctor_id))
+
+    def specialities(self):
+        return sorted(speciality for speciality, mask in self.hours.items() if mask)
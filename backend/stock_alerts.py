@@ -0,0 +1,275 @@
+import bisect
+import heapq
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, date, timedelta
+
+DEFAULT_THRESHOLDS = {"reorder_level": 5, "expiry_warning_days": 30}
+
+
+class StockAlerts:
+    """
+    Low-stock and near-expiry alerts for the pharmacy inventory.
+
+    Each medicine has a reorder level and an expiry warning window
+    (defaults in DEFAULT_THRESHOLDS, overrides saved to a JSON file).
+    Stock margins (stock - reorder level) are kept in a sorted list, so a
+    stock change re-files one medicine in O(log n) and raises an alert only
+    when it crosses its level; the medicines at or below their level are a
+    prefix of the list. Serials wait on a min-heap of the day their warning
+    window opens; a daemon thread wakes on that day and moves them into a
+    sorted list of serials near expiry. Each serial has at most one live
+    heap entry (the one recorded in `scheduled`, others are skipped when
+    they surface) and at most one near-expiry entry, so re-filing a serial
+    never alerts for it twice. Alerts go to a ring buffer with
+    increasing ids (the pollable feed) and wake any push-stream listeners.
+
+    Inventory methods are called under the inventory lock, with the store
+    already changed.
+    """
+
+    def __init__(self, store, thresholds_path, feed_size=1000, max_sleep=3600):
+        self.store = store
+        self.thresholds_path = thresholds_path
+        self.max_sleep = max_sleep
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.feed = deque(maxlen=feed_size)
+        self.next_id = 1
+        self.listeners = set()  # callables run (from any thread) after each alert
+        try:
+            with open(thresholds_path, 'r') as f:
+                self.overrides = json.load(f)
+        except (OSError, ValueError):
+            self.overrides = {}
+        self.clear()
+
+    def clear(self):
+        with self.cond:
+            self.stock = {}      # medicine -> stock last seen
+            self.margins = []    # sorted (stock - reorder_level, medicine)
+            self.pending = []    # heap of (warning day, expiry, medicine, serial)
+            self.scheduled = {}  # (medicine, serial) -> its live pending entry
+            self.near = []       # sorted (expiry, medicine, serial) inside their warning window
+            self.near_of = {}    # (medicine, serial) -> expiry of its near entry
+
+    def thresholds(self, medicine):
+        return {**DEFAULT_THRESHOLDS, **self.overrides.get(medicine, {})}
+
+    def set_thresholds(self, medicine, reorder_level=None, expiry_warning_days=None):
+        """Change a medicine's thresholds and re-check it against them"""
+        changes = {key: value for key, value in (("reorder_level", reorder_level),
+                                                 ("expiry_warning_days", expiry_warning_days))
+                   if value is not None}
+        stock = self.stock.get(medicine)
+        was_low = stock is not None and stock <= self.thresholds(medicine)["reorder_level"]
+        self._unfile(medicine)  # filed under the old level
+
+        self.overrides[medicine] = {**self.overrides.get(medicine, {}), **changes}
+        tmp_path = self.thresholds_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.overrides, f, indent=4)
+        os.replace(tmp_path, self.thresholds_path)
+
+        if stock is not None:
+            # Raising the level above the current stock counts as crossing it
+            self.stock_changed(medicine, stock, previous=stock if was_low else float('inf'))
+        record = self.store.get(medicine)
+        if record is not None and "expiry_warning_days" in changes:
+            # Re-file every serial under the new window; those it newly covers alert now
+            for serial, details in record["serials"].items():
+                self.serial_added(medicine, serial, details["expiry"])
+        return self.thresholds(medicine)
+
+    # ---- building and inventory changes ----
+
+    def build(self, medicines, today=None):
+        """Index (name, record) pairs without raising alerts for the current state"""
+        self.clear()
+        today = today or date.today().isoformat()
+        for name, record in medicines:
+            self._file(name, record.get("stock", 0))
+            for serial, details in record.get("serials", {}).items():
+                self.serial_added(name, serial, details["expiry"], today=today, quiet=True)
+        with self.cond:
+            self.cond.notify()
+
+    def _file(self, medicine, stock):
+        self.stock[medicine] = stock
+        bisect.insort(self.margins, (stock - self.thresholds(medicine)["reorder_level"], medicine))
+
+    def _unfile(self, medicine):
+        stock = self.stock.pop(medicine, None)
+        if stock is None:
+            return
+        entry = (stock - self.thresholds(medicine)["reorder_level"], medicine)
+        i = bisect.bisect_left(self.margins, entry)
+        if i < len(self.margins) and self.margins[i] == entry:
+            del self.margins[i]
+
+    def stock_changed(self, medicine, stock, previous=None):
+        """Re-file a medicine's stock; alerts if it fell to its reorder level or ran out"""
+        if previous is None:
+            previous = self.stock.get(medicine, 0)  # a new medicine has not fallen from anywhere
+        self._unfile(medicine)
+        self._file(medicine, stock)
+        level = self.thresholds(medicine)["reorder_level"]
+        if stock == 0 < previous:
+            self.emit("out_of_stock", medicine, stock=stock, reorder_level=level)
+        elif stock <= level < previous:
+            self.emit("low_stock", medicine, stock=stock, reorder_level=level)
+
+    def serial_added(self, medicine, serial, expiry, today=None, quiet=False):
+        """
+        (Re)file a serial: schedule its warning, or put it in the near-expiry
+        list and alert if it was not there already and has not expired
+        """
+        today = today or date.today().isoformat()
+        days = self.thresholds(medicine)["expiry_warning_days"]
+        warn_day = (date.fromisoformat(expiry) - timedelta(days=days)).isoformat()
+        with self.cond:
+            was_near = self.near_of.get((medicine, serial)) == expiry
+            self._forget(medicine, serial)
+            if warn_day > today:
+                entry = (warn_day, expiry, medicine, serial)
+                self.scheduled[(medicine, serial)] = entry
+                heapq.heappush(self.pending, entry)
+                if len(self.pending) > 2 * len(self.scheduled) + 16:
+                    # Mostly superseded entries: keep only the live ones
+                    self.pending = list(self.scheduled.values())
+                    heapq.heapify(self.pending)
+                if self.pending[0] == entry:
+                    self.cond.notify()
+                return
+            self.near_of[(medicine, serial)] = expiry
+            bisect.insort(self.near, (expiry, medicine, serial))
+        if not quiet and not was_near and expiry > today:
+            self.emit("near_expiry", medicine, serial=serial, expiry=expiry, warning_days=days)
+
+    def _forget(self, medicine, serial):
+        """Drop a serial's pending warning and near-expiry entry; call holding self.cond"""
+        self.scheduled.pop((medicine, serial), None)
+        expiry = self.near_of.pop((medicine, serial), None)
+        if expiry is not None:
+            entry = (expiry, medicine, serial)
+            i = bisect.bisect_left(self.near, entry)
+            if i < len(self.near) and self.near[i] == entry:
+                del self.near[i]
+
+    def serial_removed(self, medicine, serial, expiry):
+        """A serial was sold, removed or written off; its heap entry is skipped when it surfaces"""
+        with self.cond:
+            self._forget(medicine, serial)
+
+    def retired(self, write_offs):
+        """Expired serials written off by the sweeper: one alert per medicine"""
+        by_medicine = {}
+        for write_off in write_offs:
+            self.serial_removed(write_off["medicine"], write_off["serial"], write_off["expiry"])
+            by_medicine.setdefault(write_off["medicine"], []).append(write_off["serial"])
+        for medicine, serials in by_medicine.items():
+            self.emit("expired", medicine, serials=serials, count=len(serials))
+            record = self.store.get(medicine)
+            if record is not None:
+                self.stock_changed(medicine, record["stock"])
+
+    # ---- expiry clock ----
+
+    def tick(self, today=None):
+        """Move serials whose warning window has opened into the near-expiry list, alerting for each"""
+        today = today or date.today().isoformat()
+        due = []
+        with self.cond:
+            while self.pending and self.pending[0][0] <= today:
+                entry = heapq.heappop(self.pending)
+                # Superseded by a later filing, or the serial is gone
+                if self.scheduled.get(entry[2:]) == entry:
+                    due.append(entry)
+        for warn_day, expiry, medicine, serial in due:
+            record = self.store.get(medicine)
+            details = record["serials"].get(serial) if record else None
+            if details is None or details["expiry"] != expiry:
+                with self.cond:
+                    self.scheduled.pop((medicine, serial), None)
+                continue
+            self.serial_added(medicine, serial, expiry, today=today)
+        return len(due)
+
+    def _seconds_until_due(self):
+        if not self.pending:
+            return None
+        due = datetime.combine(date.fromisoformat(self.pending[0][0]), datetime.min.time())
+        return max(0.0, (due - datetime.now()).total_seconds())
+
+    def _run(self, lock):
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    wait = self._seconds_until_due()
+                    if wait == 0:
+                        break
+                    self.cond.wait(self.max_sleep if wait is None else min(wait, self.max_sleep))
+                if self.stopping:
+                    return
+            with lock:
+                self.tick()
+
+    def start(self, lock):
+        """Run the expiry clock; `lock` is the inventory lock tick() runs under"""
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, args=(lock,), name="stock-alerts", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # ---- feed ----
+
+    def emit(self, kind, medicine, **details):
+        with self.cond:
+            alert = {"id": self.next_id, "type": kind, "medicine": medicine,
+                     "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **details}
+            self.next_id += 1
+            self.feed.append(alert)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener()
+        return alert
+
+    def subscribe(self, listener):
+        with self.cond:
+            self.listeners.add(listener)
+
+    def unsubscribe(self, listener):
+        with self.cond:
+            self.listeners.discard(listener)
+
+    def since(self, after=0, limit=None):
+        """Alerts with id > after, oldest first. An id from before a restart reads from the start."""
+        with self.cond:
+            if after >= self.next_id:
+                after = 0
+            start = max(0, len(self.feed) - (self.next_id - 1 - after))
+            alerts = list(self.feed)[start:]
+        return alerts[:limit] if limit else alerts
+
+    def active(self):
+        """Medicines at or below their reorder level (lowest margin first) and serials near expiry; call under the inventory lock"""
+        with self.cond:
+            low = self.margins[:bisect.bisect_left(self.margins, (1,))]
+            near = list(self.near)
+        return {
+            "low_stock": [{"medicine": medicine, "stock": self.stock[medicine],
+                           "reorder_level": self.thresholds(medicine)["reorder_level"]}
+                          for _, medicine in low],
+            "near_expiry": [{"medicine": medicine, "serial": serial, "expiry": expiry}
+                            for expiry, medicine, serial in near]
+        }
@@ -0,0 +1,113 @@
+import re
+from text_index import PrefixTrie, BKTree
+
+# Separators accepted between symptoms in a multi-symptom complaint
+SYMPTOM_SEPARATORS = re.compile(r"\s*(?:,|;|\+|/|\band\b|&)\s*")
+
+# A typo is only corrected silently in a word at least this long; shorter words
+# are one letter away from other real words ("eye" / "ear")
+MIN_TYPO_WORD = 5
+
+
+def normalize_symptom(text):
+    return " ".join(text.lower().split())
+
+
+class SymptomIndex:
+    """
+    Symptom lookup built once from the severity map.
+
+    - exact names resolve through a dict
+    - a prefix trie over every word-start of a name serves autocomplete
+      ("pain" completes both "chest pain" and "severe pain")
+    - a BK-tree over names finds close spellings, and one over the same
+      word-starts lets suggestions fix a typo in any word
+
+    A complaint only resolves to a name on its own if it is exact or has a
+    single typo in one long word that fits no other name ("heart atack");
+    anything looser is left unresolved for the caller to confirm from the
+    suggestions, since the name decides the triage priority.
+    """
+
+    def __init__(self, severity_map):
+        self.severity = {normalize_symptom(name): priority for name, priority in severity_map.items()}
+        self.trie = PrefixTrie()
+        self.bktree = BKTree()
+        self.phrase_tree = BKTree()
+        self.phrases = {}  # word-start phrase -> names containing it
+
+        for name in self.severity:
+            words = name.split(" ")
+            for i in range(len(words)):
+                phrase = " ".join(words[i:])
+                self.trie.insert(phrase, name)
+                self.phrase_tree.add(phrase)
+                self.phrases.setdefault(phrase, set()).add(name)
+            self.bktree.add(name)
+
+        # Catalog in display order: most severe first, then by name
+        self.catalog = sorted(self.severity.items(), key=lambda item: (item[1], item[0]))
+
+    def max_typos(self, text):
+        return 1 if len(text) <= 6 else 2 if len(text) <= 12 else 3
+
+    def resolve_one(self, text):
+        """Resolve a single symptom, returns (name, priority, distance) or None if not certain"""
+        text = normalize_symptom(text)
+        if text in self.severity:
+            return text, self.severity[text], 0
+
+        close = [name for _, name in self.bktree.search(text, 1) if self._long_word_typo(text, name)]
+        if len(close) != 1:
+            return None
+        return close[0], self.severity[close[0]], 1
+
+    @staticmethod
+    def _long_word_typo(text, name):
+        """True if `text` and `name` (one edit apart) differ in a single word of MIN_TYPO_WORD letters or more"""
+        words, name_words = text.split(" "), name.split(" ")
+        if len(words) != len(name_words):
+            return False
+        differing = [(word, name_word) for word, name_word in zip(words, name_words) if word != name_word]
+        return len(differing) == 1 and min(map(len, differing[0])) >= MIN_TYPO_WORD
+
+    def resolve(self, text):
+        """
+        Resolve a complaint that may list several symptoms.
+        Returns: (most severe match or None, list of all matches, list of unmatched parts)
+        """
+        parts = [part.strip() for part in SYMPTOM_SEPARATORS.split(text) if part.strip()]
+        if len(parts) <= 1:
+            match = self.resolve_one(text)
+            return (match, [match], []) if match else (None, [], [text.strip()])
+
+        whole = self.resolve_one(text)
+        if whole is not None and whole[2] == 0:
+            return whole, [whole], []
+
+        matches = []
+        unmatched = []
+        for part in parts:
+            match = self.resolve_one(part)
+            if match is None:
+                unmatched.append(part)
+            elif match not in matches:
+                matches.append(match)
+
+        if not matches:
+            return None, [], unmatched
+        best = min(matches, key=lambda m: (m[1], m[2], m[0]))
+        return best, matches, unmatched
+
+    def suggest(self, text, limit=10):
+        """Autocomplete by word prefix, topped up with close spellings"""
+        text = normalize_symptom(text)
+        names = self.trie.complete(text, limit) if text else [name for name, _ in self.catalog[:limit]]
+        if len(names) < limit and text:
+            for _, phrase in self.phrase_tree.search(text, self.max_typos(text)):
+                for name in sorted(self.phrases[phrase], key=lambda n: (self.severity[n], n)):
+                    if name not in names:
+                        names.append(name)
+                if len(names) >= limit:
+                    break
+        return names[:limit]
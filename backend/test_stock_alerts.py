@@ -0,0 +1,68 @@
+"""
+Regression tests for StockAlerts re-filing serials.
+
+Run from backend/:
+    python -m pytest test_stock_alerts.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from registry_store import RegistryStore
+from stock_alerts import StockAlerts
+
+TODAY = date.today()
+
+
+def day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    store = RegistryStore(str(tmp_path / "medicine.json"))
+    store.put("Z", {"stock": 1, "serials": {"s1": {"expiry": day(40), "price": 1.0}}})
+    alerts = StockAlerts(store, str(tmp_path / "thresholds.json"))
+    alerts.build(store.items(), today=day(0))
+    return store, alerts
+
+
+def near_expiry_alerts(alerts):
+    return [alert for alert in alerts.since() if alert["type"] == "near_expiry"]
+
+
+def test_setting_the_same_window_twice_keeps_one_entry(inventory):
+    store, alerts = inventory
+    alerts.set_thresholds("Z", expiry_warning_days=30)
+    alerts.set_thresholds("Z", expiry_warning_days=30)
+    assert len(alerts.scheduled) == 1
+
+    alerts.tick(today=day(10))
+    assert len(near_expiry_alerts(alerts)) == 1
+    assert alerts.active()["near_expiry"] == [{"medicine": "Z", "serial": "s1", "expiry": day(40)}]
+
+    del store.get("Z")["serials"]["s1"]
+    alerts.serial_removed("Z", "s1", day(40))
+    assert alerts.active()["near_expiry"] == []
+
+
+def test_re_adding_a_serial_does_not_duplicate_it(inventory):
+    store, alerts = inventory
+    alerts.serial_added("Z", "s1", day(40), today=day(0))
+    alerts.tick(today=day(10))
+    alerts.serial_added("Z", "s1", day(40), today=day(10))
+    assert len(near_expiry_alerts(alerts)) == 1
+    assert len(alerts.active()["near_expiry"]) == 1
+
+
+def test_widening_the_window_alerts_for_serials_it_now_covers(inventory):
+    store, alerts = inventory
+    alerts.set_thresholds("Z", expiry_warning_days=60)
+    assert [alert["serial"] for alert in near_expiry_alerts(alerts)] == ["s1"]
+    assert len(alerts.active()["near_expiry"]) == 1
+
+    # Narrowing again takes it out of the list until the new window opens
+    alerts.set_thresholds("Z", expiry_warning_days=5)
+    assert alerts.active()["near_expiry"] == []
+    assert alerts.tick(today=day(35)) == 1
+    assert len(near_expiry_alerts(alerts)) == 2
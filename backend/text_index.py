@@ -0,0 +1,153 @@
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein distance between two strings.
+    With `limit`, stops early and returns limit + 1 once the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class PrefixTrie:
+    """
+    Character trie mapping keys to sets of values.
+    Keys are yielded in lexicographic order, so results can be paged with a cursor.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def insert(self, key, value):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        values = node.setdefault(None, set())
+        if value not in values:
+            values.add(value)
+            self.size += 1
+
+    def remove(self, key, value):
+        path = [self.root]
+        for ch in key:
+            node = path[-1].get(ch)
+            if node is None:
+                return False
+            path.append(node)
+
+        values = path[-1].get(None)
+        if not values or value not in values:
+            return False
+        values.discard(value)
+        self.size -= 1
+        if not values:
+            del path[-1][None]
+
+        # Prune nodes left without children or values
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][key[depth - 1]]
+        return True
+
+    def items(self, prefix="", after=None):
+        """
+        Yield (key, value) pairs whose key starts with `prefix`, in (key, value) order.
+        With `after` = (key, value), resume strictly after that pair.
+        """
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return
+        yield from self._walk(node, prefix, after)
+
+    def _walk(self, node, key, after):
+        if None in node:
+            for value in sorted(node[None]):
+                if after is None or (key, value) > after:
+                    yield key, value
+        for ch in sorted(k for k in node if k is not None):
+            child_key = key + ch
+            # Skip subtrees that sort entirely before the cursor
+            if after is not None and child_key < after[0][:len(child_key)]:
+                continue
+            yield from self._walk(node[ch], child_key, after)
+
+    def complete(self, prefix, limit=10):
+        """Distinct values of the first keys starting with `prefix`"""
+        results = []
+        for _, value in self.items(prefix):
+            if value not in results:
+                results.append(value)
+                if len(results) == limit:
+                    break
+        return results
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over edit distance for typo-tolerant lookup.
+    Removal is lazy: removed words stay in the tree but are skipped by search.
+    """
+
+    def __init__(self):
+        self.root = None  # (word, {distance: child})
+        self.live = set()
+
+    def __len__(self):
+        return len(self.live)
+
+    def add(self, word):
+        if word in self.live:
+            return
+        self.live.add(word)
+        if self.root is None:
+            self.root = (word, {})
+            return
+
+        node = self.root
+        while True:
+            dist = edit_distance(word, node[0])
+            if dist == 0:
+                return
+            child = node[1].get(dist)
+            if child is None:
+                node[1][dist] = (word, {})
+                return
+            node = child
+
+    def remove(self, word):
+        self.live.discard(word)
+
+    def search(self, word, max_distance):
+        """Return (distance, word) pairs within `max_distance`, closest first"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node_word, children = stack.pop()
+            dist = edit_distance(word, node_word)
+            if dist <= max_distance and node_word in self.live:
+                results.append((dist, node_word))
+            for child_dist, child in children.items():
+                if dist - max_distance <= child_dist <= dist + max_distance:
+                    stack.append(child)
+        results.sort()
+        return results
@@ -0,0 +1,137 @@
+import bisect
+
+# Severity labels accepted by the listing filters
+SEVERITY_PRIORITIES = {"critical": 1, "serious": 2, "moderate": 3, "normal": 4}
+
+
+def encode_cursor(priority, arrival):
+    return f"{priority}:{arrival}"
+
+
+def decode_cursor(cursor):
+    """Parse a 'priority:arrival' cursor, raises ValueError if malformed"""
+    priority, arrival = cursor.split(":")
+    return int(priority), int(arrival)
+
+
+def parse_severity(severity):
+    """Map a severity label (Critical, Serious, ...) to its priority, or None"""
+    return SEVERITY_PRIORITIES.get(severity.strip().lower())
+
+
+class TriageIndex:
+    """
+    Ordered view of the triage heap, used for listing without sorting.
+
+    Patients are bucketed by priority. Arrival numbers only grow, so a bucket
+    stays sorted by arrival just by appending, and the heap always pops the
+    head of the lowest non-empty bucket. Popped heads are skipped with an
+    offset and compacted away once they make up half of the bucket.
+    """
+
+    def __init__(self):
+        self.arrivals = {}  # priority -> sorted list of arrival numbers
+        self.patients = {}  # priority -> list of patient dicts, parallel to arrivals
+        self.heads = {}     # priority -> index of the first live entry
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, priority, arrival, patient):
+        arrivals = self.arrivals.setdefault(priority, [])
+        patients = self.patients.setdefault(priority, [])
+        self.heads.setdefault(priority, 0)
+
+        if not arrivals or arrival > arrivals[-1]:
+            arrivals.append(arrival)
+            patients.append(patient)
+        else:
+            idx = bisect.bisect_left(arrivals, arrival, self.heads[priority])
+            arrivals.insert(idx, arrival)
+            patients.insert(idx, patient)
+        self.size += 1
+
+    def remove(self, priority, arrival):
+        """Remove an entry, O(1) when it is the head of its bucket"""
+        arrivals = self.arrivals.get(priority)
+        if not arrivals:
+            return False
+
+        head = self.heads[priority]
+        idx = bisect.bisect_left(arrivals, arrival, head)
+        if idx == len(arrivals) or arrivals[idx] != arrival:
+            return False
+
+        if idx == head:
+            self.patients[priority][idx] = None
+            self.heads[priority] = head + 1
+            if self.heads[priority] > 32 and self.heads[priority] * 2 > len(arrivals):
+                self._compact(priority)
+        else:
+            del arrivals[idx]
+            del self.patients[priority][idx]
+        self.size -= 1
+        return True
+
+    def clear(self):
+        self.arrivals.clear()
+        self.patients.clear()
+        self.heads.clear()
+        self.size = 0
+
+    def _compact(self, priority):
+        head = self.heads[priority]
+        del self.arrivals[priority][:head]
+        del self.patients[priority][:head]
+        self.heads[priority] = 0
+
+    def count(self, priority):
+        return len(self.arrivals.get(priority, [])) - self.heads.get(priority, 0)
+
+    def oldest(self, priority):
+        """Arrival number of the longest-waiting patient of a priority, or None"""
+        if not self.count(priority):
+            return None
+        return self.arrivals[priority][self.heads[priority]]
+
+    def position(self, priority, arrival):
+        """1-based position in treatment order"""
+        ahead = sum(self.count(p) for p in self.arrivals if p < priority)
+        arrivals = self.arrivals.get(priority, [])
+        idx = bisect.bisect_left(arrivals, arrival, self.heads.get(priority, 0))
+        return ahead + idx - self.heads.get(priority, 0) + 1
+
+    def page(self, limit=None, cursor=None, priority=None):
+        """
+        Return up to `limit` entries in treatment order, strictly after `cursor`.
+        Returns: (list of (priority, arrival, patient, position), next_cursor)
+        """
+        after_priority, after_arrival = cursor if cursor is not None else (None, None)
+        priorities = sorted(self.arrivals) if priority is None else [priority]
+
+        results = []
+        ahead = 0
+        for p in sorted(self.arrivals):
+            if p not in priorities:
+                ahead += self.count(p)
+                continue
+
+            arrivals = self.arrivals[p]
+            head = self.heads[p]
+            start = head
+            if after_priority is not None:
+                if p < after_priority:
+                    ahead += self.count(p)
+                    continue
+                if p == after_priority:
+                    start = bisect.bisect_right(arrivals, after_arrival, head)
+
+            for idx in range(start, len(arrivals)):
+                if limit is not None and len(results) == limit:
+                    last_p, last_arrival = results[-1][0], results[-1][1]
+                    return results, encode_cursor(last_p, last_arrival)
+                results.append((p, arrivals[idx], self.patients[p][idx], ahead + idx - head + 1))
+            ahead += self.count(p)
+
+        return results, None
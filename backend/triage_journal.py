@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+
+
+class TriageJournal:
+    """
+    Append-only journal of triage queue mutations with group commit.
+
+    Each mutation is appended as one JSON line. A single flusher thread waits
+    `commit_interval` seconds after the first pending record, then writes and
+    fsyncs everything that arrived in the meantime at once, so concurrent
+    registrations share one disk flush. Callers append while holding the queue
+    lock (keeping journal order equal to queue order) and wait for durability
+    after releasing it. If a write or fsync fails the flusher stops, later
+    appends are rejected, and every waiter, current and later, gets that
+    error instead of blocking forever.
+    """
+
+    def __init__(self, path, commit_interval=0.005):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.file = None
+        self.thread = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.pending = []
+        self.appended = 0  # sequence number of the last appended record
+        self.durable = 0   # sequence number of the last fsynced record
+        self.error = None  # OSError that stopped the flusher
+
+    def read(self):
+        """Read back every journaled record, stopping at a torn final line"""
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def open(self, checkpoint=()):
+        """Start journaling, replacing the file with a checkpoint of the live queue"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for record in checkpoint:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.file = open(self.path, 'a')
+        self.closed = False
+        self.error = None
+        self.thread = threading.Thread(target=self._flush_loop, name="triage-journal", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        """
+        Queue a record for the next group commit, returns its sequence number.
+        Once the flusher has failed nothing is queued any more, and waiting
+        for the returned number raises the flusher's error at once.
+        """
+        if self.file is None:
+            return 0
+        with self.cond:
+            if self.error is not None:
+                return self.durable + 1
+            self.pending.append(json.dumps(record))
+            self.appended += 1
+            self.cond.notify_all()
+            return self.appended
+
+    def wait(self, seq):
+        """Block until the record with sequence number `seq` is on disk, raises OSError if it never can be"""
+        with self.cond:
+            while self.durable < seq and not self.closed:
+                if self.error is not None:
+                    raise self.error
+                self.cond.wait()
+
+    def close(self):
+        if self.file is None:
+            return
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.file.close()
+        self.file = None
+
+    def _flush_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                closing = self.closed
+
+            # Give other writers a moment to join this batch
+            if not closing:
+                time.sleep(self.commit_interval)
+
+            with self.cond:
+                batch, self.pending = self.pending, []
+                seq = self.appended
+
+            try:
+                self.file.write("\n".join(batch) + "\n")
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                with self.cond:
+                    self.error = e
+                    self.pending = []
+                    self.cond.notify_all()
+                return
+
+            with self.cond:
+                self.durable = seq
+                self.cond.notify_all()
+
+
+def replay_queue(records):
+    """
+    Fold journal records into the queue state they describe.
+    Returns: (list of live 'add' records in arrival order, arrival counter)
+    """
+    live = {}
+    counter = 0
+    for record in records:
+        op = record.get("op")
+        if op == "add":
+            live[record["arrival"]] = record
+            counter = max(counter, record["counter"])
+        elif op == "treat":
+            live.pop(record["arrival"], None)
+        elif op == "clear":
+            live.clear()
+            counter = 0
+        elif op == "counter":
+            counter = record["value"]
+    return [live[arrival] for arrival in sorted(live)], counter
+
+
+def checkpoint_records(live, counter):
+    """Minimal journal contents that replay to the given queue state"""
+    return [{"op": "counter", "value": counter}] + list(live)
@@ -0,0 +1,97 @@
+PRIORITIES = (1, 2, 3, 4)
+WINDOW_MINUTES = 60
+
+
+class TriageStats:
+    """
+    Triage statistics maintained incrementally on every push and pop.
+
+    Waiting counts, arrivals and wait totals are plain counters. Treatments
+    per hour come from a ring of one-minute buckets per severity, so reading
+    the rate sums at most 60 buckets no matter how busy the queue is.
+    """
+
+    def __init__(self):
+        self.waiting = {p: 0 for p in PRIORITIES}
+        self.arrivals = {p: 0 for p in PRIORITIES}
+        self.treated = {p: 0 for p in PRIORITIES}
+        self.wait_total = {p: 0.0 for p in PRIORITIES}
+        self.wait_max = {p: 0.0 for p in PRIORITIES}
+        self.bucket_counts = {p: [0] * WINDOW_MINUTES for p in PRIORITIES}
+        self.bucket_minutes = {p: [-1] * WINDOW_MINUTES for p in PRIORITIES}
+        self.total_waiting = 0
+        self.doctor_load = {}  # doctor -> patients waiting for them
+
+    def _ensure(self, priority):
+        if priority not in self.waiting:
+            for counters in (self.waiting, self.arrivals, self.treated):
+                counters[priority] = 0
+            self.wait_total[priority] = 0.0
+            self.wait_max[priority] = 0.0
+            self.bucket_counts[priority] = [0] * WINDOW_MINUTES
+            self.bucket_minutes[priority] = [-1] * WINDOW_MINUTES
+
+    def push(self, priority, doctor, restored=False):
+        """Count a patient joining the queue (restored ones are not new arrivals)"""
+        self._ensure(priority)
+        self.waiting[priority] += 1
+        self.total_waiting += 1
+        self.doctor_load[doctor] = self.doctor_load.get(doctor, 0) + 1
+        if not restored:
+            self.arrivals[priority] += 1
+
+    def pop(self, priority, doctor, waited_seconds, now):
+        self._ensure(priority)
+        self.waiting[priority] -= 1
+        self.total_waiting -= 1
+        if self.doctor_load.get(doctor, 0) > 1:
+            self.doctor_load[doctor] -= 1
+        else:
+            self.doctor_load.pop(doctor, None)
+        self.treated[priority] += 1
+        self.wait_total[priority] += waited_seconds
+        self.wait_max[priority] = max(self.wait_max[priority], waited_seconds)
+
+        minute = int(now // 60)
+        slot = minute % WINDOW_MINUTES
+        if self.bucket_minutes[priority][slot] != minute:
+            self.bucket_minutes[priority][slot] = minute
+            self.bucket_counts[priority][slot] = 0
+        self.bucket_counts[priority][slot] += 1
+
+    def clear_waiting(self):
+        for priority in self.waiting:
+            self.waiting[priority] = 0
+        self.total_waiting = 0
+        self.doctor_load.clear()
+
+    def treated_last_hour(self, priority, now):
+        oldest = int(now // 60) - WINDOW_MINUTES
+        return sum(
+            count for count, minute in zip(self.bucket_counts[priority], self.bucket_minutes[priority])
+            if minute > oldest
+        )
+
+    def average_wait(self, priority):
+        if not self.treated[priority]:
+            return 0.0
+        return self.wait_total[priority] / self.treated[priority]
+
+    def snapshot(self, now, oldest_starts):
+        """
+        Per-priority figures in minutes, for the stats endpoints.
+        `oldest_starts` maps priority -> start time of its longest-waiting patient (or None).
+        """
+        result = {}
+        for priority in sorted(self.waiting):
+            oldest = oldest_starts.get(priority)
+            result[priority] = {
+                "waiting": self.waiting[priority],
+                "arrivals": self.arrivals[priority],
+                "treated": self.treated[priority],
+                "averageWaitMinutes": round(self.average_wait(priority) / 60, 2),
+                "maxWaitMinutes": round(self.wait_max[priority] / 60, 2),
+                "longestWaitingMinutes": round((now - oldest) / 60, 2) if oldest is not None else 0,
+                "treatedLastHour": self.treated_last_hour(priority, now)
+            }
+        return result
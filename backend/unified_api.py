@@ -1,17 +1,61 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
+from contextlib import asynccontextmanager
+import asyncio
 import heapq
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, date
 import json
 import os
+from triage_index import TriageIndex, decode_cursor, parse_severity
+from triage_journal import TriageJournal, replay_queue, checkpoint_records
+from symptom_index import SymptomIndex
+from triage_stats import TriageStats
+from slot_index import SlotIndex, normalize_speciality, doctor_sort_key
+from doctor_calendar import (DoctorCalendar, daily_shifts, to_minutes, from_minutes,
+                             parse_clock, format_clock, WEEKDAYS)
+from registry_store import RegistryStore, SlotConflict, StaleVersion
+from patient_index import PatientIndex
+from visit_log import VisitLog
+from id_allocator import IdAllocator, max_numeric_id
+from waitlist import Waitlist
+from utilization import UtilizationStats, HOSPITAL
+from roster_import import parse_roster, validate_roster, slot_hours
+from patient_index import normalize_name
+from expiry_sweeper import ExpirySweeper, normalize_expiry
+from demand_forecast import DemandForecaster, METHODS, day_number, day_string, today_number
+from purchase_ledger import PurchaseLedger, to_timestamp, GROUPS
+from sales_rollup import SalesRollup
+from pharmacy_locations import StockIndex, DEFAULT_LOCATION, serial_location, nearest_stocked
+from stock_alerts import StockAlerts
+from fefo_index import FefoIndex
+from pharmacy_catalog import MedicineCatalog, SortedNames
+from medicine_search import MedicineSearch
+
+@asynccontextmanager
+async def lifespan(app):
+    migrate_visit_history()
+    restore_billing()
+    restore_emergency_queue()
+    restore_utilization()
+    expiry_sweeper.start()
+    stock_alerts.start(medicine_store.registry_lock)
+    yield
+    stock_alerts.stop()
+    expiry_sweeper.stop()
+    triage_journal.close()
+    utilization_journal.close()
 
 app = FastAPI(
     title="Hospital Management System API",
     version="4.0.0",
-    description="Unified API for Emergency Triage, Hospital Navigation, Doctor Appointments, and Pharmacy Management"
+    description="Unified API for Emergency Triage, Hospital Navigation, Doctor Appointments, and Pharmacy Management",
+    lifespan=lifespan
 )
 
 # Enable CORS for React frontend
@@ -21,6 +65,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ==================== EMERGENCY TRIAGE MODULE ====================
@@ -84,6 +129,14 @@ patient_queue = []
 arrival_counter = [0]
 patient_start_times = {}
 patient_doctors = {}
+# Ordered view of patient_queue for paginated listing
+queue_index = TriageIndex()
+# Queue mutations are journaled so a restart can rebuild the queue
+TRIAGE_JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_journal.jsonl")
+triage_journal = TriageJournal(TRIAGE_JOURNAL_FILE)
+queue_lock = threading.Lock()
+# Severity counters kept up to date on every push and pop
+queue_stats = TriageStats()
 
 # Pydantic models for Emergency Triage
 class PatientInput(BaseModel):
@@ -107,6 +160,21 @@ class StatsResponse(BaseModel):
     Moderate: int
     Normal: int
 
+class SeverityStats(BaseModel):
+    waiting: int
+    arrivals: int
+    treated: int
+    averageWaitMinutes: float
+    maxWaitMinutes: float
+    longestWaitingMinutes: float
+    treatedLastHour: int
+
+class DetailedStatsResponse(BaseModel):
+    severities: Dict[str, SeverityStats]
+    totalWaiting: int
+    totalArrivals: int
+    treatedLastHour: int
+
 class MessageResponse(BaseModel):
     message: str
     patient: dict
@@ -120,6 +188,13 @@ def get_severity_label(priority: int) -> str:
     labels = {1: "Critical", 2: "Serious", 3: "Moderate", 4: "Normal"}
     return labels.get(priority, "Normal")
 
+# Symptom lookup and the symptom list response are built once at startup
+symptom_index = SymptomIndex(severity_map)
+symptoms_payload = json.dumps([
+    {"name": name.title(), "severity": get_severity_label(priority)}
+    for name, priority in symptom_index.catalog
+]).encode()
+
 def format_time_ago(start_time):
     elapsed = int(time.time() - start_time)
     if elapsed < 60:
@@ -148,6 +223,48 @@ def assign_doctor(priority: int) -> str:
         index = arrival_counter[0] % 3
         return doctors[7 + index]
 
+def build_detailed_stats():
+    """Read the incremental counters, O(1) in the queue length"""
+    now = time.time()
+    oldest_starts = {}
+    for priority in queue_stats.waiting:
+        arrival = queue_index.oldest(priority)
+        oldest_starts[priority] = patient_start_times.get(arrival) if arrival is not None else None
+    
+    severities = {}
+    for priority, figures in queue_stats.snapshot(now, oldest_starts).items():
+        severities[get_severity_label(priority)] = figures
+    
+    return {
+        "severities": severities,
+        "totalWaiting": queue_stats.total_waiting,
+        "totalArrivals": arrival_counter[0],
+        "treatedLastHour": sum(figures["treatedLastHour"] for figures in severities.values())
+    }
+
+def restore_emergency_queue():
+    """Rebuild the queue by replaying the journal, then start journaling"""
+    live, counter = replay_queue(triage_journal.read())
+    
+    with queue_lock:
+        for record in live:
+            priority, arrival, patient = record["priority"], record["arrival"], record["patient"]
+            heapq.heappush(patient_queue, (priority, arrival, patient))
+            queue_index.push(priority, arrival, patient)
+            queue_stats.push(priority, record["doctor"], restored=True)
+            patient_start_times[arrival] = record["start"]
+            patient_doctors[arrival] = record["doctor"]
+        arrival_counter[0] = counter
+    
+    triage_journal.open(checkpoint_records(live, counter))
+
+def wait_durable(seq):
+    """Wait for a journaled mutation to reach disk; 503 if the journal can no longer be written"""
+    try:
+        triage_journal.wait(seq)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Triage journal is not writable: {e}")
+
 # ==================== HOSPITAL NAVIGATION MODULE ====================
 
 # Hospital graph from Hospital_Graph_DSA.py
@@ -233,6 +350,8 @@ location_data = {
     "IWA": {"name": "Inpatient Ward A", "icon": "🛏️"},
     "IWB": {"name": "Inpatient Ward B", "icon": "🏨"},
     "PHR": {"name": "Pharmacy", "icon": "💊"},
+    "PHR-ER": {"name": "ER Dispensary", "icon": "💊"},
+    "PHR-IW": {"name": "Ward Dispensary", "icon": "💊"},
     "CAF": {"name": "Cafeteria", "icon": "🍽️"}
 }
 
@@ -242,7 +361,7 @@ def initialize_graph():
     global hospital_graph
     hospital_graph = {}
     
-    locations = ["PKG", "ME", "ER", "OPC", "RAD", "LAB", "SUR", "IWA", "IWB", "PHR", "CAF"]
+    locations = ["PKG", "ME", "ER", "OPC", "RAD", "LAB", "SUR", "IWA", "IWB", "PHR", "PHR-ER", "PHR-IW", "CAF"]
     
     for loc in locations:
         add_vertex(hospital_graph, loc)
@@ -263,7 +382,10 @@ def initialize_graph():
         ("IWA", "IWB", 80),
         ("IWA", "SUR", 100),
         ("IWB", "SUR", 70),
-        ("CAF", "IWA", 140)
+        ("CAF", "IWA", 140),
+        ("ER", "PHR-ER", 30),
+        ("IWA", "PHR-IW", 40),
+        ("IWB", "PHR-IW", 40)
     ]
     
     for loc1, loc2, dist in edges:
@@ -279,12 +401,23 @@ APPOINTMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Doc
 os.makedirs(APPOINTMENTS_DIR, exist_ok=True)
 PATIENTS_FILE = os.path.join(APPOINTMENTS_DIR, "Patients.json")
 DOCTORS_FILE = os.path.join(APPOINTMENTS_DIR, "Doctors.json")
+CALENDAR_FILE = os.path.join(APPOINTMENTS_DIR, "Calendar.json")
+VISITS_DIR = os.path.join(APPOINTMENTS_DIR, "Visits")
+IDS_FILE = os.path.join(APPOINTMENTS_DIR, "Ids.json")
+WAITLIST_FILE = os.path.join(APPOINTMENTS_DIR, "Waitlist.json")
+UTILIZATION_JOURNAL_FILE = os.path.join(APPOINTMENTS_DIR, "Utilization.jsonl")
 
 # File paths for Pharmacy
 PHARMACY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Inventory_Management")
 os.makedirs(PHARMACY_DIR, exist_ok=True)
 MEDICINE_FILE = os.path.join(PHARMACY_DIR, "medicine.json")
 PATIENT_BILLING_FILE = os.path.join(PHARMACY_DIR, "patient.json")
+WRITE_OFF_LOG_FILE = os.path.join(PHARMACY_DIR, "writeoffs.jsonl")
+PURCHASE_LEDGER_DIR = os.path.join(PHARMACY_DIR, "Ledger")
+BILLING_ACCOUNTS_FILE = os.path.join(PHARMACY_DIR, "billing_accounts.json")
+PURCHASES_DIR = os.path.join(PHARMACY_DIR, "Purchases")
+RECENT_PURCHASES = 10  # purchases shown per account in the patient listing
+ALERT_THRESHOLDS_FILE = os.path.join(PHARMACY_DIR, "alert_thresholds.json")
 
 # Initialize JSON files if they don't exist
 def init_json_files():
@@ -297,28 +430,241 @@ def init_json_files():
 
 init_json_files()
 
+# Registries live in memory with per-record locks and versions; saves are atomic and coalesced
+patient_store = RegistryStore(PATIENTS_FILE)
+doctor_store = RegistryStore(DOCTORS_FILE)
+
 # Load data
 def load_patients():
-    try:
-        with open(PATIENTS_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
+    return patient_store.data
 
 def load_doctors():
+    return doctor_store.data
+
+def save_patients(patients=None):
+    patient_store.save()
+
+def save_doctors(doctors_data=None):
+    doctor_store.save()
+
+# New ids come from persistent monotonic counters, so a deleted id is never reissued
+patient_ids = IdAllocator(IDS_FILE, "patients", seed=max_numeric_id(patient_store.data))
+doctor_ids = IdAllocator(IDS_FILE, "doctors", seed=max_numeric_id(doctor_store.data))
+
+def new_id(allocator, store):
+    """Next free id, skipping any the terminal app may have created meanwhile"""
+    while True:
+        candidate = str(allocator.allocate())
+        if candidate not in store:
+            return candidate
+
+# Visit history lives in per-patient append-only logs, not in Patients.json.
+# Records keep an empty "history" list for the terminal app; anything it
+# appended there is moved into the log on startup.
+visit_log = VisitLog(VISITS_DIR)
+
+def migrate_visit_history():
+    """Move visit history the terminal app left in Patients.json into the logs"""
+    moved = False
+    for pid, pdata in patient_store.items():
+        if pdata.get('history'):
+            visit_log.extend(pid, pdata['history'])
+            pdata['history'] = []
+            moved = True
+    if moved:
+        save_patients()
+
+# Patient search indexes (name prefix, contact, age), kept in step with add/delete
+patient_index = PatientIndex()
+patient_index.build(patient_store.items())
+patient_index_lock = threading.Lock()
+
+# Free-slot index per speciality, utilization rollups and each patient's bookings,
+# kept in step with every change to doctors' slots. Slot changes update them while
+# holding the doctor's lock, then take index_lock.
+slot_index = SlotIndex()
+utilization = UtilizationStats()
+patient_bookings = {}  # patient_id -> set of (doctor_id, hour)
+index_lock = threading.Lock()
+
+# Appointment events (booked, completed, no-show, cancelled) are journaled for the rollups
+utilization_journal = TriageJournal(UTILIZATION_JOURNAL_FILE)
+
+def index_doctor(doctor_id, ddata):
+    speciality = ddata.get('speciality', 'General')
+    slot_index.set_doctor(doctor_id, ddata['name'], speciality, ddata['slots'])
+    utilization.set_doctor(doctor_id, normalize_speciality(speciality), ddata['slots'])
+    for hour, patient_id in ddata['slots'].items():
+        if patient_id is not None:
+            patient_bookings.setdefault(patient_id, set()).add((doctor_id, int(hour)))
+
+def unindex_doctor(doctor_id, ddata):
+    slot_index.remove_doctor(doctor_id)
+    utilization.remove_doctor(doctor_id)
+    for hour, patient_id in ddata['slots'].items():
+        if patient_id is not None:
+            unlink_booking(patient_id, doctor_id, int(hour))
+
+def unlink_booking(patient_id, doctor_id, hour):
+    bookings = patient_bookings.get(patient_id)
+    if bookings is not None:
+        bookings.discard((doctor_id, hour))
+        if not bookings:
+            del patient_bookings[patient_id]
+
+def slot_changed(doctor_id, hour, old_patient, new_patient):
+    """A slot moved from one patient (or None = free) to another; call while holding the doctor's lock"""
+    with index_lock:
+        if old_patient is not None:
+            unlink_booking(old_patient, doctor_id, hour)
+        if new_patient is not None:
+            patient_bookings.setdefault(new_patient, set()).add((doctor_id, hour))
+        if (old_patient is None) != (new_patient is None):
+            if new_patient is None:
+                slot_index.mark_free(doctor_id, hour)
+            else:
+                slot_index.mark_booked(doctor_id, hour)
+            utilization.slot_changed(doctor_id, hour, new_patient is not None)
+
+def record_event(event, doctor_id, hour):
+    with index_lock:
+        speciality = utilization.doctors.get(doctor_id)
+        if speciality is None:
+            return
+        record = {"doctor": doctor_id, "speciality": speciality, "day": date.today().isoformat(),
+                  "hour": hour, "event": event}
+        utilization.record(event, doctor_id, speciality, record["day"], hour)
+        utilization_journal.append(record)
+
+def restore_utilization():
+    """Fold the event journal back into the rollups, then start journaling"""
+    records = utilization_journal.read()
+    with index_lock:
+        utilization.replay(records)
+    utilization_journal.open(UtilizationStats.compact(records))
+
+for _doctor_id, _ddata in load_doctors().items():
+    index_doctor(_doctor_id, _ddata)
+
+# Multi-day calendars (doctor_id -> DoctorCalendar), alongside the one-day hourly slots.
+# A calendar is read and changed under its doctor's lock; calendars_lock guards adding
+# and removing calendars, and saves are serialized so they never interleave on disk.
+def load_calendars():
     try:
-        with open(DOCTORS_FILE, 'r') as f:
-            return json.load(f)
+        with open(CALENDAR_FILE, 'r') as f:
+            return {did: DoctorCalendar.from_json(data) for did, data in json.load(f).items()}
     except:
         return {}
 
-def save_patients(patients):
-    with open(PATIENTS_FILE, 'w') as f:
-        json.dump(patients, f, indent=3)
-
-def save_doctors(doctors_data):
-    with open(DOCTORS_FILE, 'w') as f:
-        json.dump(doctors_data, f, indent=3)
+def save_calendars():
+    """Write every calendar; call without holding any doctor's lock"""
+    with calendar_save_lock:
+        with calendars_lock:
+            snapshot = list(calendars.items())
+        payload = {}
+        for did, calendar in snapshot:
+            try:
+                with doctor_store.lock(did):
+                    payload[did] = calendar.to_json()
+            except KeyError:
+                continue  # doctor deleted, its calendar is going away
+        tmp_path = CALENDAR_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, indent=3)
+        os.replace(tmp_path, CALENDAR_FILE)
+
+calendars = load_calendars()
+calendars_lock = threading.Lock()
+calendar_save_lock = threading.Lock()
+
+def get_calendar(doctor_id, ddata):
+    """Calendar of a doctor, seeding a daily shift from their hourly slots if they have none"""
+    with calendars_lock:
+        if doctor_id not in calendars:
+            hours = [int(t) for t in ddata['slots']]
+            calendars[doctor_id] = DoctorCalendar(daily_shifts(min(hours), max(hours) + 1) if hours else {})
+        return calendars[doctor_id]
+
+# Waitlists per doctor and per speciality; a released slot goes straight to the best entry
+def load_waitlist():
+    """Saved waitlist, or an empty one if none was saved yet. A corrupt file is an
+    error: starting empty would drop every entry and reuse their ids."""
+    try:
+        with open(WAITLIST_FILE, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return Waitlist()
+    except ValueError as e:
+        raise RuntimeError(f"Waitlist file {WAITLIST_FILE} is corrupt: {e}") from e
+    return Waitlist.from_json(data)
+
+def save_waitlist():
+    """Write the waitlist atomically; saves are serialized so an older snapshot never replaces a newer one"""
+    with waitlist_save_lock:
+        with waitlist_lock:
+            payload = json.dumps(waitlist.to_json(), indent=3)
+        tmp_path = WAITLIST_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, WAITLIST_FILE)
+
+waitlist = load_waitlist()
+waitlist_lock = threading.Lock()
+waitlist_save_lock = threading.Lock()
+
+# A slot handed to a waitlist entry records the entry id in the doctor's record, which is
+# saved first; entries that a saved hand-over already used are dropped on load
+for _doctor_id, _ddata in load_doctors().items():
+    waitlist.discard_filled(_ddata.get('waitlist_fills', {}).values())
+
+def release_slot(doctor_id, hour, patient_id):
+    """
+    Release a slot held by `patient_id`: hand it to the most urgent waiting
+    patient, or mark it free. Runs under the doctor's lock, so the hand-over
+    is a single compare-and-set. The slot records the entry it was filled
+    from, and the entry stays in the saved waitlist until the doctors are
+    saved. Returns the waitlist entry that got the slot, or None.
+    Raises KeyError or SlotConflict like RegistryStore.set_slot.
+    """
+    time_str = str(hour)
+    with doctor_store.lock(doctor_id):
+        doctor = doctor_store.get(doctor_id)
+        current = doctor['slots'][time_str]
+        if current != patient_id:
+            raise SlotConflict(current, doctor.get('version', 0))
+        
+        speciality = normalize_speciality(doctor.get('speciality'))
+        with waitlist_lock:
+            entry = waitlist.match(doctor_id, speciality)
+            while entry is not None and entry['patient_id'] not in patient_store:
+                waitlist.confirm(entry['id'])
+                entry = waitlist.match(doctor_id, speciality)
+        
+        new_patient = entry['patient_id'] if entry else None
+        
+        def hand_over(record):
+            fills = record.setdefault('waitlist_fills', {})
+            if entry is not None:
+                fills[time_str] = entry['id']
+            else:
+                fills.pop(time_str, None)
+            slot_changed(doctor_id, hour, patient_id, new_patient)
+        
+        try:
+            doctor_store.set_slot(doctor_id, time_str, patient_id, new_patient, on_success=hand_over)
+        except (KeyError, SlotConflict):
+            if entry is not None:
+                with waitlist_lock:
+                    waitlist.unmatch(entry)
+            raise
+    
+    save_doctors()
+    if entry is not None:
+        record_event("booked", doctor_id, hour)
+        with waitlist_lock:
+            waitlist.confirm(entry['id'])
+        save_waitlist()
+    return entry
 
 # Pydantic models for Appointments
 class PatientCreate(BaseModel):
@@ -336,6 +682,7 @@ class AppointmentBook(BaseModel):
     doctor_id: str
     patient_id: str
     time: int = Field(..., ge=0, le=23)
+    expected_version: Optional[int] = None  # reject if the doctor's schedule changed since it was read
 
 class DoctorVisit(BaseModel):
     doctor_id: str
@@ -347,19 +694,56 @@ class PatientRecord(BaseModel):
     name: str
     age: int
     contact: str
-    history: List[Dict]
+    visit_count: int = 0
 
 class DoctorRecord(BaseModel):
     doctor_id: str
     name: str
     speciality: str
     slots: Dict[str, Optional[str]]
+    version: int = 0
 
 class AppointmentResponse(BaseModel):
     message: str
     available_slots: Optional[List[int]] = None
     appointment: Optional[Dict] = None
 
+class ShiftTemplate(BaseModel):
+    weekday: int = Field(..., ge=0, le=6)  # 0 = Monday
+    start: str  # "HH:MM"
+    end: str
+
+class ShiftUpdate(BaseModel):
+    shifts: List[ShiftTemplate]
+
+class AppointmentCancel(BaseModel):
+    patient_id: str
+    doctor_id: str
+    time: int = Field(..., ge=0, le=23)
+
+class AppointmentReschedule(BaseModel):
+    patient_id: str
+    doctor_id: str
+    time: int = Field(..., ge=0, le=23)
+    new_doctor_id: Optional[str] = None  # defaults to the same doctor
+    new_time: int = Field(..., ge=0, le=23)
+
+class NoShow(BaseModel):
+    doctor_id: str
+    time: int
+
+class WaitlistRequest(BaseModel):
+    patient_id: str
+    doctor_id: Optional[str] = None   # wait for this doctor...
+    speciality: Optional[str] = None  # ...or for any doctor of this speciality
+    urgency: int = Field(3, ge=1, le=4)  # 1 = most urgent
+
+class CalendarBooking(BaseModel):
+    doctor_id: str
+    patient_id: str
+    start: datetime
+    duration_minutes: int = Field(30, ge=5, le=720)
+
 # ==================== PHARMACY MODULE ====================
 
 # Initialize pharmacy JSON files
@@ -373,17 +757,50 @@ def init_pharmacy_files():
 
 init_pharmacy_files()
 
+# Inventory lives in memory; every change to it happens under the store's
+# registry lock and saves are atomic and coalesced
+medicine_store = RegistryStore(MEDICINE_FILE, indent=4)
+
 # Pharmacy helper functions
 def load_medicines():
-    try:
-        with open(MEDICINE_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
+    return medicine_store.data
 
-def save_medicines(data):
-    with open(MEDICINE_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def save_medicines(data=None):
+    medicine_store.save()
+
+# Dispensaries are the PHR-style nodes of the hospital graph; serials carry the
+# location they are stocked at, and stock_index counts them per location.
+# It changes only under the inventory lock.
+PHARMACY_LOCATIONS = [loc for loc in location_data if loc.startswith(DEFAULT_LOCATION)]
+stock_index = StockIndex()
+stock_index.build(medicine_store.items())
+
+# Serials per medicine and location in expiry order, for dispensing N at once
+fefo_index = FefoIndex()
+fefo_index.build(medicine_store.items())
+
+# Sorted medicine names and price ranges for the paged summary listing
+medicine_catalog = MedicineCatalog()
+medicine_catalog.build(medicine_store.items())
+
+# Typo-tolerant search over medicine names and their synonyms
+medicine_search = MedicineSearch()
+medicine_search.build((name, record.get("synonyms", [])) for name, record in medicine_store.items())
+
+# Low-stock and near-expiry alerts, checked on every inventory change and by
+# an expiry clock; also called under the inventory lock
+stock_alerts = StockAlerts(medicine_store, ALERT_THRESHOLDS_FILE)
+stock_alerts.build(medicine_store.items())
+
+def on_write_offs(write_offs):
+    for write_off in write_offs:
+        stock_index.remove(write_off["medicine"], write_off["location"], write_off["expiry"])
+        medicine_catalog.remove_serial(write_off["medicine"], write_off["price"])
+    stock_alerts.retired(write_offs)
+
+# Expired serials are retired by a background sweeper, not by billing
+expiry_sweeper = ExpirySweeper(medicine_store, WRITE_OFF_LOG_FILE, on_retire=on_write_offs)
+expiry_sweeper.build()
 
 def load_patient_billing():
     try:
@@ -393,8 +810,185 @@ def load_patient_billing():
         return {}
 
 def save_patient_billing(data):
-    with open(PATIENT_BILLING_FILE, 'w') as f:
+    tmp_path = PATIENT_BILLING_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
         json.dump(data, f, indent=4)
+    os.replace(tmp_path, PATIENT_BILLING_FILE)
+
+# Billing accounts hold running totals and the frequency map in a compact
+# store: one per registry patient (keyed by patient id) and one per walk-in
+# name (keyed W1, W2, ...). Purchases go to a paged log per account, the same
+# kind as visit history. patient.json is only the terminal app's inbox now:
+# purchases it records there are moved into the accounts on startup.
+billing_store = RegistryStore(BILLING_ACCOUNTS_FILE, indent=None)
+purchase_log = VisitLog(PURCHASES_DIR)
+# Walk-in accounts by normalized name, so spellings that differ only in case or spacing share one
+walk_in_accounts = {normalize_name(record["name"]): account_id for account_id, record in billing_store.items()
+                    if record.get("patient_id") is None}
+walk_in_ids = IdAllocator(IDS_FILE, "walk_ins",
+                          seed=max((int(account_id[1:]) for account_id, record in billing_store.items()
+                                    if record.get("patient_id") is None), default=0))
+
+# Account names in sorted order, for the paged patient listing
+account_names = SortedNames()
+for account_id, record in billing_store.items():
+    account_names.add(record["name"], account_id)
+account_lock = threading.Lock()  # opening accounts, walk_in_accounts and account_names
+
+def find_account(patient_name=None, patient_id=None):
+    """
+    (account id, name, patient id) to bill: the registry patient's account
+    for a patient id; for a name, its walk-in account, else the account of
+    the one registry patient with that name, else (None, name, None) for a
+    new walk-in account. Raises KeyError for an unknown patient id and
+    ValueError when several registry patients have the name.
+    """
+    if patient_id is not None:
+        pdata = patient_store.get(patient_id)
+        if pdata is None:
+            raise KeyError(patient_id)
+        return patient_id, pdata["name"], patient_id
+    name = patient_name.strip()
+    with account_lock:
+        account_id = walk_in_accounts.get(normalize_name(name))
+        if account_id is not None:
+            return account_id, billing_store.get(account_id)["name"], None
+    with patient_index_lock:
+        matches = patient_index.named(name)
+    if len(matches) > 1:
+        raise ValueError(name)
+    if matches:
+        return matches[0], patient_store.get(matches[0])["name"], matches[0]
+    return None, name, None
+
+def open_account(account_id, name, patient_id):
+    """Id of the account, created if it does not exist (as a walk-in account if account_id is None)"""
+    with account_lock:
+        if account_id is None:
+            account_id = walk_in_accounts.get(normalize_name(name))
+            if account_id is None:
+                account_id = f"W{walk_in_ids.allocate()}"
+                while account_id in billing_store:
+                    account_id = f"W{walk_in_ids.allocate()}"
+                walk_in_accounts[normalize_name(name)] = account_id
+        if account_id not in billing_store:
+            billing_store.put(account_id, {
+                "name": name,
+                "patient_id": patient_id,
+                "total_purchases": 0,
+                "total_price": 0,
+                "frequency": {}
+            })
+            account_names.add(name, account_id)
+    return account_id
+
+def add_to_totals(account, purchases):
+    frequency = account["frequency"]
+    for purchase in purchases:
+        frequency[purchase["medicine"]] = frequency.get(purchase["medicine"], 0) + 1
+    account["total_purchases"] += len(purchases)
+    account["total_price"] += sum(purchase["price"] for purchase in purchases)
+    account["version"] = account.get("version", 0) + 1
+
+def record_purchases(account_id, purchases):
+    """Append purchases to an account's log and add them to its running totals"""
+    with billing_store.lock(account_id):
+        account = billing_store.get(account_id)
+        add_to_totals(account, purchases)
+        purchase_log.extend(account_id, purchases)
+        return dict(account)
+
+def account_summary(account_id, account):
+    return {
+        "account_id": account_id,
+        "patient_id": account.get("patient_id"),
+        "name": account["name"],
+        "total_purchases": account["total_purchases"],
+        "total_price": account["total_price"]
+    }
+
+# Every sale is also appended to a columnar ledger for reports; opened on startup
+purchase_ledger = None
+
+def migrate_billing_history():
+    """
+    Move purchases recorded in patient.json into billing accounts and the ledger.
+    The accounts' new totals are saved first, together with a "migrating" mark
+    holding the purchase log length (and ledger length) they lead to; then the
+    logs and the ledger are filled up to those lengths, patient.json is emptied
+    and the marks are dropped. A run cut short by a crash is finished by the
+    next start from the marks, without importing anything twice.
+    """
+    patients = load_patient_billing()
+    had_accounts = len(billing_store) > 0
+    by_account = {}  # account id -> its purchases from patient.json, in file order
+    account_of = {}  # patient.json name -> account id
+    for name, pdata in patients.items():
+        purchases = pdata.get("purchases", [])
+        if not purchases:
+            continue
+        try:
+            account_id = open_account(*find_account(patient_name=name))
+        except ValueError:
+            account_id = open_account(None, name.strip(), None)  # ambiguous name: keep it a walk-in
+        by_account.setdefault(account_id, []).extend(purchases)
+        account_of[name] = account_id
+    if not by_account:
+        return
+    
+    sales = sorted(({"timestamp": to_timestamp(purchase["date"]), "medicine": purchase["medicine"],
+                     "patient": account_id, "serial": purchase["serial"], "price": purchase["price"]}
+                    for account_id, purchases in by_account.items() for purchase in purchases),
+                   key=lambda sale: sale["timestamp"])
+    marks = [billing_store.get(account_id).get("migrating") for account_id in by_account]
+    resumed = next((mark for mark in marks if mark is not None), None)
+    if resumed is not None:
+        ledger_target = resumed["ledger"]
+    elif had_accounts or len(purchase_ledger) == 0:
+        ledger_target = len(purchase_ledger) + len(sales)
+    else:
+        ledger_target = None  # a ledger filled before accounts existed already holds every purchase
+    
+    for account_id, purchases in by_account.items():
+        account = billing_store.get(account_id)
+        if "migrating" not in account:
+            add_to_totals(account, purchases)
+            account["migrating"] = {"log": purchase_log.count(account_id) + len(purchases), "ledger": ledger_target}
+    billing_store.save()
+    
+    for account_id, purchases in by_account.items():
+        missing = billing_store.get(account_id)["migrating"]["log"] - purchase_log.count(account_id)
+        if missing > 0:
+            purchase_log.extend(account_id, purchases[len(purchases) - missing:])
+    if ledger_target is not None:
+        missing = ledger_target - len(purchase_ledger)
+        if missing > 0:
+            purchase_ledger.append_many(sales[len(sales) - missing:])
+    else:
+        # The ledger was built from patient.json by name: point its rows at the accounts instead
+        purchase_ledger.relabel("patient", account_of)
+    
+    for name in account_of:
+        patients[name]["purchases"] = []
+    save_patient_billing(patients)
+    for account_id in by_account:
+        billing_store.get(account_id).pop("migrating", None)
+    billing_store.save()
+
+# Daily demand per medicine for forecasting and per-day sales buckets with
+# Fenwick trees for date-range totals, both loaded from the ledger on startup
+# and then fed by every bill
+demand_forecaster = DemandForecaster()
+sales_rollup = SalesRollup()
+
+def restore_billing():
+    """Open the purchase ledger, move patient.json's purchases in and load the sales rollups"""
+    global purchase_ledger
+    purchase_ledger = PurchaseLedger(PURCHASE_LEDGER_DIR)
+    migrate_billing_history()
+    daily_sales = purchase_ledger.daily_buckets()
+    demand_forecaster.load(daily_sales)
+    sales_rollup.load(daily_sales)
 
 # Pydantic models for Pharmacy
 class MedicineSerial(BaseModel):
@@ -402,10 +996,21 @@ class MedicineSerial(BaseModel):
     serial: str
     expiry: str
     price: float
+    location: str = DEFAULT_LOCATION
+
+class MedicineSynonyms(BaseModel):
+    synonyms: List[str] = Field(default_factory=list, max_length=50)
 
 class BillingRequest(BaseModel):
-    patient_name: str
+    patient_name: Optional[str] = None
+    patient_id: Optional[str] = None  # appointments registry id; bills that patient's account
     medicine_name: str
+    location: Optional[str] = None  # dispense from this pharmacy only; any pharmacy if omitted
+    quantity: int = Field(1, ge=1, le=1000)
+
+class AlertThresholds(BaseModel):
+    reorder_level: Optional[int] = Field(None, ge=0)
+    expiry_warning_days: Optional[int] = Field(None, ge=0, le=3650)
 
 class MedicineInfo(BaseModel):
     name: str
@@ -434,7 +1039,7 @@ def root():
             "pharmacy": "/api/pharmacy/*"
         },
         "statistics": {
-            "patients_in_queue": len(patient_queue),
+            "patients_in_queue": queue_stats.total_waiting,
             "hospital_locations": len(hospital_graph),
             "registered_patients": len(load_patients()),
             "registered_doctors": len(load_doctors()),
@@ -451,7 +1056,7 @@ def health_check():
         "services": {
             "emergency_triage": {
                 "active": True,
-                "queue_size": len(patient_queue),
+                "queue_size": queue_stats.total_waiting,
                 "total_arrivals": arrival_counter[0]
             },
             "navigation": {
@@ -467,7 +1072,7 @@ def health_check():
             "pharmacy": {
                 "active": True,
                 "medicine_types": len(load_medicines()),
-                "total_stock": sum(med.get('stock', 0) for med in load_medicines().values())
+                "total_stock": sum(med.get('stock', 0) for _, med in medicine_store.items())
             }
         }
     }
@@ -475,12 +1080,32 @@ def health_check():
 # ==================== EMERGENCY TRIAGE ENDPOINTS ====================
 
 @app.get("/api/emergency/patients", response_model=List[PatientResponse], tags=["Emergency Triage"])
-def get_patients():
-    """Get all patients in emergency queue"""
-    sorted_queue = sorted(patient_queue)
-    patients_list = []
+def get_patients(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    severity: Optional[str] = None
+):
+    """Get patients in emergency queue in treatment order, optionally paginated"""
+    priority_filter = None
+    if severity is not None:
+        priority_filter = parse_severity(severity)
+        if priority_filter is None:
+            raise HTTPException(status_code=400, detail=f"Unknown severity '{severity}'")
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+    
+    page, next_cursor = queue_index.page(limit=limit, cursor=after, priority=priority_filter)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    for idx, (priority, arrival, patient) in enumerate(sorted_queue):
+    patients_list = []
+    for priority, arrival, patient, position in page:
         time_str = format_time_ago(patient_start_times.get(arrival, time.time()))
         
         patients_list.append(PatientResponse(
@@ -491,37 +1116,48 @@ def get_patients():
             symptom=patient['symptom'].title(),
             waitTime=time_str,
             doctor=patient_doctors.get(arrival, "Unassigned"),
-            queuePosition=idx + 1
+            queuePosition=position
         ))
     
     return patients_list
 
 @app.post("/api/emergency/patients", response_model=MessageResponse, status_code=201, tags=["Emergency Triage"])
 def add_patient(patient_input: PatientInput):
-    """Add new patient to emergency queue"""
-    symptom_lower = patient_input.symptom.lower().strip()
-    
-    if symptom_lower not in severity_map:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unknown symptom '{patient_input.symptom}'. Please select a valid symptom."
-        )
-    
-    priority = severity_map[symptom_lower]
-    arrival_counter[0] += 1
-    arrival = arrival_counter[0]
-    
+    """Add new patient to emergency queue (most severe of the listed symptoms; uncertain ones are rejected with suggestions)"""
+    match, matches, unmatched = symptom_index.resolve(patient_input.symptom)
+    
+    # A symptom that is not certain is sent back with suggestions rather than guessed or dropped
+    if match is None or unmatched:
+        hints = []
+        for part in unmatched:
+            suggestions = ", ".join(name.title() for name in symptom_index.suggest(part, 5))
+            hints.append(f"Unknown symptom '{part}'." + (f" Did you mean: {suggestions}?" if suggestions else ""))
+        raise HTTPException(status_code=400, detail=" ".join(hints) + " Please select a valid symptom.")
+    
+    symptom_lower, priority, _ = match
     patient = {
         "name": patient_input.name,
         "age": patient_input.age,
         "symptom": symptom_lower
     }
     
-    patient_start_times[arrival] = time.time()
-    doctor = assign_doctor(priority)
-    patient_doctors[arrival] = doctor
-    
-    heapq.heappush(patient_queue, (priority, arrival, patient))
+    with queue_lock:
+        arrival_counter[0] += 1
+        arrival = arrival_counter[0]
+        
+        patient_start_times[arrival] = time.time()
+        doctor = assign_doctor(priority)
+        patient_doctors[arrival] = doctor
+        
+        heapq.heappush(patient_queue, (priority, arrival, patient))
+        queue_index.push(priority, arrival, patient)
+        queue_stats.push(priority, doctor)
+        
+        seq = triage_journal.append({
+            "op": "add", "arrival": arrival, "counter": arrival_counter[0], "priority": priority,
+            "patient": patient, "start": patient_start_times[arrival], "doctor": doctor
+        })
+    wait_durable(seq)
     
     return MessageResponse(
         message=f"Patient '{patient['name']}' registered successfully",
@@ -531,25 +1167,33 @@ def add_patient(patient_input: PatientInput):
             "severity": get_severity_label(priority),
             "condition": symptom_lower.title(),
             "doctor": doctor,
-            "queuePosition": len(patient_queue)
+            "queuePosition": len(patient_queue),
+            "matchedSymptoms": [name.title() for name, _, _ in matches]
         }
     )
 
 @app.post("/api/emergency/patients/treat", response_model=MessageResponse, tags=["Emergency Triage"])
 def treat_patient():
     """Treat next patient in queue"""
-    if not patient_queue:
-        raise HTTPException(status_code=400, detail="No patients in queue")
-    
-    priority, arrival, patient = heapq.heappop(patient_queue)
-    
-    wait_time = get_waiting_minutes(patient_start_times.get(arrival, time.time()))
-    doctor = patient_doctors.get(arrival, "Unknown")
-    
-    if arrival in patient_start_times:
-        del patient_start_times[arrival]
-    if arrival in patient_doctors:
-        del patient_doctors[arrival]
+    with queue_lock:
+        if not patient_queue:
+            raise HTTPException(status_code=400, detail="No patients in queue")
+        
+        priority, arrival, patient = heapq.heappop(patient_queue)
+        queue_index.remove(priority, arrival)
+        
+        now = time.time()
+        wait_time = get_waiting_minutes(patient_start_times.get(arrival, now))
+        queue_stats.pop(priority, patient_doctors.get(arrival), now - patient_start_times.get(arrival, now), now)
+        doctor = patient_doctors.get(arrival, "Unknown")
+        
+        if arrival in patient_start_times:
+            del patient_start_times[arrival]
+        if arrival in patient_doctors:
+            del patient_doctors[arrival]
+        
+        seq = triage_journal.append({"op": "treat", "arrival": arrival})
+    wait_durable(seq)
     
     return MessageResponse(
         message=f"Patient '{patient['name']}' is being treated",
@@ -567,30 +1211,42 @@ def get_stats():
     """Get patient statistics by severity"""
     stats = {'Critical': 0, 'Serious': 0, 'Moderate': 0, 'Normal': 0}
     
-    for priority, _, _ in patient_queue:
-        stats[get_severity_label(priority)] += 1
+    for priority, count in queue_stats.waiting.items():
+        stats[get_severity_label(priority)] += count
     
     return StatsResponse(**stats)
 
+@app.get("/api/emergency/stats/detailed", response_model=DetailedStatsResponse, tags=["Emergency Triage"])
+def get_detailed_stats():
+    """Get waiting counts, arrivals, wait times and treatment rate per severity"""
+    return build_detailed_stats()
+
 @app.get("/api/emergency/symptoms", response_model=List[SymptomInfo], tags=["Emergency Triage"])
 def get_symptoms():
     """Get all available symptoms with severity levels"""
-    symptoms = []
-    for symptom, priority in severity_map.items():
-        symptoms.append(SymptomInfo(
-            name=symptom.title(),
-            severity=get_severity_label(priority)
-        ))
-    return sorted(symptoms, key=lambda x: (severity_map[x.name.lower()], x.name))
+    return Response(content=symptoms_payload, media_type="application/json")
+
+@app.get("/api/emergency/symptoms/search", response_model=List[SymptomInfo], tags=["Emergency Triage"])
+def search_symptoms(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete symptoms by word prefix, with typo-tolerant fallback"""
+    return [
+        SymptomInfo(name=name.title(), severity=get_severity_label(symptom_index.severity[name]))
+        for name in symptom_index.suggest(q, limit)
+    ]
 
 @app.delete("/api/emergency/patients/clear", tags=["Emergency Triage"])
 def clear_emergency_queue():
     """Clear all patients from emergency queue"""
-    count = len(patient_queue)
-    patient_queue.clear()
-    patient_start_times.clear()
-    patient_doctors.clear()
-    arrival_counter[0] = 0
+    with queue_lock:
+        count = len(patient_queue)
+        patient_queue.clear()
+        queue_index.clear()
+        queue_stats.clear_waiting()
+        patient_start_times.clear()
+        patient_doctors.clear()
+        arrival_counter[0] = 0
+        seq = triage_journal.append({"op": "clear"})
+    wait_durable(seq)
     return {"message": "Emergency queue cleared successfully", "patientsCleared": count}
 
 # ==================== NAVIGATION ENDPOINTS ====================
@@ -661,32 +1317,61 @@ def find_path(request: PathRequest):
 @app.get("/api/appointments/patients", response_model=List[PatientRecord], tags=["Appointments"])
 def get_all_patients():
     """Get all registered patients"""
-    patients = load_patients()
     result = []
-    for pid, pdata in patients.items():
+    for pid, pdata in patient_store.items():
         result.append(PatientRecord(
             patient_id=pid,
             name=pdata['name'],
             age=pdata['age'],
             contact=pdata['contact'],
-            history=pdata.get('history', [])
+            visit_count=visit_log.count(pid)
         ))
     return result
 
+@app.get("/api/appointments/patients/search", response_model=List[PatientRecord], tags=["Appointments"])
+def search_patients(
+    response: Response,
+    name: Optional[str] = None,
+    contact: Optional[str] = None,
+    min_age: Optional[int] = Query(None, ge=0),
+    max_age: Optional[int] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Find patients by name prefix, exact contact number and/or age range, paginated"""
+    try:
+        with patient_index_lock:
+            page, next_cursor = patient_index.search(name, contact, min_age, max_age, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    patients = load_patients()
+    result = []
+    for pid in page:
+        pdata = patients.get(pid)
+        if pdata is not None:
+            result.append(PatientRecord(patient_id=pid, name=pdata['name'], age=pdata['age'],
+                                        contact=pdata['contact'], visit_count=visit_log.count(pid)))
+    return result
+
 @app.post("/api/appointments/patients", status_code=201, tags=["Appointments"])
 def add_appointment_patient(patient: PatientCreate):
     """Add new patient to registry"""
     patients = load_patients()
-    patient_id = str(len(patients) + 1)
-    
-    patients[patient_id] = {
+    patient_id = new_id(patient_ids, patient_store)
+    patient_store.put(patient_id, {
         "name": patient.name,
         "age": patient.age,
         "contact": patient.contact,
         "history": []
-    }
+    })
     
-    save_patients(patients)
+    save_patients()
+    with patient_index_lock:
+        patient_index.add(patient_id, patient.name, patient.age, patient.contact)
     
     return {
         "message": f"Patient added successfully",
@@ -695,30 +1380,47 @@ def add_appointment_patient(patient: PatientCreate):
     }
 
 @app.get("/api/appointments/patients/{patient_id}/history", tags=["Appointments"])
-def get_patient_history(patient_id: str):
-    """Get patient's appointment history"""
+def get_patient_history(
+    patient_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Get patient's appointment history, oldest first, optionally paginated"""
     patients = load_patients()
     
     if patient_id not in patients:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    start = 0
+    if cursor:
+        if not cursor.isdigit():
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+        start = int(cursor)
+    
+    history = visit_log.read(patient_id, start, limit)
+    total = visit_log.count(patient_id)
+    if start + len(history) < total and limit is not None:
+        response.headers["X-Next-Cursor"] = str(start + len(history))
+    
     return {
         "patient_id": patient_id,
         "name": patients[patient_id]['name'],
-        "history": patients[patient_id].get('history', [])
+        "total_visits": total,
+        "history": history
     }
 
 @app.get("/api/appointments/doctors", response_model=List[DoctorRecord], tags=["Appointments"])
 def get_all_doctors():
     """Get all doctors and their schedules"""
-    doctors_data = load_doctors()
     result = []
-    for did, ddata in doctors_data.items():
+    for did, ddata in doctor_store.items():
         result.append(DoctorRecord(
             doctor_id=did,
             name=ddata['name'],
             speciality=ddata.get('speciality', 'General'),
-            slots=ddata['slots']
+            slots=ddata['slots'],
+            version=ddata.get('version', 0)
         ))
     return result
 
@@ -732,15 +1434,19 @@ def add_doctor(doctor: DoctorCreate):
         )
     
     doctors_data = load_doctors()
-    doctor_id = str(len(doctors_data) + 1)
-    
-    doctors_data[doctor_id] = {
+    doctor_id = new_id(doctor_ids, doctor_store)
+    doctor_store.put(doctor_id, {
         "name": doctor.name,
         "speciality": doctor.speciality,
         "slots": {str(t): None for t in range(doctor.start_time, doctor.end_time)}
-    }
+    })
     
-    save_doctors(doctors_data)
+    save_doctors()
+    with index_lock:
+        index_doctor(doctor_id, doctors_data[doctor_id])
+    with calendars_lock:
+        calendars[doctor_id] = DoctorCalendar(daily_shifts(doctor.start_time, doctor.end_time))
+    save_calendars()
     
     return {
         "message": f"Doctor added successfully",
@@ -748,6 +1454,83 @@ def add_doctor(doctor: DoctorCreate):
         "doctor": doctors_data[doctor_id]
     }
 
+@app.post("/api/appointments/roster", tags=["Appointments"])
+async def import_roster(request: Request, dry_run: bool = False):
+    """
+    Publish a roster of shifts (JSON rows or CSV with doctor_id,name,speciality,weekday,start,end).
+    New doctors are created, existing ones get their weekly shifts replaced; all in one flush,
+    or nothing if any row is invalid.
+    """
+    try:
+        rows = parse_roster(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable roster: {e}")
+    return await run_in_threadpool(apply_roster, rows, dry_run)
+
+def apply_roster(rows, dry_run):
+    existing = {(normalize_name(d['name']), normalize_speciality(d.get('speciality'))): did
+                for did, d in doctor_store.items()}
+    plans, errors = validate_roster(rows, load_doctors(), existing)
+    if errors:
+        raise HTTPException(status_code=400, detail={
+            "message": f"{len(errors)} of {len(rows)} rows are invalid, nothing was published",
+            "errors": errors
+        })
+    
+    missing = [plan['doctor_id'] for plan in plans.values()
+               if plan['doctor_id'] is not None and plan['doctor_id'] not in doctor_store]
+    if missing:
+        raise HTTPException(status_code=409, detail={
+            "message": "Doctors were deleted while the roster was checked, nothing was published",
+            "doctor_ids": missing
+        })
+    
+    created, updated, skipped = [], [], []
+    if not dry_run:
+        for plan in plans.values():
+            doctor_id = plan['doctor_id']
+            if doctor_id is None:
+                doctor_id = new_id(doctor_ids, doctor_store)
+                doctor_store.put(doctor_id, {
+                    "name": plan['name'],
+                    "speciality": plan['speciality'],
+                    "slots": {str(t): None for t in slot_hours(plan['shifts'])}
+                })
+                with index_lock:
+                    index_doctor(doctor_id, doctor_store.get(doctor_id))
+                with calendars_lock:
+                    calendars[doctor_id] = DoctorCalendar()
+                created.append(doctor_id)
+            try:
+                with doctor_store.lock(doctor_id):
+                    if plan['doctor_id'] is not None:
+                        reslot_doctor(doctor_id, slot_hours(plan['shifts']))
+                        updated.append(doctor_id)
+                    get_calendar(doctor_id, doctor_store.get(doctor_id)).set_shifts(plan['shifts'])
+            except KeyError:
+                skipped.append(doctor_id)  # deleted since the check above
+        
+        # One flush for the whole roster
+        save_doctors()
+        save_calendars()
+    
+    return {
+        "message": f"Roster {'validated' if dry_run else 'published'}: {len(rows)} rows, {len(plans)} doctors",
+        "created": created,
+        "updated": updated,
+        "skipped": skipped
+    }
+
+def reslot_doctor(doctor_id, hours):
+    """Make a doctor's free hourly slots exactly `hours`, keeping booked slots; call under the doctor's lock"""
+    slots = {str(hour): None for hour in hours}
+    for time_str, patient_id in doctor_store.get(doctor_id)['slots'].items():
+        if patient_id is not None:
+            slots[time_str] = patient_id
+    doctor_store.update(doctor_id, {"slots": dict(sorted(slots.items(), key=lambda item: int(item[0])))})
+    with index_lock:
+        index_doctor(doctor_id, doctor_store.get(doctor_id))
+
 @app.get("/api/appointments/doctors/{doctor_id}/schedule", tags=["Appointments"])
 def get_doctor_schedule(doctor_id: str):
     """Get doctor's schedule with available/booked slots"""
@@ -766,9 +1549,210 @@ def get_doctor_schedule(doctor_id: str):
         "speciality": doctor.get('speciality', 'General'),
         "available_slots": sorted(available_slots),
         "booked_slots": booked_slots,
-        "total_slots": len(doctor['slots'])
+        "total_slots": len(doctor['slots']),
+        "version": doctor.get('version', 0)
+    }
+
+@app.put("/api/appointments/doctors/{doctor_id}/shifts", tags=["Appointments"])
+def set_doctor_shifts(doctor_id: str, update: ShiftUpdate):
+    """Replace a doctor's recurring weekly shift template"""
+    doctors_data = load_doctors()
+    
+    if doctor_id not in doctors_data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    shifts = {}
+    for shift in update.shifts:
+        try:
+            start, end = parse_clock(shift.start), parse_clock(shift.end)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid shift time {shift.start}-{shift.end}, use HH:MM")
+        if start >= end:
+            raise HTTPException(status_code=400, detail="Shift end must be after shift start")
+        
+        windows = shifts.setdefault(shift.weekday, [])
+        if any(start < e and s < end for s, e in windows):
+            raise HTTPException(status_code=400, detail=f"Overlapping shifts on {WEEKDAYS[shift.weekday]}")
+        windows.append((start, end))
+    
+    try:
+        with doctor_store.lock(doctor_id):
+            calendar = get_calendar(doctor_id, doctors_data[doctor_id])
+            calendar.set_shifts(shifts)
+            windows_by_day = sorted(calendar.shifts.items())
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    save_calendars()
+    
+    return {
+        "message": f"Shifts updated for {doctors_data[doctor_id]['name']}",
+        "shifts": {WEEKDAYS[weekday]: [f"{format_clock(s)}-{format_clock(e)}" for s, e in windows]
+                   for weekday, windows in windows_by_day}
+    }
+
+@app.get("/api/appointments/doctors/{doctor_id}/calendar", tags=["Appointments"])
+def get_doctor_calendar(doctor_id: str, start: Optional[date] = None, days: int = Query(7, ge=1, le=92)):
+    """Get a doctor's bookings and free gaps day by day"""
+    doctors_data = load_doctors()
+    
+    if doctor_id not in doctors_data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    first_day = (start or date.today()).toordinal()
+    
+    result = []
+    try:
+        with doctor_store.lock(doctor_id):
+            calendar = get_calendar(doctor_id, doctors_data[doctor_id])
+            for day in range(first_day, first_day + days):
+                day_start = day * 24 * 60
+                result.append({
+                    "date": date.fromordinal(day).isoformat(),
+                    "weekday": WEEKDAYS[date.fromordinal(day).weekday()],
+                    "bookings": [
+                        {"start": format_clock(s - day_start), "end": format_clock(e - day_start), "patient_id": pid}
+                        for s, e, pid in calendar.bookings_between(day_start, day_start + 24 * 60)
+                    ],
+                    "free": [
+                        {"start": format_clock(s - day_start), "end": format_clock(e - day_start)}
+                        for s, e in calendar.free_gaps(day)
+                    ]
+                })
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    return {
+        "doctor_id": doctor_id,
+        "name": doctors_data[doctor_id]['name'],
+        "days": result
     }
 
+@app.post("/api/appointments/calendar/book", tags=["Appointments"])
+def book_calendar_appointment(booking: CalendarBooking):
+    """Book a variable-length appointment on any date within the doctor's shifts"""
+    doctors_data = load_doctors()
+    
+    if booking.doctor_id not in doctors_data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    if booking.patient_id not in load_patients():
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    start = to_minutes(booking.start)
+    end = start + booking.duration_minutes
+    
+    # Check and book under the doctor's lock, so two requests cannot both take the interval
+    try:
+        with doctor_store.lock(booking.doctor_id):
+            calendar = get_calendar(booking.doctor_id, doctors_data[booking.doctor_id])
+            if not calendar.within_shift(start, end):
+                raise HTTPException(status_code=400, detail="Appointment is outside the doctor's shifts")
+            
+            clash = calendar.conflict(start, end)
+            if clash is not None:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Conflicts with the appointment at {from_minutes(calendar.starts[clash]).isoformat(timespec='minutes')}"
+                )
+            
+            calendar.book(start, end, booking.patient_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    save_calendars()
+    
+    return {
+        "message": f"Appointment booked with {doctors_data[booking.doctor_id]['name']}",
+        "appointment": {
+            "doctor_id": booking.doctor_id,
+            "patient_id": booking.patient_id,
+            "start": from_minutes(start).isoformat(timespec="minutes"),
+            "end": from_minutes(end).isoformat(timespec="minutes"),
+            "status": "Confirmed"
+        }
+    }
+
+@app.delete("/api/appointments/calendar/{doctor_id}/{start}", tags=["Appointments"])
+def cancel_calendar_appointment(doctor_id: str, start: datetime):
+    """Cancel the calendar appointment starting at the given date and time"""
+    try:
+        with doctor_store.lock(doctor_id):
+            calendar = calendars.get(doctor_id)
+            if calendar is None:
+                raise HTTPException(status_code=404, detail="Doctor has no calendar")
+            patient_id = calendar.cancel(to_minutes(start))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor has no calendar")
+    if patient_id is None:
+        raise HTTPException(status_code=404, detail="No appointment starts at that time")
+    
+    save_calendars()
+    return {"message": "Appointment cancelled", "patient_id": patient_id}
+
+@app.get("/api/appointments/next-available", tags=["Appointments"])
+def get_next_available(speciality: str, after: int = Query(0, ge=0, le=23)):
+    """Find the earliest free slot at or after an hour across all doctors of a speciality"""
+    with index_lock:
+        found = slot_index.next_available(speciality, after)
+    
+    if found is None:
+        return {"message": f"No free {speciality} slot at or after {after}:00", "slot": None}
+    
+    hour, doctor_id, doctor_name = found
+    return {
+        "message": f"Next available {speciality} slot: {doctor_name} at {hour}:00",
+        "slot": {
+            "doctor_id": doctor_id,
+            "doctor_name": doctor_name,
+            "time": hour,
+            "display": f"{hour}:00"
+        }
+    }
+
+@app.post("/api/appointments/waitlist", status_code=201, tags=["Appointments"])
+def join_waitlist(request: WaitlistRequest):
+    """Wait for the next released slot of a doctor or of any doctor in a speciality"""
+    if (request.doctor_id is None) == (request.speciality is None):
+        raise HTTPException(status_code=400, detail="Give either doctor_id or speciality")
+    
+    if request.patient_id not in load_patients():
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    if request.doctor_id is not None and request.doctor_id not in load_doctors():
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    speciality = normalize_speciality(request.speciality) if request.speciality is not None else None
+    with waitlist_lock:
+        entry = waitlist.add(request.patient_id, request.urgency, request.doctor_id, speciality)
+        position = [e['id'] for e in waitlist.waiting(Waitlist.key(entry))].index(entry['id']) + 1
+    save_waitlist()
+    
+    return {
+        "message": "Added to waitlist",
+        "entry": entry,
+        "position": position
+    }
+
+@app.get("/api/appointments/waitlist", tags=["Appointments"])
+def get_waitlist(doctor_id: Optional[str] = None, speciality: Optional[str] = None):
+    """Entries waiting for a doctor or a speciality, in the order they will be served"""
+    if (doctor_id is None) == (speciality is None):
+        raise HTTPException(status_code=400, detail="Give either doctor_id or speciality")
+    
+    key = ("doctor", doctor_id) if doctor_id is not None else ("speciality", normalize_speciality(speciality))
+    with waitlist_lock:
+        entries = waitlist.waiting(key)
+    return {"waiting": len(entries), "entries": entries}
+
+@app.delete("/api/appointments/waitlist/{entry_id}", tags=["Appointments"])
+def leave_waitlist(entry_id: int):
+    """Remove an entry from the waitlist"""
+    with waitlist_lock:
+        entry = waitlist.remove(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    save_waitlist()
+    return {"message": "Removed from waitlist", "entry": entry}
+
 @app.post("/api/appointments/book", response_model=AppointmentResponse, tags=["Appointments"])
 def book_appointment(appointment: AppointmentBook):
     """Book an appointment for a patient with a doctor"""
@@ -790,15 +1774,26 @@ def book_appointment(appointment: AppointmentBook):
             detail=f"Time slot {appointment.time}:00 not available for this doctor"
         )
     
-    if doctor['slots'][time_str] is not None:
+    # Book the slot only if it is still free (and the schedule unchanged, if a version was given)
+    try:
+        version = doctor_store.set_slot(appointment.doctor_id, time_str, None, appointment.patient_id,
+                                        appointment.expected_version,
+                                        on_success=lambda record: slot_changed(appointment.doctor_id, appointment.time,
+                                                                               None, appointment.patient_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    except SlotConflict:
         raise HTTPException(
-            status_code=400,
+            status_code=409,
             detail=f"Slot {appointment.time}:00 already booked"
         )
-    
-    # Book the slot
-    doctor['slots'][time_str] = appointment.patient_id
-    save_doctors(doctors_data)
+    except StaleVersion as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Schedule of {doctor['name']} changed (now version {e.version}), reload and retry"
+        )
+    save_doctors()
+    record_event("booked", appointment.doctor_id, appointment.time)
     
     return AppointmentResponse(
         message=f"Appointment booked successfully with {doctor['name']} at {appointment.time}:00",
@@ -808,10 +1803,127 @@ def book_appointment(appointment: AppointmentBook):
             "patient_id": appointment.patient_id,
             "patient_name": patients[appointment.patient_id]['name'],
             "time": f"{appointment.time}:00",
-            "status": "Confirmed"
+            "status": "Confirmed",
+            "version": version
         }
     )
 
+@app.get("/api/appointments/patients/{patient_id}/appointments", tags=["Appointments"])
+def get_patient_appointments(patient_id: str):
+    """A patient's booked slots, by time"""
+    patients = load_patients()
+    
+    if patient_id not in patients:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    with index_lock:
+        bookings = sorted(patient_bookings.get(patient_id, ()), key=lambda b: (b[1], doctor_sort_key(b[0])))
+    
+    doctors_data = load_doctors()
+    appointments = []
+    for doctor_id, hour in bookings:
+        doctor = doctors_data.get(doctor_id)
+        if doctor is not None:
+            appointments.append({
+                "doctor_id": doctor_id,
+                "doctor_name": doctor['name'],
+                "speciality": doctor.get('speciality', 'General'),
+                "time": hour,
+                "display": f"{hour}:00"
+            })
+    
+    return {
+        "patient_id": patient_id,
+        "name": patients[patient_id]['name'],
+        "appointments": appointments
+    }
+
+def has_booking(patient_id, doctor_id, hour):
+    with index_lock:
+        return (doctor_id, hour) in patient_bookings.get(patient_id, ())
+
+@app.post("/api/appointments/cancel", tags=["Appointments"])
+def cancel_appointment(cancel: AppointmentCancel):
+    """Cancel a patient's appointment; the slot goes to the waitlist first"""
+    if not has_booking(cancel.patient_id, cancel.doctor_id, cancel.time):
+        raise HTTPException(status_code=404, detail=f"Patient has no appointment with this doctor at {cancel.time}:00")
+    
+    try:
+        filled_by = release_slot(cancel.doctor_id, cancel.time, cancel.patient_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    except SlotConflict:
+        raise HTTPException(status_code=409, detail="Appointment at this time slot was changed concurrently")
+    record_event("cancelled", cancel.doctor_id, cancel.time)
+    
+    return {
+        "message": f"Appointment at {cancel.time}:00 cancelled",
+        "waitlist_booking": filled_by
+    }
+
+@app.post("/api/appointments/reschedule", tags=["Appointments"])
+def reschedule_appointment(change: AppointmentReschedule):
+    """Move a patient's appointment to another slot (of the same or another doctor)"""
+    new_doctor_id = change.new_doctor_id or change.doctor_id
+    if (new_doctor_id, change.new_time) == (change.doctor_id, change.time):
+        raise HTTPException(status_code=400, detail="New slot is the current slot")
+    
+    if not has_booking(change.patient_id, change.doctor_id, change.time):
+        raise HTTPException(status_code=404, detail=f"Patient has no appointment with this doctor at {change.time}:00")
+    
+    doctors_data = load_doctors()
+    if new_doctor_id not in doctors_data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    new_doctor = doctors_data[new_doctor_id]
+    if str(change.new_time) not in new_doctor['slots']:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time slot {change.new_time}:00 not available for this doctor"
+        )
+    
+    # Take the new slot first, so the patient is never left without an appointment
+    try:
+        doctor_store.set_slot(new_doctor_id, str(change.new_time), None, change.patient_id,
+                              on_success=lambda record: slot_changed(new_doctor_id, change.new_time,
+                                                                     None, change.patient_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    except SlotConflict:
+        raise HTTPException(status_code=409, detail=f"Slot {change.new_time}:00 already booked")
+    save_doctors()
+    
+    try:
+        filled_by = release_slot(change.doctor_id, change.time, change.patient_id)
+    except KeyError:
+        filled_by = None  # the old doctor was deleted meanwhile, so there is nothing to release
+    except SlotConflict:
+        # The old appointment changed meanwhile (visit, no-show...): free the new slot again,
+        # as it was before, without offering it to the waitlist
+        try:
+            doctor_store.set_slot(new_doctor_id, str(change.new_time), change.patient_id, None,
+                                  on_success=lambda record: slot_changed(new_doctor_id, change.new_time,
+                                                                         change.patient_id, None))
+        except (KeyError, SlotConflict):
+            pass  # the new slot was deleted or changed meanwhile too, so there is nothing to undo
+        save_doctors()
+        raise HTTPException(status_code=409, detail="Appointment was changed concurrently, nothing was rescheduled")
+    # Counted only once the move went through, so a rolled-back move leaves no event
+    record_event("booked", new_doctor_id, change.new_time)
+    record_event("cancelled", change.doctor_id, change.time)
+    
+    return {
+        "message": f"Appointment moved to {new_doctor['name']} at {change.new_time}:00",
+        "appointment": {
+            "doctor_id": new_doctor_id,
+            "doctor_name": new_doctor['name'],
+            "patient_id": change.patient_id,
+            "time": f"{change.new_time}:00",
+            "status": "Confirmed"
+        },
+        "waitlist_booking": filled_by
+    }
+
 @app.post("/api/appointments/visit", tags=["Appointments"])
 def record_doctor_visit(visit: DoctorVisit):
     """Record a doctor visit with prescribed medicine"""
@@ -838,27 +1950,97 @@ def record_doctor_visit(visit: DoctorVisit):
     if patient_id not in patients:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    # Release the slot (to the waitlist if anyone is waiting), unless another request already changed it
+    try:
+        filled_by = release_slot(visit.doctor_id, visit.time, patient_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    except SlotConflict:
+        raise HTTPException(status_code=409, detail="Appointment at this time slot was changed concurrently")
+    record_event("completed", visit.doctor_id, visit.time)
+    
     # Add to patient history
-    patients[patient_id]['history'].append({
+    visit_log.append(patient_id, {
         'Doctor': doctor['name'],
         'Time': visit.time,
         'Medicine': visit.medicine,
         'Date': datetime.now().strftime("%Y-%m-%d")
     })
     
-    save_patients(patients)
-    
-    # Clear the slot
-    doctor['slots'][time_str] = None
-    save_doctors(doctors_data)
-    
     return {
         "message": "Doctor visit recorded successfully",
         "patient": patients[patient_id]['name'],
         "doctor": doctor['name'],
-        "medicine": visit.medicine
+        "medicine": visit.medicine,
+        "waitlist_booking": filled_by
     }
 
+@app.post("/api/appointments/no-show", tags=["Appointments"])
+def record_no_show(no_show: NoShow):
+    """Record that the patient booked at a slot did not come, releasing the slot"""
+    doctors_data = load_doctors()
+    
+    if no_show.doctor_id not in doctors_data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    doctor = doctors_data[no_show.doctor_id]
+    time_str = str(no_show.time)
+    
+    if time_str not in doctor['slots']:
+        raise HTTPException(status_code=400, detail="Invalid time slot")
+    
+    patient_id = doctor['slots'][time_str]
+    
+    if patient_id is None:
+        raise HTTPException(status_code=400, detail="No appointment at this time slot")
+    
+    try:
+        filled_by = release_slot(no_show.doctor_id, no_show.time, patient_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    except SlotConflict:
+        raise HTTPException(status_code=409, detail="Appointment at this time slot was changed concurrently")
+    record_event("no_show", no_show.doctor_id, no_show.time)
+    
+    return {
+        "message": "No-show recorded",
+        "patient_id": patient_id,
+        "doctor": doctor['name'],
+        "waitlist_booking": filled_by
+    }
+
+@app.get("/api/appointments/analytics/utilization", tags=["Appointments Analytics"])
+def get_utilization(
+    doctor_id: Optional[str] = None,
+    speciality: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1, le=366)
+):
+    """Booked/free slots and booking, completion, no-show and cancellation counts by hour and day"""
+    if doctor_id is not None and speciality is not None:
+        raise HTTPException(status_code=400, detail="Give doctor_id or speciality, not both")
+    
+    with index_lock:
+        if doctor_id is not None:
+            scope = ("doctor", doctor_id)
+            if scope not in utilization.gauges and scope not in utilization.counters:
+                raise HTTPException(status_code=404, detail="Doctor not found")
+            result = {"doctor_id": doctor_id, **utilization.summary(scope, days)}
+        elif speciality is not None:
+            scope = ("speciality", normalize_speciality(speciality))
+            result = {"speciality": scope[1], **utilization.summary(scope, days)}
+        else:
+            result = {"scope": "hospital", **utilization.summary(HOSPITAL, days)}
+            result["specialities"] = {}
+            for name in utilization.specialities():
+                gauge = utilization.gauges[("speciality", name)]
+                result["specialities"][name] = {
+                    "slots": gauge["slots"],
+                    "booked": gauge["booked"],
+                    "utilization": round(gauge["booked"] / gauge["slots"], 4) if gauge["slots"] else 0.0
+                }
+    
+    return result
+
 @app.delete("/api/appointments/patients/{patient_id}", tags=["Appointments"])
 def delete_patient(patient_id: str):
     """Delete a patient from registry"""
@@ -868,11 +2050,52 @@ def delete_patient(patient_id: str):
         raise HTTPException(status_code=404, detail="Patient not found")
     
     patient_name = patients[patient_id]['name']
-    del patients[patient_id]
-    save_patients(patients)
+    
+    # Remove the patient first so no new booking can name them, take them off
+    # waitlists, then give up their booked slots (to the waitlist first) and
+    # their calendar appointments
+    patient_store.remove(patient_id)
+    save_patients()
+    with patient_index_lock:
+        patient_index.remove(patient_id)
+    with waitlist_lock:
+        dropped = waitlist.remove_patient(patient_id)
+    if dropped:
+        save_waitlist()
+    release_patient_bookings(patient_id)
+    visit_log.delete(patient_id)
     
     return {"message": f"Patient {patient_name} deleted successfully"}
 
+def release_patient_bookings(patient_id):
+    """Release every hourly slot and calendar appointment held by a (deleted) patient"""
+    seen = set()
+    while True:
+        # A booking that raced with the delete shows up in the index on the next pass
+        with index_lock:
+            bookings = set(patient_bookings.get(patient_id, ())) - seen
+        if not bookings:
+            break
+        seen |= bookings
+        for doctor_id, hour in bookings:
+            try:
+                release_slot(doctor_id, hour, patient_id)
+                record_event("cancelled", doctor_id, hour)
+            except (KeyError, SlotConflict):
+                pass  # doctor deleted or slot changed meanwhile: nothing left to release
+    
+    with calendars_lock:
+        doctor_calendars = list(calendars.items())
+    cancelled = 0
+    for doctor_id, calendar in doctor_calendars:
+        try:
+            with doctor_store.lock(doctor_id):
+                cancelled += calendar.cancel_patient(patient_id)
+        except KeyError:
+            continue
+    if cancelled:
+        save_calendars()
+
 @app.delete("/api/appointments/doctors/{doctor_id}", tags=["Appointments"])
 def delete_doctor(doctor_id: str):
     """Delete a doctor from registry"""
@@ -882,196 +2105,392 @@ def delete_doctor(doctor_id: str):
         raise HTTPException(status_code=404, detail="Doctor not found")
     
     doctor_name = doctors_data[doctor_id]['name']
-    del doctors_data[doctor_id]
-    save_doctors(doctors_data)
+    ddata = doctor_store.remove(doctor_id)
+    save_doctors()
+    with index_lock:
+        unindex_doctor(doctor_id, ddata)
+    with calendars_lock:
+        removed = calendars.pop(doctor_id, None)
+    if removed is not None:
+        save_calendars()
+    with waitlist_lock:
+        waitlist.remove_doctor(doctor_id)
+    save_waitlist()
     
     return {"message": f"Doctor {doctor_name} deleted successfully"}
 
 # ==================== PHARMACY ENDPOINTS ====================
 
 @app.get("/api/pharmacy/medicines", tags=["Pharmacy"])
-def get_all_medicines():
-    """Get all medicines in inventory"""
-    medicines = load_medicines()
+def get_all_medicines(
+    response: Response,
+    prefix: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    summary: bool = False
+):
+    """Get medicines in name order, optionally by name prefix, paginated, or as a summary without serials"""
+    today = date.today().isoformat()
     result = []
-    for name, data in medicines.items():
-        result.append({
-            "name": name,
-            "stock": data.get("stock", 0),
-            "serials": data.get("serials", {})
-        })
+    with medicine_store.registry_lock:
+        try:
+            names, next_cursor = medicine_catalog.names.page(prefix.strip(), limit, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+        for name in names:
+            data = medicine_store.get(name)
+            if summary:
+                min_price, max_price = medicine_catalog.price_range(name)
+                result.append({
+                    "name": name,
+                    "stock": data.get("stock", 0),
+                    "nearest_expiry": fefo_index.nearest(name, data["serials"], today),
+                    "min_price": min_price,
+                    "max_price": max_price
+                })
+            else:
+                result.append({
+                    "name": name,
+                    "stock": data.get("stock", 0),
+                    "by_location": stock_index.locations(name),
+                    "serials": dict(data.get("serials", {}))
+                })
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return result
 
 @app.post("/api/pharmacy/medicines", status_code=201, tags=["Pharmacy"])
 def add_medicine_serial(medicine: MedicineSerial):
     """Add a medicine serial (increases stock by 1)"""
-    medicines = load_medicines()
-    
-    if medicine.name not in medicines:
-        medicines[medicine.name] = {"stock": 0, "serials": {}}
-    
-    medicines[medicine.name]["serials"][medicine.serial] = {
-        "expiry": medicine.expiry,
-        "price": medicine.price
-    }
-    medicines[medicine.name]["stock"] = len(medicines[medicine.name]["serials"])
+    try:
+        expiry = normalize_expiry(medicine.expiry)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Expiry must be a date in YYYY-MM-DD format")
+    location = medicine.location.strip().upper()
+    if location not in PHARMACY_LOCATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown pharmacy location: {location}")
+    
+    with medicine_store.registry_lock:
+        if medicine.name not in medicine_store:
+            medicine_store.put(medicine.name, {"stock": 0, "serials": {}})
+            medicine_search.add(medicine.name)
+        record = medicine_store.get(medicine.name)
+        replaced = record["serials"].get(medicine.serial)
+        if replaced is not None:
+            stock_index.remove(medicine.name, serial_location(replaced), replaced["expiry"])
+            medicine_catalog.remove_serial(medicine.name, replaced["price"])
+            stock_alerts.serial_removed(medicine.name, medicine.serial, replaced["expiry"])
+        record["serials"][medicine.serial] = {
+            "expiry": expiry,
+            "price": medicine.price,
+            "location": location
+        }
+        record["stock"] = len(record["serials"])
+        stock = record["stock"]
+        stock_index.add(medicine.name, location, expiry)
+        fefo_index.add(medicine.name, record, medicine.serial)
+        medicine_catalog.add_serial(medicine.name, medicine.price)
+        stock_alerts.serial_added(medicine.name, medicine.serial, expiry)
+        stock_alerts.stock_changed(medicine.name, stock)
     
-    save_medicines(medicines)
+    expiry_sweeper.add(medicine.name, medicine.serial, expiry)
+    save_medicines()
     
     return {
-        "message": f"Added {medicine.name} (Serial {medicine.serial}, Expiry {medicine.expiry}, Price {medicine.price})",
+        "message": f"Added {medicine.name} (Serial {medicine.serial}, Expiry {expiry}, Price {medicine.price})",
         "medicine": {
             "name": medicine.name,
             "serial": medicine.serial,
-            "expiry": medicine.expiry,
+            "expiry": expiry,
             "price": medicine.price,
-            "current_stock": medicines[medicine.name]["stock"]
+            "location": location,
+            "current_stock": stock
         }
     }
 
 @app.delete("/api/pharmacy/medicines/{medicine_name}/{serial}", tags=["Pharmacy"])
 def remove_medicine_serial(medicine_name: str, serial: str):
     """Remove a medicine serial (decreases stock by 1)"""
-    medicines = load_medicines()
-    
-    if medicine_name not in medicines:
-        raise HTTPException(status_code=404, detail="Medicine not found")
-    
-    if serial not in medicines[medicine_name]["serials"]:
-        raise HTTPException(status_code=404, detail="Serial not found")
-    
-    del medicines[medicine_name]["serials"][serial]
-    medicines[medicine_name]["stock"] = len(medicines[medicine_name]["serials"])
+    with medicine_store.registry_lock:
+        record = medicine_store.get(medicine_name)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        
+        if serial not in record["serials"]:
+            raise HTTPException(status_code=404, detail="Serial not found")
+        
+        details = record["serials"].pop(serial)
+        stock_index.remove(medicine_name, serial_location(details), details["expiry"])
+        medicine_catalog.remove_serial(medicine_name, details["price"])
+        record["stock"] = len(record["serials"])
+        stock = record["stock"]
+        stock_alerts.serial_removed(medicine_name, serial, details["expiry"])
+        stock_alerts.stock_changed(medicine_name, stock)
     
-    save_medicines(medicines)
+    save_medicines()
     
     return {
         "message": f"Removed serial {serial} of {medicine_name}",
-        "current_stock": medicines[medicine_name]["stock"]
+        "current_stock": stock
     }
 
 @app.get("/api/pharmacy/medicines/{medicine_name}", tags=["Pharmacy"])
 def search_medicine(medicine_name: str):
     """Search for a medicine and get all its serials"""
-    medicines = load_medicines()
+    with medicine_store.registry_lock:
+        record = medicine_store.get(medicine_name)
+        if record is None:
+            matches = medicine_search.search(medicine_name, 3)
+            if matches:
+                suggestions = ", ".join(medicine for medicine, _, _ in matches)
+                raise HTTPException(status_code=404, detail=f"Medicine not found. Did you mean: {suggestions}?")
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        
+        return {
+            "name": medicine_name,
+            "stock": record["stock"],
+            "by_location": stock_index.locations(medicine_name),
+            "synonyms": record.get("synonyms", []),
+            "serials": dict(record["serials"])
+        }
+
+@app.put("/api/pharmacy/medicines/{medicine_name}/synonyms", tags=["Pharmacy"])
+def set_medicine_synonyms(medicine_name: str, body: MedicineSynonyms):
+    """Replace the other names (brands, abbreviations) a medicine can be searched by"""
+    synonyms = sorted({synonym.strip() for synonym in body.synonyms if synonym.strip()})
+    with medicine_store.registry_lock:
+        record = medicine_store.get(medicine_name)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        record["synonyms"] = synonyms
+        medicine_search.add(medicine_name, synonyms)
+    
+    save_medicines()
+    return {"medicine": medicine_name, "synonyms": synonyms}
+
+@app.get("/api/pharmacy/search", tags=["Pharmacy"])
+def search_medicines(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete medicines by name or synonym prefix, with typo-tolerant matches, best first"""
+    with medicine_store.registry_lock:
+        return [
+            {
+                "medicine": medicine,
+                "matched": term,
+                "distance": distance,
+                "stock": medicine_store.get(medicine)["stock"]
+            }
+            for medicine, term, distance in medicine_search.search(q, limit)
+        ]
+
+@app.get("/api/pharmacy/locations", tags=["Pharmacy"])
+def get_pharmacy_locations():
+    """Pharmacy locations with the medicines and serials stocked at each"""
+    with medicine_store.registry_lock:
+        totals = stock_index.by_location()
+    return [{
+        "id": loc,
+        "name": location_data[loc]["name"],
+        "medicines": totals.get(loc, {}).get("medicines", 0),
+        "stock": totals.get(loc, {}).get("stock", 0)
+    } for loc in PHARMACY_LOCATIONS]
+
+@app.get("/api/pharmacy/nearest-stock", tags=["Pharmacy"])
+def find_nearest_stock(medicine: str, location: str):
+    """Nearest pharmacy with non-expired stock of a medicine, by walking distance from a location"""
+    start = location.strip().upper()
+    if start not in hospital_graph:
+        raise HTTPException(status_code=400, detail=f"Invalid location: {start}")
+    today = date.today().isoformat()
+    
+    with medicine_store.registry_lock:
+        if medicine not in medicine_store:
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        
+        # An expired serial the sweeper has not retired yet does not count
+        distance, path = nearest_stocked(hospital_graph, start,
+                                         lambda node: stock_index.available(medicine, node, today) > 0)
+        available = stock_index.available(medicine, path[-1], today) if path else 0
     
-    if medicine_name not in medicines:
-        raise HTTPException(status_code=404, detail="Medicine not found")
+    if distance is None:
+        raise HTTPException(status_code=404, detail=f"No non-expired {medicine} in any pharmacy")
     
     return {
-        "name": medicine_name,
-        "stock": medicines[medicine_name]["stock"],
-        "serials": medicines[medicine_name]["serials"]
+        "medicine": medicine,
+        "from": start,
+        "location": path[-1],
+        "location_name": location_data[path[-1]]["name"],
+        "available": available,
+        "distance": round(distance, 2),
+        "path": path,
+        "pathNames": [location_data[loc]["name"] for loc in path],
+        "estimatedTime": max(1, round(distance / 80)) if distance else 0  # 80 meters/minute
     }
 
 @app.post("/api/pharmacy/billing", tags=["Pharmacy"])
 def bill_patient_pharmacy(billing: BillingRequest):
-    """Bill a patient for medicine (FIFO - earliest expiry first, skips expired)"""
-    medicines = load_medicines()
-    patients = load_patient_billing()
-    
-    if billing.medicine_name not in medicines:
-        raise HTTPException(status_code=404, detail=f"{billing.medicine_name} not found")
-    
-    if medicines[billing.medicine_name]["stock"] == 0:
-        raise HTTPException(status_code=400, detail=f"{billing.medicine_name} out of stock")
-    
-    # Find earliest non-expired serial (FIFO with expiry check)
-    serials = medicines[billing.medicine_name]["serials"]
-    valid_serial = None
-    expired_serials = []
-    
-    # Filter expired medicines and find earliest valid one
-    for serial_num, details in list(serials.items()):
-        expiry_date = datetime.strptime(details["expiry"], "%Y-%m-%d")
-        if expiry_date < datetime.now():
-            # Mark expired for removal
-            expired_serials.append(serial_num)
-        else:
-            # Find earliest non-expired
-            if (valid_serial is None or 
-                expiry_date < datetime.strptime(serials[valid_serial]["expiry"], "%Y-%m-%d")):
-                valid_serial = serial_num
-    
-    # Remove expired serials
-    for expired in expired_serials:
-        del serials[expired]
-    
-    # Update stock after removing expired
-    medicines[billing.medicine_name]["stock"] = len(serials)
-    
-    if valid_serial is None:
-        save_medicines(medicines)
-        raise HTTPException(status_code=400, detail=f"No non-expired {billing.medicine_name} available")
-    
-    # Get details and remove from inventory
-    details = serials[valid_serial]
-    price = details["price"]
-    del medicines[billing.medicine_name]["serials"][valid_serial]
-    medicines[billing.medicine_name]["stock"] = len(medicines[billing.medicine_name]["serials"])
-    save_medicines(medicines)
-    
-    # Update patient billing
-    if billing.patient_name not in patients:
-        patients[billing.patient_name] = {
-            "purchases": [],
-            "frequency": {},
-            "total_price": 0
-        }
-    
-    # Ensure total_price exists
-    if "total_price" not in patients[billing.patient_name]:
-        patients[billing.patient_name]["total_price"] = 0
-    
-    patients[billing.patient_name]["purchases"].append({
+    """Bill a patient for `quantity` units of a medicine (FIFO - earliest expiry first, skips expired)"""
+    today = date.today().isoformat()
+    location = billing.location.strip().upper() if billing.location else None
+    if location is not None and location not in PHARMACY_LOCATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown pharmacy location: {location}")
+    if billing.patient_id is None and not (billing.patient_name or "").strip():
+        raise HTTPException(status_code=400, detail="Give patient_id or patient_name")
+    try:
+        account_id, patient_name, patient_id = find_account(billing.patient_name, billing.patient_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    except ValueError:
+        raise HTTPException(status_code=409,
+                            detail=f"Several registered patients are named {billing.patient_name.strip()}; give patient_id")
+    
+    with medicine_store.registry_lock:
+        record = medicine_store.get(billing.medicine_name)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"{billing.medicine_name} not found")
+        
+        if record["stock"] == 0:
+            raise HTTPException(status_code=400, detail=f"{billing.medicine_name} out of stock")
+        
+        # Earliest serials that are still good today; ISO dates compare as strings.
+        # Expired serials the sweeper has not reached yet are skipped, not removed.
+        serials = record["serials"]
+        taken = fefo_index.take(billing.medicine_name, serials, billing.quantity, today, location)
+        if len(taken) < billing.quantity:
+            where = f" at {location}" if location else ""
+            if not taken:
+                raise HTTPException(status_code=400, detail=f"No non-expired {billing.medicine_name} available{where}")
+            raise HTTPException(status_code=400,
+                                detail=f"Only {len(taken)} non-expired {billing.medicine_name} available{where}, "
+                                       f"{billing.quantity} requested")
+        
+        # Remove from inventory
+        sold = []
+        for serial in taken:
+            details = serials.pop(serial)
+            stock_index.remove(billing.medicine_name, serial_location(details), details["expiry"])
+            medicine_catalog.remove_serial(billing.medicine_name, details["price"])
+            stock_alerts.serial_removed(billing.medicine_name, serial, details["expiry"])
+            sold.append({
+                "serial": serial,
+                "expiry": details["expiry"],
+                "price": details["price"],
+                "location": serial_location(details)
+            })
+        record["stock"] = len(serials)
+        remaining_stock = record["stock"]
+        stock_alerts.stock_changed(billing.medicine_name, remaining_stock)
+    
+    save_medicines()
+    
+    # Update the patient's billing account
+    sold_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    price = sum(item["price"] for item in sold)
+    account_id = open_account(account_id, patient_name, patient_id)
+    account = record_purchases(account_id, [{
         "medicine": billing.medicine_name,
-        "serial": valid_serial,
-        "price": price,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
-    
-    patients[billing.patient_name]["frequency"][billing.medicine_name] = (
-        patients[billing.patient_name]["frequency"].get(billing.medicine_name, 0) + 1
-    )
-    
-    patients[billing.patient_name]["total_price"] += price
-    
-    save_patient_billing(patients)
+        "serial": item["serial"],
+        "price": item["price"],
+        "date": sold_at
+    } for item in sold])
+    billing_store.save()
+    
+    demand_forecaster.record(billing.medicine_name, units=len(sold))
+    timestamp = to_timestamp(sold_at)
+    purchase_ledger.append_many({"timestamp": timestamp, "medicine": billing.medicine_name,
+                                 "patient": account_id, "serial": item["serial"],
+                                 "price": item["price"]} for item in sold)
+    sales_rollup.add(billing.medicine_name, day_number(sold_at), len(sold), price)
     
     return {
-        "message": f"Billed {billing.patient_name} for {billing.medicine_name}",
-        "patient": billing.patient_name,
+        "message": f"Billed {patient_name} for {len(sold)} x {billing.medicine_name}",
+        "patient": patient_name,
+        "patient_id": patient_id,
+        "account_id": account_id,
         "medicine": billing.medicine_name,
-        "serial_sold": valid_serial,
-        "price_paid": price,
-        "total_price": patients[billing.patient_name]["total_price"],
-        "remaining_stock": medicines[billing.medicine_name]["stock"],
-        "expired_removed": len(expired_serials)
+        "quantity": len(sold),
+        "serials_sold": sold,
+        "price_paid": round(price, 2),
+        "total_price": account["total_price"],
+        "remaining_stock": remaining_stock
     }
 
 @app.get("/api/pharmacy/patients", tags=["Pharmacy"])
-def get_billing_patients():
-    """Get all patients with billing history"""
-    patients = load_patient_billing()
+def get_billing_patients(
+    response: Response,
+    prefix: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    summary: bool = False
+):
+    """Get billing accounts in name order, optionally by name prefix, paginated, or as totals only"""
+    try:
+        with account_lock:
+            account_ids, next_cursor = account_names.page(prefix.strip(), limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+    
     result = []
-    for name, data in patients.items():
-        result.append({
-            "name": name,
-            "total_purchases": len(data.get("purchases", [])),
-            "total_price": data.get("total_price", 0),
-            "frequency": data.get("frequency", {}),
-            "purchases": data.get("purchases", [])
-        })
+    for account_id in account_ids:
+        account = billing_store.get(account_id)
+        if account is None:
+            continue
+        entry = account_summary(account_id, account)
+        if not summary:
+            entry["frequency"] = dict(account["frequency"])
+            start = max(0, account["total_purchases"] - RECENT_PURCHASES)
+            entry["recent_purchases"] = purchase_log.read(account_id, start)
+        result.append(entry)
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return {"patients": result}
 
+@app.get("/api/pharmacy/accounts/{account_id}", tags=["Pharmacy"])
+def get_billing_account(account_id: str):
+    """Get a billing account's running totals and purchase frequency"""
+    account = billing_store.get(account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail="Billing account not found")
+    return {**account_summary(account_id, account), "frequency": dict(account["frequency"])}
+
+@app.get("/api/pharmacy/accounts/{account_id}/purchases", tags=["Pharmacy"])
+def get_account_purchases(
+    account_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Get a billing account's purchases, oldest first, optionally paginated"""
+    account = billing_store.get(account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail="Billing account not found")
+    
+    start = 0
+    if cursor:
+        if not cursor.isdigit():
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
+        start = int(cursor)
+    
+    purchases = purchase_log.read(account_id, start, limit)
+    total = purchase_log.count(account_id)
+    if start + len(purchases) < total and limit is not None:
+        response.headers["X-Next-Cursor"] = str(start + len(purchases))
+    
+    return {
+        "account_id": account_id,
+        "name": account["name"],
+        "total_purchases": total,
+        "purchases": purchases
+    }
+
 @app.get("/api/pharmacy/analytics/most-demanded", tags=["Pharmacy Analytics"])
 def get_most_demanded_medicine():
     """Get most demanded medicine using max heap"""
-    patients = load_patient_billing()
     freq_map = {}
     
-    for pdata in patients.values():
-        for med, count in pdata.get("frequency", {}).items():
+    for _, account in billing_store.items():
+        for med, count in account["frequency"].items():
             freq_map[med] = freq_map.get(med, 0) + count
     
     if not freq_map:
@@ -1095,14 +2514,15 @@ def get_most_demanded_medicine():
 @app.get("/api/pharmacy/analytics/lowest-stock", tags=["Pharmacy Analytics"])
 def get_lowest_stock_medicine():
     """Get medicine with lowest stock using min heap"""
-    medicines = load_medicines()
+    with medicine_store.registry_lock:
+        medicines = list(medicine_store.data.items())
     
     if not medicines:
         return {"message": "No medicines in inventory", "medicine": None}
     
     # Build min heap
     heap = []
-    for name, data in medicines.items():
+    for name, data in medicines:
         stock = data.get("stock", 0)
         heapq.heappush(heap, (stock, name))
     
@@ -1118,44 +2538,250 @@ def get_lowest_stock_medicine():
 
 @app.get("/api/pharmacy/analytics/nearest-expiry", tags=["Pharmacy Analytics"])
 def get_nearest_expiry():
-    """Get medicine with nearest expiry using min heap"""
-    medicines = load_medicines()
-    min_heap = []
-    
-    for medicine_name, data in medicines.items():
-        for serial, details in data.get("serials", {}).items():
-            try:
-                expiry_date = datetime.strptime(details["expiry"], "%Y-%m-%d")
-                heapq.heappush(min_heap, (expiry_date, medicine_name, serial, details["price"]))
-            except:
-                continue
-    
-    if not min_heap:
+    """Get medicine with nearest expiry from the sweeper's global min heap"""
+    with medicine_store.registry_lock:
+        head = expiry_sweeper.next_expiry()
+        if head is not None:
+            expiry, medicine_name, serial = head
+            price = medicine_store.get(medicine_name)["serials"][serial]["price"]
+    
+    if head is None:
         return {"message": "No medicines available", "medicine": None}
     
-    expiry_date, medicine_name, serial, price = heapq.heappop(min_heap)
-    
     return {
         "medicine": {
             "name": medicine_name,
             "serial": serial,
-            "expiry": expiry_date.strftime("%Y-%m-%d"),
+            "expiry": expiry,
             "price": price,
-            "days_until_expiry": (expiry_date - datetime.now()).days
+            "days_until_expiry": (date.fromisoformat(expiry) - date.today()).days
         },
-        "message": f"Nearest Expiry: {medicine_name} (Serial {serial}), Expires on {expiry_date.date()}"
+        "message": f"Nearest Expiry: {medicine_name} (Serial {serial}), Expires on {expiry}"
+    }
+
+@app.get("/api/pharmacy/analytics/forecast", tags=["Pharmacy Analytics"])
+def get_demand_forecast(
+    method: str = Query("ewma", description="ewma or moving_average"),
+    lead_time_days: int = Query(7, ge=0, le=365),
+    cover_days: int = Query(30, ge=1, le=365),
+    service_level: float = Query(0.95, ge=0.5, lt=1),
+    medicine: Optional[str] = None,
+    reorder_only: bool = False
+):
+    """Daily demand forecast, usable stock and reorder point/quantity per medicine"""
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(METHODS)}")
+    
+    with medicine_store.registry_lock:
+        if medicine is not None and medicine not in medicine_store:
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        inventory = {name: [details["expiry"] for details in data["serials"].values()]
+                     for name, data in medicine_store.data.items()
+                     if medicine is None or name == medicine}
+    
+    plan = demand_forecaster.plan(inventory, method, lead_time_days, cover_days, service_level)
+    if medicine is not None:
+        plan = [p for p in plan if p["medicine"] == medicine]
+    if reorder_only:
+        plan = [p for p in plan if p["reorder"]]
+    
+    return {
+        "method": method,
+        "lead_time_days": lead_time_days,
+        "cover_days": cover_days,
+        "service_level": service_level,
+        "medicines": plan
+    }
+
+@app.get("/api/pharmacy/reports/sales", tags=["Pharmacy Analytics"])
+def get_sales_report(
+    date_from: Optional[str] = Query(None, alias="from", description="YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"),
+    date_to: Optional[str] = Query(None, alias="to", description="Inclusive; a bare date covers the whole day"),
+    group_by: str = Query("day", description="day, month, medicine or patient"),
+    medicine: Optional[str] = None
+):
+    """Units sold and revenue over a time range, grouped, from the columnar purchase ledger"""
+    if group_by not in GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUPS)}")
+    try:
+        start = to_timestamp(date_from) if date_from else None
+        end = to_timestamp(date_to) + (86400 if len(date_to.strip()) == 10 else 1) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    
+    report = purchase_ledger.sales(start, end, group_by, medicine)
+    if group_by == "patient":
+        # Ledger rows name the billing account; show whose it is
+        for group in report["groups"]:
+            account = billing_store.get(group["key"])
+            group["name"] = account["name"] if account else group["key"]
+    return {
+        "from": date_from,
+        "to": date_to,
+        "group_by": group_by,
+        "medicine": medicine,
+        **report
+    }
+
+def parse_day_range(date_from, date_to, default_days=None):
+    """Inclusive (first, last) day numbers from YYYY-MM-DD query values; `to` defaults to today"""
+    try:
+        last = day_number(date_to) if date_to else today_number()
+        if date_from:
+            first = day_number(date_from)
+        else:
+            first = last - default_days + 1 if default_days else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be dates in YYYY-MM-DD format")
+    if first is not None and first > last:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    return first, last
+
+@app.get("/api/pharmacy/reports/revenue", tags=["Pharmacy Analytics"])
+def get_revenue(
+    date_from: Optional[str] = Query(None, alias="from", description="YYYY-MM-DD, all time if omitted"),
+    date_to: Optional[str] = Query(None, alias="to", description="YYYY-MM-DD inclusive, today if omitted"),
+    medicine: Optional[str] = None
+):
+    """Units and revenue over a date range from the daily rollups, O(log days)"""
+    first, last = parse_day_range(date_from, date_to)
+    totals = sales_rollup.total(first, last, medicine)
+    return {
+        "from": day_string(first) if first is not None else None,
+        "to": day_string(last),
+        "medicine": medicine,
+        **totals
+    }
+
+@app.get("/api/pharmacy/reports/trend", tags=["Pharmacy Analytics"])
+def get_sales_trend(
+    date_from: Optional[str] = Query(None, alias="from", description="YYYY-MM-DD, 12 periods before to if omitted"),
+    date_to: Optional[str] = Query(None, alias="to", description="YYYY-MM-DD inclusive, today if omitted"),
+    interval_days: int = Query(7, ge=1, le=366),
+    medicine: Optional[str] = None
+):
+    """Units and revenue per period of interval_days, with the change from the previous period"""
+    first, last = parse_day_range(date_from, date_to, default_days=12 * interval_days)
+    if (last - first) // interval_days >= 1000:
+        raise HTTPException(status_code=400, detail="Too many periods, use a longer interval_days")
+    
+    periods = []
+    previous = None
+    for start, end, units, revenue in sales_rollup.trend(first, last, interval_days, medicine):
+        periods.append({
+            "from": day_string(start),
+            "to": day_string(end),
+            "units": units,
+            "revenue": revenue,
+            "change_pct": round((revenue - previous) / previous * 100, 1) if previous else None
+        })
+        previous = revenue
+    
+    return {"medicine": medicine, "interval_days": interval_days, "periods": periods}
+
+@app.get("/api/pharmacy/alerts", tags=["Pharmacy Alerts"])
+def get_alerts(after: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Alerts with id greater than `after`, oldest first; poll again with the last id"""
+    alerts = stock_alerts.since(after, limit)
+    return {
+        "alerts": alerts,
+        "last_id": alerts[-1]["id"] if alerts else after
+    }
+
+@app.get("/api/pharmacy/alerts/stream", tags=["Pharmacy Alerts"])
+async def stream_alerts(request: Request, after: int = Query(0, ge=0)):
+    """Alerts as Server-Sent Events, resuming after `after` or the Last-Event-ID header"""
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    
+    def listener():
+        loop.call_soon_threadsafe(wake.set)
+    
+    async def events():
+        last_id = after
+        stock_alerts.subscribe(listener)
+        try:
+            while not await request.is_disconnected():
+                wake.clear()
+                for alert in stock_alerts.since(last_id):
+                    last_id = alert["id"]
+                    yield f"id: {alert['id']}\nevent: {alert['type']}\ndata: {json.dumps(alert)}\n\n"
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            stock_alerts.unsubscribe(listener)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/pharmacy/alerts/active", tags=["Pharmacy Alerts"])
+def get_active_alerts():
+    """Medicines at or below their reorder level and serials inside their expiry warning window"""
+    with medicine_store.registry_lock:
+        return stock_alerts.active()
+
+@app.get("/api/pharmacy/alerts/thresholds/{medicine_name}", tags=["Pharmacy Alerts"])
+def get_alert_thresholds(medicine_name: str):
+    """Reorder level and expiry warning window of a medicine"""
+    return {"medicine": medicine_name, **stock_alerts.thresholds(medicine_name)}
+
+@app.put("/api/pharmacy/alerts/thresholds/{medicine_name}", tags=["Pharmacy Alerts"])
+def set_alert_thresholds(medicine_name: str, thresholds: AlertThresholds):
+    """Set a medicine's reorder level and/or expiry warning window (days)"""
+    if thresholds.reorder_level is None and thresholds.expiry_warning_days is None:
+        raise HTTPException(status_code=400, detail="Give reorder_level and/or expiry_warning_days")
+    with medicine_store.registry_lock:
+        updated = stock_alerts.set_thresholds(medicine_name, thresholds.reorder_level,
+                                              thresholds.expiry_warning_days)
+    return {"medicine": medicine_name, **updated}
+
+@app.get("/api/pharmacy/write-offs", tags=["Pharmacy Analytics"])
+def get_write_offs(limit: int = Query(100, ge=1, le=10000)):
+    """Expired serials retired by the sweeper, most recent first"""
+    write_offs = expiry_sweeper.write_offs(limit)
+    write_offs.reverse()
+    next_expiry = expiry_sweeper.next_expiry()
+    return {
+        "write_offs": write_offs,
+        "retired_since_startup": expiry_sweeper.retired,
+        "next_expiry": next_expiry[0] if next_expiry else None
     }
 
 @app.delete("/api/pharmacy/clear-inventory", tags=["Pharmacy"])
 def clear_inventory():
     """Clear all medicines from inventory"""
-    save_medicines({})
+    with medicine_store.registry_lock:
+        for name in list(medicine_store.data):
+            medicine_store.remove(name)
+        stock_index.clear()
+        fefo_index.clear()
+        medicine_catalog.clear()
+        medicine_search.clear()
+        stock_alerts.clear()
+        expiry_sweeper.clear()
+    save_medicines()
     return {"message": "Inventory cleared successfully"}
 
 @app.delete("/api/pharmacy/clear-billing", tags=["Pharmacy"])
 def clear_billing():
     """Clear all billing records"""
     save_patient_billing({})
+    with account_lock:
+        for account_id, _ in billing_store.items():
+            billing_store.remove(account_id)
+            purchase_log.delete(account_id)
+        walk_in_accounts.clear()
+        account_names.clear()
+    billing_store.save()
+    with demand_forecaster.lock:
+        demand_forecaster.reset()
+    purchase_ledger.clear()
+    with sales_rollup.lock:
+        sales_rollup.clear()
     return {"message": "Billing records cleared successfully"}
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+EVENTS = ("booked", "completed", "no_show", "cancelled")
+HOSPITAL = ("all", "")
+
+
+def new_gauge():
+    return {"slots": 0, "booked": 0, "by_hour": {}}
+
+
+def new_counters():
+    return {"total": dict.fromkeys(EVENTS, 0), "by_day": {}, "by_hour": {}}
+
+
+class UtilizationStats:
+    """
+    Appointment utilization rollups for doctors, specialities and the whole hospital.
+
+    Gauges (slots and currently booked slots, overall and per hour) move with
+    every slot change; event counters (booked, completed, no-show, cancelled)
+    are bumped per day and per appointment hour as events happen. Each scope
+    is one dict lookup away, so reading a dashboard never scans Doctors.json.
+    Events are also emitted as records {doctor, speciality, day, hour, event,
+    count} that replay() folds back in after a restart.
+    """
+
+    def __init__(self):
+        self.doctors = {}   # doctor_id -> speciality
+        self.gauges = {}    # scope -> gauge
+        self.counters = {}  # scope -> event counters
+
+    @staticmethod
+    def scopes(doctor_id, speciality):
+        return ("doctor", doctor_id), ("speciality", speciality), HOSPITAL
+
+    def set_doctor(self, doctor_id, speciality, slots):
+        """(Re)count a doctor's slots dict {"9": None, "10": "3", ...}"""
+        self.remove_doctor(doctor_id)
+        self.doctors[doctor_id] = speciality
+        for hour, patient_id in slots.items():
+            for scope in self.scopes(doctor_id, speciality):
+                gauge = self.gauges.setdefault(scope, new_gauge())
+                per_hour = gauge["by_hour"].setdefault(int(hour), [0, 0])
+                gauge["slots"] += 1
+                per_hour[0] += 1
+                if patient_id is not None:
+                    gauge["booked"] += 1
+                    per_hour[1] += 1
+
+    def remove_doctor(self, doctor_id):
+        """Stop counting a doctor's slots (their past events stay counted)"""
+        speciality = self.doctors.pop(doctor_id, None)
+        if speciality is None:
+            return
+        gauge = self.gauges.pop(("doctor", doctor_id))
+        for scope in self.scopes(doctor_id, speciality)[1:]:
+            total = self.gauges[scope]
+            total["slots"] -= gauge["slots"]
+            total["booked"] -= gauge["booked"]
+            for hour, (slots, booked) in gauge["by_hour"].items():
+                total["by_hour"][hour][0] -= slots
+                total["by_hour"][hour][1] -= booked
+                if not total["by_hour"][hour][0]:
+                    del total["by_hour"][hour]
+
+    def slot_changed(self, doctor_id, hour, booked):
+        """A slot went from free to booked (booked=True) or back"""
+        speciality = self.doctors.get(doctor_id)
+        if speciality is None:
+            return
+        delta = 1 if booked else -1
+        for scope in self.scopes(doctor_id, speciality):
+            gauge = self.gauges[scope]
+            gauge["booked"] += delta
+            gauge["by_hour"][hour][1] += delta
+
+    def record(self, event, doctor_id, speciality, day, hour, count=1):
+        for scope in self.scopes(doctor_id, speciality):
+            counters = self.counters.setdefault(scope, new_counters())
+            counters["total"][event] += count
+            counters["by_day"].setdefault(day, dict.fromkeys(EVENTS, 0))[event] += count
+            counters["by_hour"].setdefault(hour, dict.fromkeys(EVENTS, 0))[event] += count
+
+    def replay(self, records):
+        for r in records:
+            self.record(r["event"], r["doctor"], r["speciality"], r["day"], r["hour"], r.get("count", 1))
+
+    @staticmethod
+    def compact(records):
+        """Fewest records that replay to the same counters: one per (doctor, day, hour, event)"""
+        totals = {}
+        for r in records:
+            key = (r["doctor"], r["speciality"], r["day"], r["hour"], r["event"])
+            totals[key] = totals.get(key, 0) + r.get("count", 1)
+        return [{"doctor": doctor, "speciality": speciality, "day": day, "hour": hour, "event": event, "count": count}
+                for (doctor, speciality, day, hour, event), count in totals.items()]
+
+    def summary(self, scope, days=None):
+        """Dashboard figures for a scope; `days` limits by_day to the most recent days"""
+        gauge = self.gauges.get(scope, new_gauge())
+        counters = self.counters.get(scope, new_counters())
+        total = counters["total"]
+        attended = total["completed"] + total["no_show"]
+        by_day = sorted(counters["by_day"].items())
+        if days is not None:
+            by_day = by_day[-days:]
+        return {
+            "slots": gauge["slots"],
+            "booked": gauge["booked"],
+            "free": gauge["slots"] - gauge["booked"],
+            "utilization": round(gauge["booked"] / gauge["slots"], 4) if gauge["slots"] else 0.0,
+            "by_hour": {hour: self._hour(gauge, counters, hour)
+                        for hour in sorted(set(gauge["by_hour"]) | set(counters["by_hour"]))},
+            "events": dict(total),
+            "no_show_rate": round(total["no_show"] / attended, 4) if attended else 0.0,
+            "by_day": dict(by_day)
+        }
+
+    @staticmethod
+    def _hour(gauge, counters, hour):
+        slots, booked = gauge["by_hour"].get(hour, (0, 0))
+        return {
+            "slots": slots,
+            "booked": booked,
+            "free": slots - booked,
+            "events": counters["by_hour"].get(hour, dict.fromkeys(EVENTS, 0))
+        }
+
+    def specialities(self):
+        return sorted(key for kind, key in self.gauges if kind == "speciality")
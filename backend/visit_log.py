@@ -0,0 +1,94 @@
+import json
+import os
+import struct
+import threading
+
+OFFSET = struct.Struct('<Q')
+
+
+class VisitLog:
+    """
+    Append-only visit history, one segment per patient.
+
+    `<id>.jsonl` holds one visit per line and `<id>.idx` the byte offset of
+    each line as a little-endian u64, so recording a visit appends to two
+    files without reading anything, the visit count is the index size / 8,
+    and a page of history is one seek into each file. The offset is written
+    after the line, so a crash in between leaves an unreferenced line that
+    the next append simply writes past.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory  # created on the first append
+        self.lock = threading.Lock()
+        self.counts = {}  # patient_id -> number of visits, filled on first use
+
+    def _paths(self, patient_id):
+        base = os.path.join(self.directory, patient_id)
+        return base + ".jsonl", base + ".idx"
+
+    def count(self, patient_id):
+        with self.lock:
+            return self._count(patient_id)
+
+    def _count(self, patient_id):
+        if patient_id not in self.counts:
+            try:
+                size = os.path.getsize(self._paths(patient_id)[1])
+            except OSError:
+                size = 0
+            self.counts[patient_id] = size // OFFSET.size
+        return self.counts[patient_id]
+
+    def append(self, patient_id, visit):
+        self.extend(patient_id, [visit])
+
+    def extend(self, patient_id, visits):
+        log_path, idx_path = self._paths(patient_id)
+        with self.lock:
+            count = self._count(patient_id)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(log_path, 'ab') as log, open(idx_path, 'ab') as idx:
+                # Drop a torn offset left by a crash so entries stay aligned
+                if idx.tell() != count * OFFSET.size:
+                    idx.truncate(count * OFFSET.size)
+                    idx.seek(0, os.SEEK_END)
+                offsets = bytearray()
+                for visit in visits:
+                    offsets += OFFSET.pack(log.tell())
+                    log.write(json.dumps(visit).encode() + b"\n")
+                log.flush()
+                idx.write(offsets)
+            self.counts[patient_id] = count + len(visits)
+
+    def read(self, patient_id, start=0, limit=None):
+        """Visits start, start + 1, ... (at most `limit` of them), oldest first"""
+        total = self.count(patient_id)
+        stop = total if limit is None else min(total, start + limit)
+        if start >= stop:
+            return []
+
+        log_path, idx_path = self._paths(patient_id)
+        with open(idx_path, 'rb') as idx:
+            idx.seek(start * OFFSET.size)
+            raw = idx.read((stop - start) * OFFSET.size)
+        offsets = [offset for (offset,) in OFFSET.iter_unpack(raw)]
+
+        # Entries are located by offset, so a stray line left by a crash is never read
+        with open(log_path, 'rb') as log:
+            log.seek(offsets[0])
+            data = log.read(offsets[-1] - offsets[0]) + log.readline()
+        visits = []
+        for offset in offsets:
+            begin = offset - offsets[0]
+            visits.append(json.loads(data[begin:data.index(b"\n", begin)]))
+        return visits
+
+    def delete(self, patient_id):
+        with self.lock:
+            for path in self._paths(patient_id):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.counts.pop(patient_id, None)
@@ -0,0 +1,118 @@
+import heapq
+import time
+
+
+class Waitlist:
+    """
+    Patients waiting for a doctor, or for any doctor of a speciality.
+
+    Each doctor and each speciality has a min-heap of
+    (urgency, requested_at, entry id), so the best candidate for a freed
+    slot is the better of two heap heads and is taken in O(log n).
+    Cancelled entries stay in the heaps and are dropped when they surface.
+
+    A matched entry is still saved until confirm() says the booking it
+    got is on disk; the booking records the entry id, and discard_filled()
+    drops entries that a saved booking already used, so a crash between
+    the two saves neither loses the entry nor serves it twice.
+    """
+
+    def __init__(self):
+        self.entries = {}  # entry id -> entry dict
+        self.matched = {}  # entry id -> matched entry whose booking is not saved yet
+        self.heaps = {}    # ("doctor", id) or ("speciality", name) -> heap
+        self.next_id = 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(entry):
+        if entry.get("doctor_id") is not None:
+            return ("doctor", entry["doctor_id"])
+        return ("speciality", entry["speciality"])
+
+    def add(self, patient_id, urgency, doctor_id=None, speciality=None, requested_at=None, entry_id=None):
+        """Queue a patient for a doctor or a (normalized) speciality, returns the entry"""
+        if entry_id is None:
+            entry_id = self.next_id
+        self.next_id = max(self.next_id, entry_id + 1)
+        entry = {
+            "id": entry_id,
+            "patient_id": patient_id,
+            "urgency": urgency,
+            "doctor_id": doctor_id,
+            "speciality": speciality,
+            "requested_at": requested_at if requested_at is not None else time.time()
+        }
+        self.entries[entry_id] = entry
+        heapq.heappush(self.heaps.setdefault(self.key(entry), []),
+                       (urgency, entry["requested_at"], entry_id))
+        return entry
+
+    def remove(self, entry_id):
+        return self.entries.pop(entry_id, None)
+
+    def remove_doctor(self, doctor_id):
+        """Drop everyone waiting for a specific doctor"""
+        for _, _, entry_id in self.heaps.pop(("doctor", doctor_id), []):
+            self.entries.pop(entry_id, None)
+
+    def remove_patient(self, patient_id):
+        """Drop every entry of a patient, returns how many there were"""
+        entry_ids = [entry_id for entry_id, entry in self.entries.items() if entry["patient_id"] == patient_id]
+        for entry_id in entry_ids:
+            del self.entries[entry_id]
+        return len(entry_ids)
+
+    def _head(self, key):
+        heap = self.heaps.get(key)
+        while heap and heap[0][2] not in self.entries:
+            heapq.heappop(heap)
+        if not heap:
+            self.heaps.pop(key, None)
+            return None
+        return heap[0]
+
+    def match(self, doctor_id, speciality):
+        """Take the most urgent, longest-waiting entry for a slot of this doctor, or None"""
+        candidates = [(head, key) for key in (("doctor", doctor_id), ("speciality", speciality))
+                      if (head := self._head(key)) is not None]
+        if not candidates:
+            return None
+        head, key = min(candidates)
+        heapq.heappop(self.heaps[key])
+        entry = self.entries.pop(head[2])
+        self.matched[entry["id"]] = entry
+        return entry
+
+    def confirm(self, entry_id):
+        """The booking a matched entry got is saved (or the entry was not used); stop saving it"""
+        self.matched.pop(entry_id, None)
+
+    def unmatch(self, entry):
+        """Put a matched entry back in its place in the queue"""
+        self.matched.pop(entry["id"], None)
+        self.add(entry["patient_id"], entry["urgency"], entry["doctor_id"], entry["speciality"],
+                 entry["requested_at"], entry["id"])
+
+    def discard_filled(self, entry_ids):
+        """Drop entries that saved bookings were filled from, returns how many were still here"""
+        return sum(self.entries.pop(entry_id, None) is not None for entry_id in entry_ids)
+
+    def waiting(self, key):
+        """Live entries of one heap in the order they would be served"""
+        return [self.entries[entry_id] for _, _, entry_id in sorted(self.heaps.get(key, []))
+                if entry_id in self.entries]
+
+    def to_json(self):
+        return {"next_id": self.next_id, "entries": [*self.entries.values(), *self.matched.values()]}
+
+    @classmethod
+    def from_json(cls, data):
+        waitlist = cls()
+        for entry in data.get("entries", []):
+            waitlist.add(entry["patient_id"], entry["urgency"], entry.get("doctor_id"), entry.get("speciality"),
+                         entry["requested_at"], entry["id"])
+        waitlist.next_id = max(waitlist.next_id, data.get("next_id", 1))
+        return waitlist
@@ -526,7 +526,7 @@ const AppointmentScheduling = () => {
                 <div className="mt-2 p-4 bg-pink-50 rounded-lg">
                   <p className="text-sm text-textSecondary">Selected Patient</p>
                   <p className="text-lg font-semibold text-pink-600">{selectedPatient.name}</p>
-                  <p className="text-xs text-textSecondary">Age: {selectedPatient.age} | Visits: {selectedPatient.history.length}</p>
+                  <p className="text-xs text-textSecondary">Age: {selectedPatient.age} | Visits: {selectedPatient.visit_count}</p>
                 </div>
               )}
             </motion.div>
@@ -843,7 +843,7 @@ const AppointmentScheduling = () => {
                         <div className="grid grid-cols-3 gap-2 text-sm">
                           <p><strong>Age:</strong> {patient.age}</p>
                           <p><strong>Contact:</strong> {patient.contact}</p>
-                          <p><strong>Total Visits:</strong> {patient.history.length}</p>
+                          <p><strong>Total Visits:</strong> {patient.visit_count}</p>
                         </div>
                       </div>
                       <button
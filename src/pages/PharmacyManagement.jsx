@@ -4,10 +4,13 @@ import { useState, useEffect } from 'react';
 import toast from 'react-hot-toast';
 
 const API_BASE_URL = 'http://localhost:8000';
+const PAGE_SIZE = 50;
 
 const PharmacyManagement = () => {
   const [medicines, setMedicines] = useState([]);
+  const [medicinesCursor, setMedicinesCursor] = useState(null);
   const [patients, setPatients] = useState([]);
+  const [patientsCursor, setPatientsCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [activeModal, setActiveModal] = useState(null);
   const [analytics, setAnalytics] = useState({
@@ -28,17 +31,21 @@ const PharmacyManagement = () => {
     serial: ''
   });
   const [searchName, setSearchName] = useState('');
+  const [searchSuggestions, setSearchSuggestions] = useState([]);
   const [searchResult, setSearchResult] = useState(null);
   const [billingForm, setBillingForm] = useState({
     patient_name: '',
-    medicine_name: ''
+    patient_id: '',
+    medicine_name: '',
+    quantity: 1
   });
 
-  // Fetch all medicines from backend
-  const fetchMedicines = async () => {
-    setLoading(true);
+  // Fetch a page of medicine summaries (no serials); a cursor appends the next page
+  const fetchMedicines = async (cursor = null) => {
+    setLoading(!cursor);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/pharmacy/medicines`);
+      const query = `summary=true&limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+      const response = await fetch(`${API_BASE_URL}/api/pharmacy/medicines?${query}`);
       const data = await response.json();
       if (response.ok) {
         // Backend returns array directly, not wrapped in object
@@ -46,7 +53,8 @@ const PharmacyManagement = () => {
         const validMedicines = Array.isArray(data) 
           ? data.filter(med => med && med.name && typeof med.stock === 'number')
           : [];
-        setMedicines(validMedicines);
+        setMedicines(cursor ? (previous) => [...previous, ...validMedicines] : validMedicines);
+        setMedicinesCursor(response.headers.get('X-Next-Cursor'));
       } else {
         toast.error(data.detail || 'Failed to fetch medicines');
         setMedicines([]); // Set empty array on error
@@ -60,19 +68,38 @@ const PharmacyManagement = () => {
     }
   };
 
-  // Fetch all patients billing history
-  const fetchPatients = async () => {
+  // Fetch a page of patients' billing history; a cursor appends the next page
+  const fetchPatients = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/pharmacy/patients`);
+      const query = `limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+      const response = await fetch(`${API_BASE_URL}/api/pharmacy/patients?${query}`);
       const data = await response.json();
       if (response.ok) {
-        setPatients(data.patients || []);
+        const page = data.patients || [];
+        setPatients(cursor ? (previous) => [...previous, ...page] : page);
+        setPatientsCursor(response.headers.get('X-Next-Cursor'));
       }
     } catch (error) {
       console.error('Error fetching patients:', error);
     }
   };
 
+  // Serials are not in the summary listing; load them when the modal opens
+  const openSerials = async (name) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/pharmacy/medicines/${encodeURIComponent(name)}`);
+      const data = await response.json();
+      if (response.ok) {
+        setActiveModal({ type: 'serials', medicine: data });
+      } else {
+        toast.error(data.detail || 'Failed to fetch serials');
+      }
+    } catch (error) {
+      toast.error('Error connecting to server');
+      console.error('Error fetching serials:', error);
+    }
+  };
+
   // Fetch analytics data
   const fetchAnalytics = async () => {
     try {
@@ -165,11 +192,28 @@ const PharmacyManagement = () => {
   };
 
   // Search medicine
+  // Autocomplete medicine names as the user types, tolerating typos
+  const handleSearchInput = async (value) => {
+    setSearchName(value);
+    if (!value.trim()) {
+      setSearchSuggestions([]);
+      return;
+    }
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/pharmacy/search?q=${encodeURIComponent(value)}&limit=8`);
+      if (response.ok) {
+        setSearchSuggestions(await response.json());
+      }
+    } catch (error) {
+      console.error('Error fetching suggestions:', error);
+    }
+  };
+
   const handleSearch = async (e) => {
     e.preventDefault();
     setLoading(true);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/pharmacy/medicines/${searchName}`);
+      const response = await fetch(`${API_BASE_URL}/api/pharmacy/medicines/${encodeURIComponent(searchName)}`);
       const data = await response.json();
       if (response.ok) {
         setSearchResult(data.medicine);
@@ -198,17 +242,17 @@ const PharmacyManagement = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           patient_name: billingForm.patient_name,
-          medicine_name: billingForm.medicine_name
+          patient_id: billingForm.patient_id.trim() || null,
+          medicine_name: billingForm.medicine_name,
+          quantity: parseInt(billingForm.quantity, 10) || 1
         })
       });
       const data = await response.json();
       if (response.ok) {
-        let successMsg = `✅ Billing successful! Serial: ${data.serial_sold}, Price: ₹${data.price_paid}`;
-        if (data.expired_removed > 0) {
-          successMsg += `\n⚠️ ${data.expired_removed} expired serial(s) removed`;
-        }
+        const serials = data.serials_sold.map((item) => item.serial).join(', ');
+        const successMsg = `✅ Billing successful! Serial${data.quantity > 1 ? 's' : ''}: ${serials}, Price: ₹${data.price_paid}`;
         toast.success(successMsg, { duration: 4000 });
-        setBillingForm({ patient_name: '', medicine_name: '' });
+        setBillingForm({ patient_name: '', patient_id: '', medicine_name: '', quantity: 1 });
         setActiveModal(null);
         fetchMedicines();
         fetchPatients();
@@ -304,7 +348,7 @@ const PharmacyManagement = () => {
           </button> */}
           
           <button
-            onClick={fetchMedicines}
+            onClick={() => fetchMedicines()}
             className="bg-white p-4 rounded-lg shadow-lg hover:shadow-xl transition border-l-4 border-purple-500 flex flex-col items-center gap-2"
           >
             <Package className="w-6 h-6 text-purple-500" />
@@ -514,6 +558,8 @@ const PharmacyManagement = () => {
                     <th className="px-4 py-3 text-left text-textPrimary font-semibold">Medicine Name</th>
                     <th className="px-4 py-3 text-left text-textPrimary font-semibold">Stock</th>
                     <th className="px-4 py-3 text-left text-textPrimary font-semibold">Status</th>
+                    <th className="px-4 py-3 text-left text-textPrimary font-semibold">Nearest Expiry</th>
+                    <th className="px-4 py-3 text-left text-textPrimary font-semibold">Price</th>
                     <th className="px-4 py-3 text-left text-textPrimary font-semibold">Serials</th>
                   </tr>
                 </thead>
@@ -529,12 +575,20 @@ const PharmacyManagement = () => {
                             {stockBadge.label}
                           </span>
                         </td>
+                        <td className="px-4 py-3 text-textPrimary">{medicine.nearest_expiry || '—'}</td>
+                        <td className="px-4 py-3 text-textPrimary">
+                          {medicine.min_price == null
+                            ? '—'
+                            : medicine.min_price === medicine.max_price
+                              ? `₹${medicine.min_price.toFixed(2)}`
+                              : `₹${medicine.min_price.toFixed(2)} – ₹${medicine.max_price.toFixed(2)}`}
+                        </td>
                         <td className="px-4 py-3">
                           <button
-                            onClick={() => setActiveModal({ type: 'serials', medicine })}
+                            onClick={() => openSerials(medicine.name)}
                             className="text-highlight hover:underline text-sm"
                           >
-                            View {Object.keys(medicine.serials || {}).length} serials
+                            View {medicine.stock || 0} serials
                           </button>
                         </td>
                       </tr>
@@ -542,6 +596,14 @@ const PharmacyManagement = () => {
                   })}
                 </tbody>
               </table>
+              {medicinesCursor && (
+                <button
+                  onClick={() => fetchMedicines(medicinesCursor)}
+                  className="mt-4 w-full text-highlight hover:underline text-sm"
+                >
+                  Load more medicines
+                </button>
+              )}
             </div>
           )}
         </motion.div>
@@ -682,11 +744,19 @@ const PharmacyManagement = () => {
                   <input
                     type="text"
                     value={searchName}
-                    onChange={(e) => setSearchName(e.target.value)}
+                    onChange={(e) => handleSearchInput(e.target.value)}
                     className="w-full px-4 py-2 border rounded-lg focus:ring-2 focus:ring-highlight"
                     placeholder="Enter medicine name..."
+                    list="medicine-suggestions"
                     required
                   />
+                  <datalist id="medicine-suggestions">
+                    {searchSuggestions.map((match) => (
+                      <option key={match.medicine} value={match.medicine}>
+                        {match.stock} in stock
+                      </option>
+                    ))}
+                  </datalist>
                 </div>
                 <button
                   type="submit"
@@ -729,7 +799,17 @@ const PharmacyManagement = () => {
                     value={billingForm.patient_name}
                     onChange={(e) => setBillingForm({ ...billingForm, patient_name: e.target.value })}
                     className="w-full px-4 py-2 border rounded-lg focus:ring-2 focus:ring-highlight"
-                    required
+                    required={!billingForm.patient_id.trim()}
+                  />
+                </div>
+                <div>
+                  <label className="block text-textPrimary font-semibold mb-2">Registry Patient ID (optional)</label>
+                  <input
+                    type="text"
+                    value={billingForm.patient_id}
+                    onChange={(e) => setBillingForm({ ...billingForm, patient_id: e.target.value })}
+                    className="w-full px-4 py-2 border rounded-lg focus:ring-2 focus:ring-highlight"
+                    placeholder="Bills the registered patient's account"
                   />
                 </div>
                 <div>
@@ -742,6 +822,17 @@ const PharmacyManagement = () => {
                     required
                   />
                 </div>
+                <div>
+                  <label className="block text-textPrimary font-semibold mb-2">Quantity</label>
+                  <input
+                    type="number"
+                    min="1"
+                    value={billingForm.quantity}
+                    onChange={(e) => setBillingForm({ ...billingForm, quantity: e.target.value })}
+                    className="w-full px-4 py-2 border rounded-lg focus:ring-2 focus:ring-highlight"
+                    required
+                  />
+                </div>
                 <button
                   type="submit"
                   disabled={loading}
@@ -771,17 +862,19 @@ const PharmacyManagement = () => {
                 <p className="text-textSecondary text-center py-8">No patient records found</p>
               ) : (
                 <div className="space-y-4 max-h-96 overflow-y-auto">
-                  {patients.map((patient, index) => (
-                    <div key={index} className="border rounded-lg p-4 bg-gray-50">
+                  {patients.map((patient) => (
+                    <div key={patient.account_id} className="border rounded-lg p-4 bg-gray-50">
                       <h4 className="text-lg font-bold text-textPrimary mb-2">{patient.name}</h4>
                       <p className="text-textSecondary text-sm mb-2">
                         Total Spent: <span className="font-semibold text-textPrimary">₹{patient.total_price?.toFixed(2) || '0.00'}</span>
                       </p>
                       <div className="space-y-1">
-                        <p className="text-sm font-semibold text-textPrimary">Purchase History:</p>
-                        {patient.purchases && patient.purchases.length > 0 ? (
+                        <p className="text-sm font-semibold text-textPrimary">
+                          Recent Purchases ({patient.recent_purchases?.length || 0} of {patient.total_purchases}):
+                        </p>
+                        {patient.recent_purchases && patient.recent_purchases.length > 0 ? (
                           <ul className="text-sm text-textSecondary space-y-1">
-                            {patient.purchases.map((purchase, pIndex) => (
+                            {patient.recent_purchases.map((purchase, pIndex) => (
                               <li key={pIndex} className="flex justify-between">
                                 <span>{purchase.medicine} (Serial: {purchase.serial})</span>
                                 <span className="font-semibold">₹{purchase.price?.toFixed(2)}</span>
@@ -806,6 +899,14 @@ const PharmacyManagement = () => {
                       )}
                     </div>
                   ))}
+                  {patientsCursor && (
+                    <button
+                      onClick={() => fetchPatients(patientsCursor)}
+                      className="w-full text-highlight hover:underline text-sm"
+                    >
+                      Load more patients
+                    </button>
+                  )}
                 </div>
               )}
             </motion.div>